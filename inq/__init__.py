@@ -0,0 +1,27 @@
+"""Execution layer for ``.inq`` inquiry graphs (see ``inq.runner``)."""
+
+from inq.runner import (
+    Pipeline,
+    PipelineError,
+    Runner,
+    RunReport,
+    StageContext,
+    StageResult,
+    load_pipeline,
+    load_stages,
+    parse_inq,
+    stage,
+)
+
+__all__ = [
+    "Pipeline",
+    "PipelineError",
+    "Runner",
+    "RunReport",
+    "StageContext",
+    "StageResult",
+    "load_pipeline",
+    "load_stages",
+    "parse_inq",
+    "stage",
+]
@@ -0,0 +1,5 @@
+import sys
+
+from inq.runner import main
+
+sys.exit(main())
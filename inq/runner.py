@@ -0,0 +1,835 @@
+"""
+Incremental runner for ``.inq`` pipeline graphs.
+
+An ``.inq`` file is a Mermaid flowchart. ``parse_inq`` turns it into a
+``Pipeline``: cylinder nodes (``A_eff[(effects_table.csv)]``) are artifacts
+whose label is a path relative to the work directory, ``[[...]]`` nodes are
+goals and are ignored, and every other node is a stage. An edge from an
+artifact into a stage makes it an input, an edge from a stage into an
+artifact makes it an output, and a stage-to-stage edge only orders the two.
+
+Stages are Python callables registered with ``@stage("Q6")`` that read
+``ctx.inputs`` and write ``ctx.outputs``. ``run`` executes them in dependency
+order, with independent branches (e.g. Q7 moderators and Q8 bias) in
+parallel, and memoizes each one in ``<workdir>/.inq-state.json`` under a hash
+of its code (the source of its module and of the modules of the same package
+it imports), its resolved parameters (``params=``, e.g. the pooling method
+taken from the environment) and the *content* of its inputs. A stage reruns
+only when one of those changed or one of its outputs went missing or was
+edited, so a stage
+that reruns but reproduces the same bytes does not invalidate anything
+downstream. Stages without a registered callable (the LLM-driven screening
+and extraction steps) are external: their outputs are taken as given.
+
+A stage may declare ``partition={"effects_table.csv": "analysis_key"}`` for
+CSV inputs. The runner then records a digest per key value, and
+``ctx.changed_keys("effects_table.csv")`` returns the keys that were added,
+changed or removed since the stage last succeeded, so a one-row change
+upstream only recomputes the affected analysis keys.
+
+Usage::
+
+    python -m inq adhd-metastudy.inq --stages meta.stages --jobs 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_WORKDIR = ROOT / "data" / "metastudy"
+STATE_NAME = ".inq-state.json"
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+HASH_CHUNK_SIZE = 1 << 20
+
+# Statuses that let downstream stages proceed.
+DONE_STATUSES = ("ran", "fresh", "external")
+
+_SKIP_RE = re.compile(
+    r"^(?:%%|(?:flowchart|graph|subgraph|end|classDef|class|style|linkStyle|click|direction)\b)"
+)
+_ARROW_RE = re.compile(r"\s*(?:<?-[-.]*->|<?=+=>|---+|-\.+-)(?:\|[^|]*\|)?\s*")
+# Mermaid node shapes as (opener, closer), longer openers first so "[(" wins over "[".
+_NODE_SHAPES = (
+    ("[[", "]]"),
+    ("[(", ")]"),
+    ("((", "))"),
+    ("{{", "}}"),
+    ("[", "]"),
+    ("(", ")"),
+    ("{", "}"),
+    (">", "]"),
+)
+# One alternative per shape, so a closer always matches its opener; each label is greedy.
+_NODE_RE = re.compile(
+    r"^([A-Za-z_][\w-]*)\s*(?:"
+    + "|".join(
+        f"{re.escape(opener)}(.*){re.escape(closer)}" for opener, closer in _NODE_SHAPES
+    )
+    + r")?$"
+)
+_BREAK_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+
+
+class PipelineError(Exception):
+    """Raised for malformed graphs and stages that do not produce their outputs."""
+
+
+# ---------------------------------------------------------------------------
+# Graph
+
+
+@dataclass
+class Node:
+    id: str
+    kind: str  # "stage", "artifact" or "goal"
+    label: str
+
+
+@dataclass
+class Pipeline:
+    nodes: Dict[str, Node]
+    inputs: Dict[str, List[str]]
+    outputs: Dict[str, List[str]]
+    upstream: Dict[str, Set[str]]
+    order: List[str]
+
+    def artifact_path(self, workdir: Path, artifact_id: str) -> Path:
+        return workdir / self.nodes[artifact_id].label
+
+    def ancestors(self, node_ids: Iterable[str]) -> Set[str]:
+        """``node_ids`` plus every stage they depend on."""
+        result: Set[str] = set()
+        stack = list(node_ids)
+        while stack:
+            node = stack.pop()
+            if node not in result:
+                result.add(node)
+                stack.extend(self.upstream.get(node, ()))
+        return result
+
+
+def _split_outside_brackets(text: str, separator: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in "[({":
+            depth += 1
+        elif char in "])}":
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _clean_label(label: str) -> str:
+    label = _BREAK_RE.sub(" ", label.strip())
+    if len(label) >= 2 and label[0] == label[-1] == '"':
+        label = label[1:-1]
+    return " ".join(label.split())
+
+
+def parse_inq(text: str) -> Pipeline:
+    """Parse a Mermaid flowchart into stages, artifacts and their dependencies."""
+    nodes: Dict[str, Node] = {}
+    edges: List[Tuple[str, str]] = []
+
+    def node_ref(ref: str) -> str:
+        match = _NODE_RE.match(ref)
+        if not match:
+            raise PipelineError(f"Cannot parse node reference: {ref!r}")
+        node_id, labels = match.group(1), match.groups()[1:]
+        shape = next(
+            (index for index, label in enumerate(labels) if label is not None), None
+        )
+        if shape is not None:
+            opening, label = _NODE_SHAPES[shape][0], labels[shape]
+            kind = (
+                "artifact"
+                if opening == "[("
+                else "goal" if opening == "[[" else "stage"
+            )
+            nodes[node_id] = Node(node_id, kind, _clean_label(label))
+        elif node_id not in nodes:
+            nodes[node_id] = Node(node_id, "stage", node_id)
+        return node_id
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip().rstrip(";")
+        if not line or _SKIP_RE.match(line):
+            continue
+        segments = _ARROW_RE.split(line)
+        groups = [
+            [node_ref(ref) for ref in _split_outside_brackets(segment, "&")]
+            for segment in segments
+        ]
+        for sources, targets in zip(groups, groups[1:]):
+            edges.extend((source, target) for source in sources for target in targets)
+
+    inputs: Dict[str, List[str]] = {}
+    outputs: Dict[str, List[str]] = {}
+    producers: Dict[str, str] = {}
+    upstream: Dict[str, Set[str]] = {}
+    for node in nodes.values():
+        if node.kind == "stage":
+            inputs[node.id], outputs[node.id], upstream[node.id] = [], [], set()
+
+    for source, target in edges:
+        source_kind, target_kind = nodes[source].kind, nodes[target].kind
+        if "goal" in (source_kind, target_kind):
+            continue
+        if source_kind == "stage" and target_kind == "artifact":
+            if target in producers and producers[target] != source:
+                raise PipelineError(
+                    f"Artifact {target} is produced by both {producers[target]} and {source}."
+                )
+            producers[target] = source
+            outputs[source].append(target)
+        elif source_kind == "artifact" and target_kind == "stage":
+            inputs[target].append(source)
+        elif source_kind == "stage" and target_kind == "stage":
+            upstream[target].add(source)
+        else:
+            raise PipelineError(
+                f"Artifact-to-artifact edge {source} --> {target} has no stage."
+            )
+
+    for stage_id, artifact_ids in inputs.items():
+        upstream[stage_id].update(producers[a] for a in artifact_ids if a in producers)
+
+    order: List[str] = []
+    remaining = {stage_id: set(ups) for stage_id, ups in upstream.items()}
+    while remaining:
+        ready = sorted(stage_id for stage_id, ups in remaining.items() if not ups)
+        if not ready:
+            raise PipelineError(
+                f"Dependency cycle between stages: {', '.join(sorted(remaining))}"
+            )
+        for stage_id in ready:
+            order.append(stage_id)
+            del remaining[stage_id]
+        for ups in remaining.values():
+            ups.difference_update(ready)
+
+    return Pipeline(nodes, inputs, outputs, upstream, order)
+
+
+def load_pipeline(path: Path | str) -> Pipeline:
+    return parse_inq(Path(path).read_text(encoding="utf-8"))
+
+
+# ---------------------------------------------------------------------------
+# Stage registry
+
+
+def _package_modules(module: ModuleType) -> List[ModuleType]:
+    """
+    ``module`` plus the modules of its top-level package that it imports,
+    directly or through one another, found via module-level names.
+    """
+    package = module.__name__.split(".")[0]
+    found = {module.__name__: module}
+    pending = [module]
+    while pending:
+        for value in list(vars(pending.pop()).values()):
+            name = (
+                value.__name__
+                if isinstance(value, ModuleType)
+                else getattr(value, "__module__", None)
+            )
+            if (
+                not isinstance(name, str)
+                or name in found
+                or name.split(".")[0] != package
+                or name not in sys.modules
+            ):
+                continue
+            found[name] = sys.modules[name]
+            pending.append(sys.modules[name])
+    return [found[name] for name in sorted(found)]
+
+
+@dataclass
+class StageSpec:
+    node: str
+    func: Callable[["StageContext"], None]
+    partition: Dict[str, str] = field(default_factory=dict)
+    version: str = ""
+    params: Optional[Callable[[], Dict[str, Any]]] = None
+
+    @cached_property
+    def code_hash(self) -> str:
+        """Digest of ``version``, the function and the source files of its package modules."""
+        try:
+            source = inspect.getsource(self.func)
+        except (OSError, TypeError):
+            code = getattr(self.func, "__code__", None)
+            source = (
+                repr((code.co_code, code.co_consts))
+                if code is not None
+                else repr(self.func)
+            )
+        digest = hashlib.sha256(f"{self.version}\0{source}".encode("utf-8"))
+        module = sys.modules.get(getattr(self.func, "__module__", ""))
+        for dependency in _package_modules(module) if module is not None else []:
+            path = getattr(dependency, "__file__", None)
+            if path and Path(path).is_file():
+                digest.update(f"\0{dependency.__name__}\0".encode("utf-8"))
+                digest.update(Path(path).read_bytes())
+        return digest.hexdigest()
+
+    def resolved_params(self) -> Dict[str, Any]:
+        """The stage's parameters as recorded in the state file (JSON round-tripped)."""
+        if self.params is None:
+            return {}
+        return json.loads(json.dumps(self.params(), sort_keys=True))
+
+
+REGISTRY: Dict[str, StageSpec] = {}
+
+
+def stage(
+    node: str,
+    *,
+    partition: Optional[Dict[str, str]] = None,
+    version: str = "",
+    params: Optional[Callable[[], Dict[str, Any]]] = None,
+) -> Callable[[Callable[["StageContext"], None]], Callable[["StageContext"], None]]:
+    """
+    Register the decorated function as the implementation of graph node ``node``.
+
+    ``partition`` maps CSV input names to the column that keys their rows.
+    ``params`` returns the stage's configuration (anything read from the
+    environment or settings, JSON-serializable); it is recorded with each run,
+    a different value makes the stage stale, and the stage reads it back as
+    ``ctx.params``. Edits to the function's module and the same-package
+    modules it imports rerun the stage; bump ``version`` to force a rerun for
+    anything else (e.g. a change in a third-party library).
+    """
+
+    def decorator(
+        func: Callable[["StageContext"], None]
+    ) -> Callable[["StageContext"], None]:
+        REGISTRY[node] = StageSpec(node, func, dict(partition or {}), version, params)
+        return func
+
+    return decorator
+
+
+def load_stages(modules: Sequence[str]) -> None:
+    """Import modules whose ``@stage`` decorators populate ``REGISTRY``."""
+    for module in modules:
+        importlib.import_module(module)
+
+
+@dataclass
+class StageContext:
+    node: str
+    label: str
+    workdir: Path
+    inputs: Dict[str, Path]
+    outputs: Dict[str, Path]
+    changed: Dict[str, Optional[Set[str]]] = field(default_factory=dict)
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    def changed_keys(self, name: str) -> Optional[Set[str]]:
+        """
+        Keys of partitioned input ``name`` that changed since the last successful run.
+
+        ``None`` means there is nothing to build on (first run, new stage code or
+        parameters, missing outputs or ``--force``) and the stage should
+        recompute everything.
+        """
+        return self.changed.get(name)
+
+
+# ---------------------------------------------------------------------------
+# Memoization state
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def partition_digests(path: Path, column: str) -> Dict[str, str]:
+    """Digest of the rows for each value of ``column`` in the CSV at ``path``."""
+    with path.open("r", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, [])
+        try:
+            index = header.index(column)
+        except ValueError:
+            raise PipelineError(
+                f"{path.name} has no {column!r} column to partition by."
+            ) from None
+        # The header is part of every key's digest, so a schema change touches all keys.
+        base = hashlib.blake2b("\x1f".join(header).encode("utf-8"), digest_size=16)
+        hashers: Dict[str, "hashlib._Hash"] = {}
+        for row in reader:
+            key = row[index] if index < len(row) else ""
+            hasher = hashers.get(key)
+            if hasher is None:
+                hasher = hashers[key] = base.copy()
+            hasher.update(("\x1f".join(row) + "\x1e").encode("utf-8"))
+    return {key: hasher.hexdigest() for key, hasher in hashers.items()}
+
+
+class RunState:
+    """The ``.inq-state.json`` record of stage keys and artifact digests."""
+
+    def __init__(self, workdir: Path) -> None:
+        self.path = workdir / STATE_NAME
+        self.workdir = workdir
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.stages: Dict[str, dict] = data.get("stages", {})
+        # relative path -> [size, mtime_ns, digest], so unchanged files are not re-read.
+        self.files: Dict[str, list] = data.get("files", {})
+        self.partitions: Dict[str, dict] = data.get("partitions", {})
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps(
+                {
+                    "stages": self.stages,
+                    "files": self.files,
+                    "partitions": self.partitions,
+                },
+                indent=1,
+                sort_keys=True,
+            )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def _rel(self, path: Path) -> str:
+        try:
+            return str(path.relative_to(self.workdir))
+        except ValueError:
+            return str(path)
+
+    def file_digest(self, path: Path) -> Optional[str]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        rel = self._rel(path)
+        with self._lock:
+            cached = self.files.get(rel)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = _hash_file(path)
+        with self._lock:
+            self.files[rel] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path: Path) -> Optional[str]:
+        """Content digest of a file or directory artifact; ``None`` if it is missing."""
+        if not path.is_dir():
+            return self.file_digest(path)
+        combined = hashlib.blake2b(digest_size=20)
+        for child in sorted(p for p in path.rglob("*") if p.is_file()):
+            combined.update(
+                f"{child.relative_to(path)}\0{self.file_digest(child)}\n".encode(
+                    "utf-8"
+                )
+            )
+        return combined.hexdigest()
+
+    def partition(self, path: Path, column: str) -> Dict[str, str]:
+        stat = path.stat()
+        cache_key = f"{self._rel(path)}#{column}"
+        with self._lock:
+            cached = self.partitions.get(cache_key)
+        if cached and cached["stat"] == [stat.st_size, stat.st_mtime_ns]:
+            return cached["keys"]
+        keys = partition_digests(path, column)
+        with self._lock:
+            self.partitions[cache_key] = {
+                "stat": [stat.st_size, stat.st_mtime_ns],
+                "keys": keys,
+            }
+        return keys
+
+    def record(self, node: str, record: dict) -> None:
+        with self._lock:
+            self.stages[node] = record
+
+
+# ---------------------------------------------------------------------------
+# Execution
+
+
+@dataclass
+class StageResult:
+    node: str
+    status: str  # ran, fresh, external, stale, failed, blocked, missing
+    seconds: float = 0.0
+    message: str = ""
+
+    def __str__(self) -> str:
+        timing = f" in {self.seconds:.2f}s" if self.status == "ran" else ""
+        detail = f" ({self.message})" if self.message else ""
+        return f"{self.node}: {self.status}{timing}{detail}"
+
+
+@dataclass
+class RunReport:
+    results: List[StageResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def ok(self) -> bool:
+        return not any(
+            result.status in ("failed", "blocked", "missing") for result in self.results
+        )
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count('ran')} ran, {self.count('fresh')} up to date, "
+            f"{self.count('external')} external, {self.count('failed')} failed, "
+            f"{self.count('blocked') + self.count('missing')} blocked in {self.seconds:.2f}s"
+        )
+
+
+class Runner:
+    """Executes a ``Pipeline`` against a work directory with memoization."""
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        workdir: Path | str = DEFAULT_WORKDIR,
+        *,
+        registry: Optional[Dict[str, StageSpec]] = None,
+        jobs: int = DEFAULT_JOBS,
+    ) -> None:
+        self.pipeline = pipeline
+        self.workdir = Path(workdir)
+        self.registry = REGISTRY if registry is None else registry
+        self.jobs = max(1, jobs)
+        self.state = RunState(self.workdir)
+
+    def _paths(self, artifact_ids: Iterable[str]) -> Dict[str, Path]:
+        return {
+            self.pipeline.nodes[artifact_id].label: self.pipeline.artifact_path(
+                self.workdir, artifact_id
+            )
+            for artifact_id in artifact_ids
+        }
+
+    def check(
+        self, node: str, force: bool = False
+    ) -> Tuple[str, str, Dict[str, Optional[str]]]:
+        """
+        Classify ``node`` without running it.
+
+        Returns ``(status, reason, input_digests)`` where status is ``external``,
+        ``missing`` (an input does not exist), ``fresh`` or ``stale``.
+        """
+        inputs = self._paths(self.pipeline.inputs[node])
+        outputs = self._paths(self.pipeline.outputs[node])
+        spec = self.registry.get(node)
+        if spec is None:
+            absent = [name for name, path in outputs.items() if not path.exists()]
+            if absent:
+                return (
+                    "missing",
+                    f"no stage registered and {', '.join(absent)} not found",
+                    {},
+                )
+            return "external", "", {}
+        digests = {name: self.state.digest(path) for name, path in inputs.items()}
+        absent = [name for name, digest in digests.items() if digest is None]
+        if absent:
+            return "missing", f"input {', '.join(absent)} not found", digests
+        if force:
+            return "stale", "forced", digests
+        record = self.state.stages.get(node)
+        if record is None:
+            return "stale", "never run", digests
+        if record.get("code") != spec.code_hash:
+            return "stale", "stage code changed", digests
+        if record.get("params", {}) != spec.resolved_params():
+            return "stale", "stage parameters changed", digests
+        changed = sorted(
+            name
+            for name, digest in digests.items()
+            if record.get("inputs", {}).get(name) != digest
+        )
+        if changed:
+            return "stale", f"{', '.join(changed)} changed", digests
+        for name, path in outputs.items():
+            if self.state.digest(path) != record.get("outputs", {}).get(name):
+                return "stale", f"output {name} missing or modified", digests
+        return "fresh", "", digests
+
+    def _changed_keys(
+        self,
+        node: str,
+        spec: StageSpec,
+        inputs: Dict[str, Path],
+        params: Dict[str, Any],
+        force: bool,
+    ) -> Tuple[Dict[str, Optional[Set[str]]], Dict[str, Dict[str, str]]]:
+        record = self.state.stages.get(node)
+        outputs_intact = record is not None and all(
+            self.state.digest(path) == record.get("outputs", {}).get(name)
+            for name, path in self._paths(self.pipeline.outputs[node]).items()
+        )
+        usable = (
+            not force
+            and outputs_intact
+            and record.get("code") == spec.code_hash
+            and record.get("params", {}) == params
+        )
+        changed: Dict[str, Optional[Set[str]]] = {}
+        current: Dict[str, Dict[str, str]] = {}
+        for name, column in spec.partition.items():
+            if name not in inputs:
+                raise PipelineError(
+                    f"Stage {node} partitions {name}, which is not one of its inputs."
+                )
+            current[name] = self.state.partition(inputs[name], column)
+            previous = record.get("partitions", {}).get(name) if usable else None
+            if previous is None:
+                changed[name] = None
+            else:
+                changed[name] = {
+                    key
+                    for key in previous.keys() | current[name].keys()
+                    if previous.get(key) != current[name].get(key)
+                }
+        return changed, current
+
+    def run_stage(self, node: str, force: bool = False) -> StageResult:
+        """Run ``node`` if it is stale and record the outcome."""
+        status, reason, digests = self.check(node, force)
+        if status != "stale":
+            return StageResult(node, status, message=reason)
+        spec = self.registry[node]
+        inputs = self._paths(self.pipeline.inputs[node])
+        outputs = self._paths(self.pipeline.outputs[node])
+        params = spec.resolved_params()
+        changed, partitions = self._changed_keys(node, spec, inputs, params, force)
+        for path in outputs.values():
+            path.parent.mkdir(parents=True, exist_ok=True)
+        ctx = StageContext(
+            node,
+            self.pipeline.nodes[node].label,
+            self.workdir,
+            inputs,
+            outputs,
+            changed,
+            params,
+        )
+        start = time.perf_counter()
+        try:
+            spec.func(ctx)
+        # Reported per stage; downstream stages are blocked.
+        except Exception as exc:  # noqa: BLE001
+            return StageResult(
+                node,
+                "failed",
+                time.perf_counter() - start,
+                f"{type(exc).__name__}: {exc}",
+            )
+        seconds = time.perf_counter() - start
+        output_digests = {
+            name: self.state.digest(path) for name, path in outputs.items()
+        }
+        absent = [name for name, digest in output_digests.items() if digest is None]
+        if absent:
+            return StageResult(
+                node, "failed", seconds, f"did not write {', '.join(absent)}"
+            )
+        self.state.record(
+            node,
+            {
+                "code": spec.code_hash,
+                "params": params,
+                "inputs": digests,
+                "outputs": output_digests,
+                "partitions": partitions,
+                "seconds": round(seconds, 3),
+                "finished": round(time.time(), 3),
+            },
+        )
+        self.state.save()
+        partial = [
+            f"{len(keys)} changed {name} keys"
+            for name, keys in changed.items()
+            if keys is not None
+        ]
+        return StageResult(node, "ran", seconds, "; ".join([reason, *partial]))
+
+    def plan(
+        self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()
+    ) -> List[StageResult]:
+        """What ``run`` would do, assuming every rerun stage changes its outputs."""
+        selected = self._select(targets)
+        forced = set(force)
+        results: Dict[str, StageResult] = {}
+        for node in self.pipeline.order:
+            if node not in selected:
+                continue
+            upstream = [
+                results[up] for up in self.pipeline.upstream[node] if up in results
+            ]
+            if any(
+                result.status in ("stale", "missing", "blocked") for result in upstream
+            ):
+                if node in self.registry:
+                    results[node] = StageResult(node, "stale", message="upstream stale")
+                    continue
+            status, reason, _ = self.check(node, node in forced)
+            results[node] = StageResult(node, status, message=reason)
+        return list(results.values())
+
+    def _select(self, targets: Optional[Iterable[str]]) -> Set[str]:
+        if not targets:
+            return set(self.pipeline.order)
+        unknown = [node for node in targets if node not in self.pipeline.upstream]
+        if unknown:
+            raise PipelineError(f"Unknown stage(s): {', '.join(unknown)}")
+        return self.pipeline.ancestors(targets)
+
+    def run(
+        self, targets: Optional[Iterable[str]] = None, force: Iterable[str] = ()
+    ) -> RunReport:
+        """
+        Bring ``targets`` (default: every stage) up to date.
+
+        Stages whose upstream stages are done are submitted as soon as they
+        become ready, so independent branches run concurrently. A failed or
+        missing stage blocks everything downstream of it.
+        """
+        selected = self._select(targets)
+        forced = set(force)
+        start = time.perf_counter()
+        results: Dict[str, StageResult] = {}
+        waiting = [node for node in self.pipeline.order if node in selected]
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while waiting or running:
+                for node in list(waiting):
+                    upstream = [
+                        up for up in self.pipeline.upstream[node] if up in selected
+                    ]
+                    if any(up not in results for up in upstream):
+                        continue
+                    waiting.remove(node)
+                    failed = [
+                        up for up in upstream if results[up].status not in DONE_STATUSES
+                    ]
+                    if failed:
+                        results[node] = StageResult(
+                            node,
+                            "blocked",
+                            message=f"{', '.join(sorted(failed))} did not finish",
+                        )
+                        continue
+                    running[executor.submit(self.run_stage, node, node in forced)] = (
+                        node
+                    )
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = running.pop(future)
+                    results[node] = future.result()
+
+        return RunReport(
+            [results[node] for node in self.pipeline.order if node in results],
+            time.perf_counter() - start,
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the stages of an .inq pipeline graph incrementally."
+    )
+    parser.add_argument("graph", type=Path, help="The .inq flowchart to execute.")
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        default=Path(os.environ.get("INQ_WORKDIR", DEFAULT_WORKDIR)),
+        help="Directory holding the graph's artifacts and the memoization state.",
+    )
+    parser.add_argument(
+        "--stages",
+        action="append",
+        default=[],
+        help="Python module registering stage implementations (repeatable).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.environ.get("INQ_JOBS", DEFAULT_JOBS)),
+        help="Number of stages to run at once.",
+    )
+    parser.add_argument(
+        "--target",
+        action="append",
+        help="Only bring this stage and its dependencies up to date.",
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        help="Rerun this stage even if it is up to date.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show which stages are stale without running them.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    load_stages(args.stages)
+    pipeline = load_pipeline(args.graph)
+    runner = Runner(pipeline, args.workdir, jobs=args.jobs)
+
+    if args.dry_run:
+        for result in runner.plan(args.target, args.force):
+            print(result)
+        return 0
+
+    report = runner.run(args.target, args.force)
+    for result in report.results:
+        print(result)
+    print(report)
+    return 0 if report.ok else 1
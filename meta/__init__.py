@@ -0,0 +1,14 @@
+"""Vectorized effect sizes and random-effects meta-analysis for the metastudy pipeline."""
+
+from meta.effects import compute_effects, fisher_z, hedges_g, log_odds_ratio
+from meta.pooling import PoolResult, leave_one_out, pool
+
+__all__ = [
+    "PoolResult",
+    "compute_effects",
+    "fisher_z",
+    "hedges_g",
+    "leave_one_out",
+    "log_odds_ratio",
+    "pool",
+]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized engine against a row-wise pandas baseline.
+
+The baseline mirrors the notebook prototypes: effect sizes through
+``DataFrame.apply(axis=1)`` and one model fit per analysis key (and per
+left-out row) through ``groupby().apply``. Both paths run on the same
+synthetic ``normalized_outcomes.csv`` and their pooled estimates are compared.
+
+    python -m meta.bench --rows 20000 --keys 2000 --method REML
+
+Requires pandas (for the baseline only).
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from meta.effects import KEY_COLUMNS
+from meta.pooling import DEFAULT_METHOD, REML_MAX_HALVING, REML_MAX_ITER, REML_TOLERANCE
+from meta.stages import write_effects_table, write_meta_results
+from meta.tables import read_columns, write_columns
+
+
+def generate_outcomes(path: Path, rows: int, keys: int, seed: int = 0) -> None:
+    """Write a synthetic normalized outcomes table with a mix of SMD, OR and r rows."""
+    rng = np.random.default_rng(seed)
+    key = rng.integers(0, keys, rows)
+    measure = np.array(["smd", "or", "r"])[key % 3]
+    n_t = rng.integers(15, 200, rows)
+    n_c = rng.integers(15, 200, rows)
+    true_effect = (key % 17 - 8) / 20 + rng.normal(0, 0.1, rows)
+    is_smd, is_or, is_r = measure == "smd", measure == "or", measure == "r"
+    blank = np.full(rows, "", dtype=object)
+
+    def fill(mask: np.ndarray, values: np.ndarray, fmt: str = "%.4f") -> List[str]:
+        column = blank.copy()
+        column[mask] = np.char.mod(fmt, values[mask])
+        return column.tolist()
+
+    sd_t, sd_c = rng.uniform(5, 15, rows), rng.uniform(5, 15, rows)
+    mean_c = rng.uniform(20, 40, rows)
+    mean_t = mean_c + true_effect * (sd_t + sd_c) / 2 + rng.normal(0, 1, rows)
+    p_c = rng.uniform(0.1, 0.6, rows)
+    p_t = 1 / (1 + (1 - p_c) / p_c * np.exp(-true_effect))
+    events_t, events_c = rng.binomial(n_t, p_t), rng.binomial(n_c, p_c)
+    r = np.tanh(true_effect + rng.normal(0, 0.05, rows))
+
+    columns: Dict[str, List[str]] = {
+        "study_id": [f"S{i // 3:05d}" for i in range(rows)],
+        "outcome_id": [f"O{i % 3}" for i in range(rows)],
+        "intervention": [f"intervention-{k // 50}" for k in key],
+        "outcome": [f"outcome-{k % 50}" for k in key],
+        "timepoint": ["post"] * rows,
+        "mean_treat": fill(is_smd, mean_t),
+        "sd_treat": fill(is_smd, sd_t),
+        "n_treat": fill(is_smd | is_or, n_t, "%d"),
+        "mean_ctrl": fill(is_smd, mean_c),
+        "sd_ctrl": fill(is_smd, sd_c),
+        "n_ctrl": fill(is_smd | is_or, n_c, "%d"),
+        "events_treat": fill(is_or, events_t, "%d"),
+        "events_ctrl": fill(is_or, events_c, "%d"),
+        "r": fill(is_r, r),
+        "n": fill(is_r, n_t + n_c, "%d"),
+    }
+    write_columns(path, columns)
+
+
+def _row_effect(row) -> tuple:
+    if row["mean_treat"] == row["mean_treat"]:
+        n_t, n_c = row["n_treat"], row["n_ctrl"]
+        df = n_t + n_c - 2
+        sd = math.sqrt(
+            ((n_t - 1) * row["sd_treat"] ** 2 + (n_c - 1) * row["sd_ctrl"] ** 2) / df
+        )
+        g = (1 - 3 / (4 * df - 1)) * (row["mean_treat"] - row["mean_ctrl"]) / sd
+        return "smd", g, 1 / n_t + 1 / n_c + g**2 / (2 * (n_t + n_c))
+    if row["events_treat"] == row["events_treat"]:
+        cells = [
+            row["events_treat"],
+            row["n_treat"] - row["events_treat"],
+            row["events_ctrl"],
+            row["n_ctrl"] - row["events_ctrl"],
+        ]
+        if 0 in cells:
+            cells = [cell + 0.5 for cell in cells]
+        a, b, c, d = cells
+        return "or", math.log(a * d / (b * c)), sum(1 / cell for cell in cells)
+    return "r", math.atanh(row["r"]), 1 / (row["n"] - 3)
+
+
+def _reml_loglik(y: np.ndarray, v: np.ndarray, tau2: float) -> float:
+    w = 1 / (v + tau2)
+    mu = (w * y).sum() / w.sum()
+    return -0.5 * (
+        np.log(v + tau2).sum() + math.log(w.sum()) + (w * (y - mu) ** 2).sum()
+    )
+
+
+def _fit(y: np.ndarray, v: np.ndarray, method: str) -> float:
+    k = len(y)
+    w = 1 / v
+    fixed = (w * y).sum() / w.sum()
+    tau2 = 0.0
+    if k > 1:
+        q = (w * (y - fixed) ** 2).sum()
+        tau2 = max(0.0, (q - (k - 1)) / (w.sum() - (w * w).sum() / w.sum()))
+        if method == "REML":
+            loglik = _reml_loglik(y, v, tau2)
+            for _ in range(REML_MAX_ITER):
+                w = 1 / (v + tau2)
+                sw, sw2 = w.sum(), (w * w).sum()
+                mu = (w * y).sum() / sw
+                resid = y - mu
+                score = (w * w * resid**2).sum() - sw + sw2 / sw
+                expected = sw2 - 2 * (w**3).sum() / sw + (sw2 / sw) ** 2
+                observed = (
+                    2 * ((w**3 * resid**2).sum() - (w * w * resid).sum() ** 2 / sw)
+                    - expected
+                )
+                step = score / (observed if observed > 0 else expected)
+                for _ in range(REML_MAX_HALVING):
+                    updated = max(0.0, tau2 + step)
+                    updated_loglik = _reml_loglik(y, v, updated)
+                    if updated_loglik >= loglik - 1e-12:
+                        break
+                    step /= 2
+                converged = abs(updated - tau2) < REML_TOLERANCE
+                tau2, loglik = updated, updated_loglik
+                if converged:
+                    break
+    w = 1 / (v + tau2)
+    return float((w * y).sum() / w.sum())
+
+
+def baseline(normalized_path: Path, method: str) -> Dict[str, float]:
+    """Row-wise effect sizes and per-key fits, as the prototypes did it."""
+    import pandas as pd
+
+    frame = pd.read_csv(normalized_path)
+    effects = frame.apply(_row_effect, axis=1, result_type="expand")
+    frame["measure"], frame["yi"], frame["vi"] = effects[0], effects[1], effects[2]
+    frame["analysis_key"] = (
+        frame["measure"]
+        + ":"
+        + frame[list(KEY_COLUMNS)].astype(str).agg("|".join, axis=1)
+    )
+
+    def fit_group(group) -> float:
+        y, v = group["yi"].to_numpy(), group["vi"].to_numpy()
+        estimate = _fit(y, v, method)
+        if len(y) > 1:
+            # Leave-one-out refits, as the influence diagnostics did them.
+            for i in range(len(y)):
+                _fit(np.delete(y, i), np.delete(v, i), method)
+        return estimate
+
+    return frame.groupby("analysis_key")[["yi", "vi"]].apply(fit_group).to_dict()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare the vectorized meta engine with a row-wise baseline."
+    )
+    parser.add_argument(
+        "--rows", type=int, default=20_000, help="Outcome rows to generate."
+    )
+    parser.add_argument(
+        "--keys", type=int, default=2_000, help="Distinct analysis keys."
+    )
+    parser.add_argument(
+        "--method", default=DEFAULT_METHOD, choices=["DL", "REML"], type=str.upper
+    )
+    parser.add_argument(
+        "--skip-baseline", action="store_true", help="Only time the vectorized engine."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="meta-bench-") as tmp:
+        workdir = Path(tmp)
+        normalized = workdir / "normalized_outcomes.csv"
+        generate_outcomes(normalized, args.rows, args.keys)
+
+        start = time.perf_counter()
+        effect_stats = write_effects_table(normalized, workdir / "effects_table.csv")
+        meta_stats = write_meta_results(
+            workdir / "effects_table.csv", workdir / "meta_results.csv", args.method
+        )
+        vectorized = time.perf_counter() - start
+        print(f"vectorized: {vectorized:.2f}s ({effect_stats}; {meta_stats})")
+
+        if args.skip_baseline:
+            return 0
+        start = time.perf_counter()
+        expected = baseline(normalized, args.method)
+        row_wise = time.perf_counter() - start
+        print(f"row-wise:   {row_wise:.2f}s ({len(expected)} analysis keys)")
+
+        results = read_columns(workdir / "meta_results.csv")
+        estimates = dict(zip(results["analysis_key"], map(float, results["estimate"])))
+        max_diff = max(abs(estimates[key] - value) for key, value in expected.items())
+        print(
+            f"speed-up:   {row_wise / vectorized:.1f}x, max |estimate difference| {max_diff:.2e}"
+        )
+        return 0 if max_diff < 1e-6 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""
+Effect sizes for the Q5 stage (``meta.effect.compute``).
+
+Every function works on whole columns at once. Rows of
+``normalized_outcomes.csv`` may mix outcome types; the measure of each row is
+taken from its ``measure`` column when set and otherwise inferred from which
+fields are filled in:
+
+- ``smd``: Hedges' g from ``mean_/sd_/n_treat`` and ``mean_/sd_/n_ctrl``;
+- ``or``: log odds ratio from ``events_treat``/``n_treat`` and
+  ``events_ctrl``/``n_ctrl`` (0.5 added to every cell of a table with a zero);
+- ``r``: Fisher's z from the correlation ``r`` and sample size ``n``.
+
+The ``analysis_key`` groups rows that are pooled together in Q6. Unless the
+input already has one, it is ``measure:intervention|outcome|timepoint``, so
+different effect measures are never pooled with each other.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from meta.tables import numeric
+
+KEY_COLUMNS = ("intervention", "outcome", "timepoint")
+ID_COLUMNS = ("study_id", "outcome_id")
+_MEASURE_INPUTS = {
+    "smd": ("mean_treat", "sd_treat", "n_treat", "mean_ctrl", "sd_ctrl", "n_ctrl"),
+    "or": ("events_treat", "n_treat", "events_ctrl", "n_ctrl"),
+    "r": ("r", "n"),
+}
+_MEASURE_FIELDS = sorted({name for names in _MEASURE_INPUTS.values() for name in names})
+
+
+def hedges_g(
+    mean_t: np.ndarray,
+    sd_t: np.ndarray,
+    n_t: np.ndarray,
+    mean_c: np.ndarray,
+    sd_c: np.ndarray,
+    n_c: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Bias-corrected standardized mean difference and its sampling variance."""
+    df = n_t + n_c - 2
+    pooled_sd = np.sqrt(((n_t - 1) * sd_t**2 + (n_c - 1) * sd_c**2) / df)
+    correction = 1 - 3 / (4 * df - 1)
+    g = correction * (mean_t - mean_c) / pooled_sd
+    variance = 1 / n_t + 1 / n_c + g**2 / (2 * (n_t + n_c))
+    return g, variance
+
+
+def log_odds_ratio(
+    events_t: np.ndarray, n_t: np.ndarray, events_c: np.ndarray, n_c: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Log odds ratio and variance, with a 0.5 continuity correction for zero cells."""
+    cells = np.stack([events_t, n_t - events_t, events_c, n_c - events_c])
+    cells = cells + np.where((cells == 0).any(axis=0), 0.5, 0.0)
+    a, b, c, d = cells
+    return np.log(a * d / (b * c)), (1 / cells).sum(axis=0)
+
+
+def fisher_z(r: np.ndarray, n: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Fisher's z transform of a correlation and its variance ``1 / (n - 3)``."""
+    return np.arctanh(r), 1 / (n - 3)
+
+
+@dataclass
+class EffectStats:
+    rows: int = 0
+    computed: int = 0
+    keys: int = 0
+
+    @property
+    def skipped(self) -> int:
+        return self.rows - self.computed
+
+    def __str__(self) -> str:
+        return f"{self.computed} of {self.rows} rows -> effect sizes ({self.skipped} skipped), {self.keys} analysis keys"
+
+
+def _column(columns: Dict[str, List[str]], name: str, rows: int) -> np.ndarray:
+    return numeric(columns[name]) if name in columns else np.full(rows, np.nan)
+
+
+def infer_measures(
+    columns: Dict[str, List[str]], field: Dict[str, np.ndarray]
+) -> np.ndarray:
+    """The effect measure of each row: explicit ``measure`` or inferred from the parsed ``field`` columns."""
+    complete = {
+        measure: np.all([np.isfinite(field[name]) for name in names], axis=0)
+        for measure, names in _MEASURE_INPUTS.items()
+    }
+    inferred = np.select(
+        [complete["smd"], complete["or"], complete["r"]], ["smd", "or", "r"], default=""
+    ).astype(object)
+    if "measure" in columns:
+        explicit = np.array(
+            [value.strip().lower() for value in columns["measure"]], dtype=object
+        )
+        inferred = np.where(explicit != "", explicit, inferred)
+    return inferred
+
+
+def analysis_keys(columns: Dict[str, List[str]], measures: np.ndarray) -> List[str]:
+    rows = len(measures)
+    if "analysis_key" in columns and any(columns["analysis_key"]):
+        return list(columns["analysis_key"])
+    parts = [columns.get(name, [""] * rows) for name in KEY_COLUMNS]
+    return [
+        f"{measure}:{'|'.join(values)}" for measure, *values in zip(measures, *parts)
+    ]
+
+
+def compute_effects(
+    columns: Dict[str, List[str]]
+) -> Tuple[Dict[str, np.ndarray], EffectStats]:
+    """
+    Compute ``yi``/``vi`` for every row of a normalized outcomes table.
+
+    Returns arrays ``analysis_key``, ``measure``, ``yi``, ``vi`` and the ID
+    columns, restricted to rows whose effect size is finite, ordered by
+    ``analysis_key`` (stable within a key).
+    """
+    rows = len(next(iter(columns.values()), []))
+    stats = EffectStats(rows=rows)
+    field = {name: _column(columns, name, rows) for name in _MEASURE_FIELDS}
+    measures = infer_measures(columns, field)
+    yi = np.full(rows, np.nan)
+    vi = np.full(rows, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for measure, function in (
+            ("smd", hedges_g),
+            ("or", log_odds_ratio),
+            ("r", fisher_z),
+        ):
+            mask = measures == measure
+            if mask.any():
+                yi[mask], vi[mask] = function(
+                    *(field[name][mask] for name in _MEASURE_INPUTS[measure])
+                )
+
+    valid = np.isfinite(yi) & np.isfinite(vi) & (vi > 0)
+    keys = np.array(analysis_keys(columns, measures), dtype=object)
+    index = np.flatnonzero(valid)
+    index = index[np.argsort(keys[index], kind="stable")]
+
+    result = {
+        "analysis_key": keys[index],
+        "measure": measures[index],
+        "yi": yi[index],
+        "vi": vi[index],
+    }
+    for name in ID_COLUMNS:
+        values = columns.get(name)
+        result[name] = (
+            np.array(values, dtype=object)[index]
+            if values is not None
+            else np.full(len(index), "", dtype=object)
+        )
+    stats.computed = len(index)
+    stats.keys = len(set(result["analysis_key"]))
+    return result, stats
+
+
+def effect_label(study_ids: Sequence[str], outcome_ids: Sequence[str]) -> List[str]:
+    """Human-readable row labels (``study_id/outcome_id``) for diagnostics."""
+    return [
+        f"{study}/{outcome}" if outcome else study
+        for study, outcome in zip(study_ids, outcome_ids)
+    ]
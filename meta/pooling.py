@@ -0,0 +1,242 @@
+"""
+Random-effects pooling for the Q6 stage (``meta.run.*``).
+
+All analysis keys are pooled at once: rows carry an integer group index and
+every per-key sum is a ``np.bincount`` over it, so the cost is a handful of
+passes over the effects table rather than one model fit per key.
+
+- ``DL``: DerSimonian-Laird moment estimator of tau².
+- ``REML``: restricted maximum likelihood, solved by Newton steps (Fisher
+  scoring where the likelihood is not concave, with step halving) for every
+  key in the same pass, starting from the DL estimate, until all keys have
+  converged.
+
+I² uses the Higgins-Thompson "typical" within-study variance, so it is
+consistent with whichever tau² estimator was used (and equals the Q-based
+formula for DL). Confidence intervals and p-values are Wald-type (normal);
+Hartung-Knapp and prediction intervals need t quantiles and are left to the
+reporting step.
+
+``leave_one_out`` refits every key once per omitted row. The refits are
+pooled as one batch by expanding each key of size k into k groups of k-1
+rows, so it costs O(Σk²) rows in total.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+METHODS = ("DL", "REML")
+DEFAULT_METHOD = os.environ.get("META_METHOD", "REML").upper()
+Z_975 = 1.959963984540054
+REML_TOLERANCE = 1e-10
+REML_MAX_ITER = 100
+REML_MAX_HALVING = 20
+# Keys larger than this get no leave-one-out diagnostics (k² rows each).
+LOO_MAX_GROUP_SIZE = 2000
+
+
+@dataclass
+class PoolResult:
+    """Per-group arrays, indexed by group number."""
+
+    k: np.ndarray
+    estimate: np.ndarray
+    se: np.ndarray
+    tau2: np.ndarray
+    q: np.ndarray
+    i2: np.ndarray
+    iterations: int = 0
+
+    @property
+    def ci_low(self) -> np.ndarray:
+        return self.estimate - Z_975 * self.se
+
+    @property
+    def ci_high(self) -> np.ndarray:
+        return self.estimate + Z_975 * self.se
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.estimate / self.se
+
+    @property
+    def p(self) -> np.ndarray:
+        return np.array([math.erfc(abs(z) / math.sqrt(2)) for z in self.z.tolist()])
+
+
+def group_index(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique keys and the group number of every row."""
+    unique, groups = np.unique(keys, return_inverse=True)
+    return unique, groups.ravel()
+
+
+def _sums(groups: np.ndarray, size: int, *weights: np.ndarray):
+    return [np.bincount(groups, weights=w, minlength=size) for w in weights]
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(
+        numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0
+    )
+
+
+def _reml_loglik(
+    yi: np.ndarray, vi: np.ndarray, groups: np.ndarray, size: int, tau2: np.ndarray
+) -> np.ndarray:
+    total = vi + tau2[groups]
+    w = 1 / total
+    sw, swy, log_total = _sums(groups, size, w, w * yi, np.log(total))
+    mu = _safe_divide(swy, sw)
+    (rss,) = _sums(groups, size, w * (yi - mu[groups]) ** 2)
+    return -0.5 * (log_total + np.log(np.where(sw > 0, sw, 1.0)) + rss)
+
+
+def _reml(
+    yi: np.ndarray,
+    vi: np.ndarray,
+    groups: np.ndarray,
+    size: int,
+    tau2: np.ndarray,
+    active: np.ndarray,
+) -> Tuple[np.ndarray, int]:
+    tau2 = tau2.copy()
+    loglik = _reml_loglik(yi, vi, groups, size, tau2)
+    for iteration in range(1, REML_MAX_ITER + 1):
+        w = 1 / (vi + tau2[groups])
+        sw, swy, sw2, sw3 = _sums(groups, size, w, w * yi, w * w, w * w * w)
+        mu = _safe_divide(swy, sw)
+        resid = yi - mu[groups]
+        swr, swr2, sw3r2 = _sums(
+            groups, size, w * w * resid, w * w * resid**2, w**3 * resid**2
+        )
+        # Derivatives of the restricted log-likelihood in tau² (times two).
+        score = swr2 - sw + _safe_divide(sw2, sw)
+        expected = sw2 - 2 * _safe_divide(sw3, sw) + _safe_divide(sw2, sw) ** 2
+        observed = 2 * (sw3r2 - _safe_divide(swr * swr, sw)) - expected
+        information = np.where(observed > 0, observed, expected)
+        step = np.where(active, _safe_divide(score, information), 0.0)
+        # Newton steps can still overshoot far from the optimum; halve them where the likelihood drops.
+        for _ in range(REML_MAX_HALVING):
+            updated = np.maximum(0.0, tau2 + step)
+            updated_loglik = _reml_loglik(yi, vi, groups, size, updated)
+            worse = updated_loglik < loglik - 1e-12
+            if not worse.any():
+                break
+            step = np.where(worse, step / 2, step)
+        converged = np.abs(updated - tau2).max(initial=0.0) < REML_TOLERANCE
+        tau2, loglik = updated, updated_loglik
+        if converged:
+            return tau2, iteration
+    return tau2, REML_MAX_ITER
+
+
+def pool(
+    yi: np.ndarray,
+    vi: np.ndarray,
+    groups: np.ndarray,
+    size: Optional[int] = None,
+    method: str = DEFAULT_METHOD,
+) -> PoolResult:
+    """Random-effects estimate of every group in one pass (``groups`` are 0..size-1)."""
+    method = method.upper()
+    if method not in METHODS:
+        raise ValueError(
+            f"Unknown tau² estimator {method!r}; expected one of {', '.join(METHODS)}."
+        )
+    yi = np.asarray(yi, dtype=np.float64)
+    vi = np.asarray(vi, dtype=np.float64)
+    size = int(groups.max()) + 1 if size is None else size
+
+    k = np.bincount(groups, minlength=size)
+    w = 1 / vi
+    sw, swy, sw2 = _sums(groups, size, w, w * yi, w * w)
+    fixed = _safe_divide(swy, sw)
+    (q,) = _sums(groups, size, w * (yi - fixed[groups]) ** 2)
+    df = np.maximum(k - 1, 0).astype(np.float64)
+    c = sw - _safe_divide(sw2, sw)
+    active = k > 1
+    tau2 = np.where(active, np.maximum(0.0, _safe_divide(q - df, c)), 0.0)
+
+    iterations = 0
+    if method == "REML" and active.any():
+        tau2, iterations = _reml(yi, vi, groups, size, tau2, active)
+
+    w_re = 1 / (vi + tau2[groups])
+    sw_re, swy_re = _sums(groups, size, w_re, w_re * yi)
+    typical_variance = _safe_divide(df * sw, sw * sw - sw2)
+    return PoolResult(
+        k=k,
+        estimate=_safe_divide(swy_re, sw_re),
+        se=np.sqrt(_safe_divide(np.ones(size), sw_re)),
+        tau2=tau2,
+        q=q,
+        i2=100 * _safe_divide(tau2, tau2 + typical_variance),
+        iterations=iterations,
+    )
+
+
+def leave_one_out(
+    yi: np.ndarray,
+    vi: np.ndarray,
+    groups: np.ndarray,
+    size: Optional[int] = None,
+    method: str = DEFAULT_METHOD,
+) -> np.ndarray:
+    """
+    Pooled estimate of each row's group with that row left out.
+
+    Rows of groups with fewer than two rows (or more than
+    ``LOO_MAX_GROUP_SIZE``) get NaN.
+    """
+    size = int(groups.max()) + 1 if size is None else size
+    rows = len(groups)
+    result = np.full(rows, np.nan)
+    k = np.bincount(groups, minlength=size)
+    eligible = (k[groups] >= 2) & (k[groups] <= LOO_MAX_GROUP_SIZE)
+    if not eligible.any():
+        return result
+
+    order = np.argsort(groups, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(k)[:-1]])
+    left_out = order[eligible[order]]
+    group_sizes = k[groups[left_out]]
+    # Every left-out row i expands to the k rows of its group; dropping i itself leaves k-1.
+    pair_owner = np.repeat(np.arange(len(left_out)), group_sizes)
+    offsets = np.arange(group_sizes.sum()) - np.repeat(
+        np.cumsum(group_sizes) - group_sizes, group_sizes
+    )
+    pair_row = order[np.repeat(starts[groups[left_out]], group_sizes) + offsets]
+    keep = pair_row != left_out[pair_owner]
+    pair_owner, pair_row = pair_owner[keep], pair_row[keep]
+
+    refit = pool(yi[pair_row], vi[pair_row], pair_owner, len(left_out), method)
+    result[left_out] = refit.estimate
+    return result
+
+
+def influence_summary(
+    loo: np.ndarray, estimate: np.ndarray, groups: np.ndarray, size: int
+) -> Dict[str, np.ndarray]:
+    """Per group: range of leave-one-out estimates and the row whose removal moves it most."""
+    has_loo = np.isfinite(loo)
+    loo_min = np.full(size, np.inf)
+    loo_max = np.full(size, -np.inf)
+    np.minimum.at(loo_min, groups[has_loo], loo[has_loo])
+    np.maximum.at(loo_max, groups[has_loo], loo[has_loo])
+    loo_min[np.isinf(loo_min)] = np.nan
+    loo_max[np.isinf(loo_max)] = np.nan
+
+    shift = np.where(has_loo, np.abs(loo - estimate[groups]), -1.0)
+    order = np.lexsort((-shift, groups))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = groups[order][1:] != groups[order][:-1]
+    influential = np.full(size, -1)
+    best = order[first]
+    influential[groups[best]] = np.where(has_loo[best], best, -1)
+    return {"loo_min": loo_min, "loo_max": loo_max, "influential_row": influential}
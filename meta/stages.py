@@ -0,0 +1,208 @@
+"""
+Q5 and Q6 of ``adhd-metastudy.inq`` as ``inq.runner`` stages.
+
+    python -m inq adhd-metastudy.inq --stages meta.stages
+
+Q6 is partitioned by ``analysis_key``: when only some keys of
+``effects_table.csv`` changed, it re-pools just those keys and carries the
+other rows of the previous ``meta_results.csv`` over verbatim.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from inq.runner import StageContext, stage
+from meta.effects import ID_COLUMNS, EffectStats, compute_effects, effect_label
+from meta.pooling import (
+    DEFAULT_METHOD,
+    group_index,
+    influence_summary,
+    leave_one_out,
+    pool,
+)
+from meta.tables import format_numbers, numeric, read_columns, write_columns
+
+# The runner already hashes this package's sources; bump to force a rerun for
+# output changes it cannot see (e.g. a numpy upgrade).
+ENGINE_VERSION = "1"
+
+EFFECT_COLUMNS = ("analysis_key", *ID_COLUMNS, "measure", "yi", "vi")
+RESULT_COLUMNS = (
+    "analysis_key",
+    "measure",
+    "method",
+    "k",
+    "estimate",
+    "se",
+    "ci_low",
+    "ci_high",
+    "z",
+    "p",
+    "tau2",
+    "i2",
+    "q",
+    "loo_min",
+    "loo_max",
+    "loo_influential",
+)
+
+
+@dataclass
+class MetaStats:
+    keys: int = 0
+    pooled: int = 0
+    reused: int = 0
+    iterations: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.keys} analysis keys ({self.pooled} pooled, {self.reused} reused), "
+            f"{self.iterations} REML iterations"
+        )
+
+
+def write_effects_table(normalized_path: Path, effects_path: Path) -> EffectStats:
+    """Compute ``effects_table.csv`` from ``normalized_outcomes.csv``."""
+    effects, stats = compute_effects(read_columns(normalized_path))
+    columns: Dict[str, List[str]] = {}
+    for name in EFFECT_COLUMNS:
+        values = effects[name]
+        columns[name] = (
+            format_numbers(values) if name in ("yi", "vi") else values.tolist()
+        )
+    write_columns(effects_path, columns)
+    return stats
+
+
+def meta_results(
+    effects: Dict[str, List[str]], method: str = DEFAULT_METHOD
+) -> Tuple[Dict[str, List[str]], int]:
+    """Pool every analysis key of an effects table into ``RESULT_COLUMNS`` strings (plus REML iterations)."""
+    keys = np.array(effects["analysis_key"], dtype=object)
+    if not len(keys):
+        return {name: [] for name in RESULT_COLUMNS}, 0
+    yi, vi = numeric(effects["yi"]), numeric(effects["vi"])
+    unique, groups = group_index(keys)
+    size = len(unique)
+    result = pool(yi, vi, groups, size, method)
+    loo = leave_one_out(yi, vi, groups, size, method)
+    influence = influence_summary(loo, result.estimate, groups, size)
+
+    labels = effect_label(
+        effects.get("study_id", [""] * len(keys)),
+        effects.get("outcome_id", [""] * len(keys)),
+    )
+    first_row = np.zeros(size, dtype=np.int64)
+    first_row[groups[::-1]] = np.arange(len(groups))[::-1]
+    measures = effects.get("measure", [""] * len(keys))
+
+    columns = {
+        "analysis_key": unique.tolist(),
+        "measure": [measures[row] for row in first_row],
+        "method": [method.upper()] * size,
+        "k": [str(k) for k in result.k.tolist()],
+        "estimate": format_numbers(result.estimate),
+        "se": format_numbers(result.se),
+        "ci_low": format_numbers(result.ci_low),
+        "ci_high": format_numbers(result.ci_high),
+        "z": format_numbers(result.z),
+        "p": format_numbers(result.p),
+        "tau2": format_numbers(result.tau2),
+        "i2": format_numbers(result.i2),
+        "q": format_numbers(result.q),
+        "loo_min": format_numbers(influence["loo_min"]),
+        "loo_max": format_numbers(influence["loo_max"]),
+        "loo_influential": [
+            labels[row] if row >= 0 else ""
+            for row in influence["influential_row"].tolist()
+        ],
+    }
+    return columns, result.iterations
+
+
+def _select(columns: Dict[str, List[str]], rows: List[int]) -> Dict[str, List[str]]:
+    return {name: [values[row] for row in rows] for name, values in columns.items()}
+
+
+def write_meta_results(
+    effects_path: Path,
+    results_path: Path,
+    method: str = DEFAULT_METHOD,
+    changed_keys: Optional[Set[str]] = None,
+) -> MetaStats:
+    """
+    Pool ``effects_table.csv`` into ``meta_results.csv``.
+
+    With ``changed_keys`` and an existing results file, only those keys are
+    re-pooled; rows for other keys are kept as they are and rows for keys
+    that disappeared are dropped.
+    """
+    effects = read_columns(effects_path)
+    previous = None
+    if changed_keys is not None and results_path.exists():
+        previous = read_columns(results_path)
+        if tuple(previous) != RESULT_COLUMNS:
+            previous = None
+
+    if previous is not None:
+        keep = [
+            row
+            for row, key in enumerate(effects["analysis_key"])
+            if key in changed_keys
+        ]
+        effects = _select(effects, keep)
+
+    fresh, iterations = meta_results(effects, method)
+    stats = MetaStats(pooled=len(fresh["analysis_key"]), iterations=iterations)
+
+    if previous is not None:
+        carried = [
+            row
+            for row, key in enumerate(previous["analysis_key"])
+            if key not in changed_keys
+        ]
+        stats.reused = len(carried)
+        previous = _select(previous, carried)
+        merged = {name: previous[name] + fresh[name] for name in RESULT_COLUMNS}
+        order = sorted(
+            range(len(merged["analysis_key"])), key=merged["analysis_key"].__getitem__
+        )
+        fresh = _select(merged, order)
+
+    stats.keys = len(fresh["analysis_key"])
+    write_columns(results_path, fresh)
+    return stats
+
+
+@stage("Q5", version=ENGINE_VERSION)
+def compute_effect_sizes(ctx: StageContext) -> None:
+    stats = write_effects_table(
+        ctx.inputs["normalized_outcomes.csv"], ctx.outputs["effects_table.csv"]
+    )
+    print(f"[Q5] {stats}")
+
+
+def pooling_params() -> Dict[str, str]:
+    """Q6 configuration; a different method re-pools every key instead of mixing methods."""
+    return {"method": DEFAULT_METHOD}
+
+
+@stage(
+    "Q6",
+    partition={"effects_table.csv": "analysis_key"},
+    version=ENGINE_VERSION,
+    params=pooling_params,
+)
+def run_random_effects(ctx: StageContext) -> None:
+    stats = write_meta_results(
+        ctx.inputs["effects_table.csv"],
+        ctx.outputs["meta_results.csv"],
+        method=ctx.params["method"],
+        changed_keys=ctx.changed_keys("effects_table.csv"),
+    )
+    print(f"[Q6] {stats}")
@@ -0,0 +1,61 @@
+"""
+Column-oriented CSV helpers for the metastudy artifacts.
+
+Tables are read into ``{column: [str, ...]}`` and written back from
+string columns, so a row that is carried over unchanged from a previous run
+keeps exactly the same bytes (which keeps ``inq.runner`` partition digests
+stable).
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+FLOAT_FORMAT = "%.10g"
+
+
+def read_columns(path: Path | str) -> Dict[str, List[str]]:
+    """Read a CSV file into a mapping of column name to string values."""
+    with Path(path).open("r", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, [])
+        rows = list(reader)
+    if not rows:
+        return {name: [] for name in header}
+    width = len(header)
+    columns = zip(
+        *(row if len(row) == width else (row + [""] * width)[:width] for row in rows)
+    )
+    return dict(zip(header, map(list, columns)))
+
+
+def numeric(values: Sequence[str]) -> np.ndarray:
+    """Parse a string column as float64, with blanks and ``NA`` as NaN."""
+    return np.array(
+        [value if value and value != "NA" else "nan" for value in values],
+        dtype=np.float64,
+    )
+
+
+def format_numbers(values: np.ndarray) -> List[str]:
+    """Format floats with ``FLOAT_FORMAT``, leaving NaN blank."""
+    values = np.asarray(values, dtype=np.float64)
+    formatted = np.char.mod(FLOAT_FORMAT, values)
+    formatted[np.isnan(values)] = ""
+    return formatted.tolist()
+
+
+def write_columns(path: Path | str, columns: Dict[str, Sequence[str]]) -> None:
+    """Write string columns to ``path`` atomically."""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.partial")
+    with tmp_path.open("w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, lineterminator="\n")
+        writer.writerow(list(columns))
+        writer.writerows(zip(*columns.values()))
+    os.replace(tmp_path, path)
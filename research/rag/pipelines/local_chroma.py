@@ -1,19 +1,56 @@
-"""Local Chroma-based RAG helpers for ADHD research."""
+"""
+Local Chroma-based RAG helpers for ADHD research.
+
+``chromadb`` is imported when a client or collection is first created, so the
+corpus helpers load without it. The embedding cache, BM25 index and metrics
+come from the ``rag_cache``, ``rag_lexical`` and ``rag_metrics`` modules in the
+repository's ``scripts/`` directory, which must be importable (e.g.
+``PYTHONPATH=scripts``, as ``rag_bench`` arranges).
+"""
 
 from __future__ import annotations
 
 import json
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
 
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import rag_metrics
+from rag_cache import CachedEmbeddingFunction, text_hash
+from rag_lexical import LexicalIndex, reciprocal_rank_fusion
 
+if TYPE_CHECKING:
+    import chromadb
 
-@dataclass
+# OpenAI's embedding endpoint accepts up to 8191 tokens per input and ~300k per
+# request; stay well below the request limit.
+DEFAULT_BATCH_TOKENS = 100_000
+MAX_BATCH_DOCUMENTS = 2048
+DEFAULT_EMBED_WORKERS = int(os.environ.get("RAG_EMBED_WORKERS", 4))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get("RAG_EMBED_RPM", 3000))
+DEFAULT_TOKENS_PER_MINUTE = float(os.environ.get("RAG_EMBED_TPM", 1_000_000))
+CHARS_PER_TOKEN = 4
+DEFAULT_READ_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+CORPUS_JSONL = "corpus.jsonl"
+# Chroma's SQLite backend limits how many IDs one ``get`` can bind.
+_GET_BATCH = 500
+
+
+@dataclass(slots=True)
 class CorpusDocument:
     """Metadata wrapper for a processed corpus chunk."""
 
@@ -23,49 +60,134 @@ class CorpusDocument:
     tags: List[str]
     metadata: dict
 
+    def to_record(self) -> dict:
+        return {
+            "id": self.doc_id,
+            "text": self.text,
+            "source": self.source,
+            "tags": self.tags,
+            **self.metadata,
+        }
+
+    @classmethod
+    def from_record(
+        cls, record: dict, doc_id: Optional[str] = None
+    ) -> "CorpusDocument":
+        return cls(
+            doc_id=doc_id or record["id"],
+            text=record.get("text", ""),
+            source=record.get("source", ""),
+            tags=record.get("tags", []),
+            metadata={
+                k: v
+                for k, v in record.items()
+                if k not in {"id", "text", "source", "tags"}
+            },
+        )
 
-def load_corpus(processed_dir: Path, index_path: Optional[Path] = None) -> List[CorpusDocument]:
-    """Load processed corpus files and optional metadata index."""
 
-    documents: List[CorpusDocument] = []
+def load_corpus(
+    processed_dir: Path,
+    index_path: Optional[Path] = None,
+    workers: int = DEFAULT_READ_WORKERS,
+) -> Iterator[CorpusDocument]:
+    """
+    Lazily yield processed corpus documents.
+
+    Reads ``processed_dir / CORPUS_JSONL`` (or ``processed_dir`` itself when it
+    is a ``.jsonl`` file) sequentially if present. Otherwise the per-chunk JSON
+    files listed in ``index_path`` (or every ``*.json`` in ``processed_dir``)
+    are read by a thread pool, keeping at most ``workers * 4`` files in flight
+    and yielding documents in index order. Entries whose file is missing are
+    skipped.
+    """
+
+    jsonl_path = (
+        processed_dir
+        if processed_dir.suffix == ".jsonl"
+        else processed_dir / CORPUS_JSONL
+    )
+    if jsonl_path.is_file():
+        yield from iter_corpus_jsonl(jsonl_path)
+        return
 
     if index_path and index_path.exists():
         index = json.loads(index_path.read_text())
-        for item in index:
-            chunk_path = processed_dir / Path(item["path"]).name
-            if not chunk_path.exists():
-                continue
-            payload = json.loads(chunk_path.read_text())
-            documents.append(
-                CorpusDocument(
-                    doc_id=item["id"],
-                    text=payload["text"],
-                    source=item.get("source", ""),
-                    tags=item.get("tags", []),
-                    metadata={k: v for k, v in item.items() if k not in {"id", "path", "source", "tags"}},
-                )
-            )
-        return documents
-
-    # fallback: load every JSON file in processed_dir
-    for file_path in processed_dir.glob("*.json"):
-        payload = json.loads(file_path.read_text())
-        documents.append(
-            CorpusDocument(
-                doc_id=file_path.stem,
-                text=payload.get("text", ""),
-                source=payload.get("source", ""),
-                tags=payload.get("tags", []),
-                metadata={k: v for k, v in payload.items() if k not in {"text", "source", "tags"}},
-            )
+        entries = ((processed_dir / Path(item["path"]).name, item) for item in index)
+    else:
+        # fallback: load every JSON file in processed_dir
+        entries = (
+            (file_path, None) for file_path in sorted(processed_dir.glob("*.json"))
         )
 
-    return documents
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending: deque = deque()
+        for chunk_path, item in entries:
+            pending.append(executor.submit(_read_chunk, chunk_path, item))
+            if len(pending) >= 4 * max(1, workers):
+                document = pending.popleft().result()
+                if document is not None:
+                    yield document
+        while pending:
+            document = pending.popleft().result()
+            if document is not None:
+                yield document
+
+
+def _read_chunk(chunk_path: Path, item: Optional[dict]) -> Optional[CorpusDocument]:
+    try:
+        payload = json.loads(chunk_path.read_bytes())
+    except FileNotFoundError:
+        return None
+    if item is None:
+        return CorpusDocument.from_record(payload, doc_id=chunk_path.stem)
+    return CorpusDocument(
+        doc_id=item["id"],
+        text=payload["text"],
+        source=item.get("source", ""),
+        tags=item.get("tags", []),
+        metadata={
+            k: v for k, v in item.items() if k not in {"id", "path", "source", "tags"}
+        },
+    )
+
+
+def iter_corpus_jsonl(path: Path) -> Iterator[CorpusDocument]:
+    """Yield documents from a JSON Lines corpus (one ``to_record`` object per line)."""
+
+    with path.open("rb") as handle:
+        for line in handle:
+            if line.strip():
+                yield CorpusDocument.from_record(json.loads(line))
+
+
+def write_corpus_jsonl(documents: Iterable[CorpusDocument], path: Path) -> int:
+    """
+    Write ``documents`` to a JSON Lines corpus and return how many were written.
+
+    ``write_corpus_jsonl(load_corpus(processed, index), processed / CORPUS_JSONL)``
+    converts per-chunk JSON files into the single-file format.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(path.suffix + ".partial")
+    count = 0
+    with partial.open("w", encoding="utf-8") as handle:
+        for doc in documents:
+            handle.write(json.dumps(doc.to_record(), ensure_ascii=False) + "\n")
+            count += 1
+    partial.replace(path)
+    return count
 
 
 def get_chroma_client(persist_directory: Path) -> chromadb.Client:
+    import chromadb
+    from chromadb.config import Settings
+
     persist_directory.mkdir(parents=True, exist_ok=True)
-    return chromadb.Client(Settings(persist_directory=str(persist_directory), anonymized_telemetry=False))
+    return chromadb.Client(
+        Settings(persist_directory=str(persist_directory), anonymized_telemetry=False)
+    )
 
 
 def build_collection(
@@ -73,8 +195,16 @@ def build_collection(
     name: str,
     embed_model: Optional[str] = None,
     openai_api_key: Optional[str] = None,
+    use_embedding_cache: bool = True,
 ) -> chromadb.api.models.Collection.Collection:
-    """Get or create a Chroma collection with the requested embedding function."""
+    """
+    Get or create a Chroma collection with the requested embedding function.
+
+    Embeddings go through the shared on-disk cache in ``scripts/rag_cache.py``
+    unless ``use_embedding_cache`` is False.
+    """
+    import chromadb
+    from chromadb.utils import embedding_functions
 
     embedding_function = None
 
@@ -87,6 +217,10 @@ def build_collection(
                 api_key=api_key,
                 model_name=embed_model,
             )
+            if use_embedding_cache:
+                embedding_function = CachedEmbeddingFunction(
+                    embedding_function, embed_model
+                )
         else:
             raise ValueError(f"Unsupported embedding model: {embed_model}")
 
@@ -96,34 +230,209 @@ def build_collection(
             collection._embedding_function = embedding_function
         return collection
     except chromadb.errors.InvalidCollectionError:
-        return client.create_collection(name=name, embedding_function=embedding_function)
+        return client.create_collection(
+            name=name, embedding_function=embedding_function
+        )
 
 
-def upsert_documents(
-    collection: chromadb.api.models.Collection.Collection,
+@dataclass
+class UpsertStats:
+    """Counters reported by ``upsert_documents``."""
+
+    seen: int = 0
+    skipped: int = 0
+    upserted: int = 0
+    batches: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.upserted / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.upserted} upserted, {self.skipped} unchanged of {self.seen} "
+            f"in {self.batches} batches (~{self.tokens} tokens, "
+            f"{self.seconds:.1f}s, {self.docs_per_second:.1f} docs/s)"
+        )
+
+
+class RateLimiter:
+    """Thread-safe sliding-window limit on requests and tokens per minute; 0 means unlimited."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        if requests_per_minute < 0 or tokens_per_minute < 0:
+            raise ValueError(
+                f"Rate limits must be >= 0 (0 disables a limit), got "
+                f"{requests_per_minute} requests and {tokens_per_minute} tokens per minute."
+            )
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+        if self.tokens_per_minute:
+            # A single request larger than the whole budget waits for an empty window.
+            tokens = min(tokens, int(self.tokens_per_minute))
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._events = [(t, n) for t, n in self._events if now - t < 60.0]
+                used = sum(n for _, n in self._events)
+                if (
+                    not self.requests_per_minute
+                    or len(self._events) < self.requests_per_minute
+                ) and (
+                    not self.tokens_per_minute
+                    or used + tokens <= self.tokens_per_minute
+                ):
+                    self._events.append((now, tokens))
+                    return
+                wait = 60.0 - (now - self._events[0][0])
+            time.sleep(max(wait, 0.01))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def document_metadata(doc: CorpusDocument) -> dict:
+    metadata = {"source": doc.source, "tags": doc.tags, **doc.metadata}
+    metadata["content_hash"] = text_hash(
+        doc.text + "\0" + json.dumps(metadata, sort_keys=True, default=str)
+    )
+    return metadata
+
+
+def token_batches(
     documents: Iterable[CorpusDocument],
-    batch_size: int = 64,
-) -> None:
-    """Insert or update documents inside the Chroma collection."""
+    max_tokens: int = DEFAULT_BATCH_TOKENS,
+    max_documents: int = MAX_BATCH_DOCUMENTS,
+) -> Iterator[List[CorpusDocument]]:
+    """Group documents so each batch stays under ``max_tokens`` (estimated) and ``max_documents``."""
 
     batch: List[CorpusDocument] = []
-
+    batch_tokens = 0
     for doc in documents:
+        tokens = estimate_tokens(doc.text)
+        if batch and (
+            batch_tokens + tokens > max_tokens or len(batch) >= max_documents
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
         batch.append(doc)
-        if len(batch) >= batch_size:
-            _flush_batch(collection, batch)
-            batch.clear()
-
+        batch_tokens += tokens
     if batch:
-        _flush_batch(collection, batch)
+        yield batch
 
 
-def _flush_batch(collection, batch: List[CorpusDocument]) -> None:
-    collection.upsert(
-        ids=[doc.doc_id for doc in batch],
-        documents=[doc.text for doc in batch],
-        metadatas=[{"source": doc.source, "tags": doc.tags, **doc.metadata} for doc in batch],
-    )
+def existing_hashes(collection, ids: Sequence[str]) -> Dict[str, Optional[str]]:
+    """Return ``{id: content_hash}`` for the IDs already stored in the collection."""
+
+    hashes: Dict[str, Optional[str]] = {}
+    for start in range(0, len(ids), _GET_BATCH):
+        result = collection.get(
+            ids=list(ids[start : start + _GET_BATCH]), include=["metadatas"]
+        )
+        for doc_id, metadata in zip(result["ids"], result["metadatas"]):
+            hashes[doc_id] = (metadata or {}).get("content_hash")
+    return hashes
+
+
+def upsert_documents(
+    collection: chromadb.api.models.Collection.Collection,
+    documents: Iterable[CorpusDocument],
+    batch_size: int = MAX_BATCH_DOCUMENTS,
+    batch_tokens: int = DEFAULT_BATCH_TOKENS,
+    workers: int = DEFAULT_EMBED_WORKERS,
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+    skip_unchanged: bool = True,
+    lexical: Optional[LexicalIndex] = None,
+) -> UpsertStats:
+    """
+    Insert or update documents inside the Chroma collection.
+
+    Documents whose text and metadata match the ``content_hash`` already stored
+    for their ID are skipped. The rest are grouped into batches of roughly
+    ``batch_tokens`` tokens and at most ``batch_size`` documents, and embedded
+    by up to ``workers`` concurrent requests, throttled to the given per-minute
+    limits (0 disables a limit). Writes to Chroma stay on the calling thread.
+    Pass the ``lexical`` index from ``build_lexical_index`` to keep it in sync
+    with the upserted documents.
+    """
+    stats = UpsertStats()
+    started = time.perf_counter()
+    embed: Optional[Callable] = getattr(collection, "_embedding_function", None)
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+    def embed_batch(batch: List[CorpusDocument]):
+        tokens = sum(estimate_tokens(doc.text) for doc in batch)
+        with rag_metrics.span("chroma.rate_limit_wait"):
+            limiter.acquire(tokens)
+        rag_metrics.incr("chroma.tokens_sent", tokens)
+        with rag_metrics.span("chroma.embed") as span:
+            span.set(batch_size=len(batch), tokens=tokens)
+            return embed([doc.text for doc in batch])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = []
+        max_documents = max(1, min(batch_size, MAX_BATCH_DOCUMENTS))
+        for batch in token_batches(
+            documents, max_tokens=batch_tokens, max_documents=max_documents
+        ):
+            stats.seen += len(batch)
+            skipped_before = stats.skipped
+            metadatas = [document_metadata(doc) for doc in batch]
+            if skip_unchanged:
+                with rag_metrics.span("chroma.fetch_hashes"):
+                    stored = existing_hashes(collection, [doc.doc_id for doc in batch])
+                keep = [
+                    i
+                    for i, doc in enumerate(batch)
+                    if stored.get(doc.doc_id) != metadatas[i]["content_hash"]
+                ]
+                stats.skipped += len(batch) - len(keep)
+                batch = [batch[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+            rag_metrics.incr("chroma.skipped", stats.skipped - skipped_before)
+            if not batch:
+                continue
+            rag_metrics.observe("chroma.batch_size", len(batch))
+            stats.batches += 1
+            if lexical is not None:
+                lexical.remove(doc.doc_id for doc in batch)
+                lexical.add([doc.doc_id for doc in batch], [doc.text for doc in batch])
+            stats.tokens += sum(estimate_tokens(doc.text) for doc in batch)
+            future = executor.submit(embed_batch, batch) if embed is not None else None
+            pending.append((batch, metadatas, future))
+            # Bound memory: keep at most two rounds of batches in flight.
+            while len(pending) > 2 * max(1, workers):
+                stats.upserted += _flush_batch(collection, *pending.pop(0))
+        while pending:
+            stats.upserted += _flush_batch(collection, *pending.pop(0))
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _flush_batch(
+    collection, batch: List[CorpusDocument], metadatas: List[dict], future=None
+) -> int:
+    embeddings = future.result() if future is not None else None
+    with rag_metrics.span("chroma.upsert"):
+        collection.upsert(
+            ids=[doc.doc_id for doc in batch],
+            documents=[doc.text for doc in batch],
+            metadatas=metadatas,
+            embeddings=embeddings,
+        )
+    rag_metrics.incr("chroma.upserted", len(batch))
+    return len(batch)
 
 
 def query(
@@ -133,9 +442,96 @@ def query(
 ) -> List[dict]:
     """Return top matches for the given query."""
 
-    result = collection.query(query_texts=[query_text], n_results=n_results)
-    matches = []
-    for ids, docs, metadatas in zip(result["ids"], result["documents"], result["metadatas"]):
+    return query_batch(collection, [query_text], n_results=n_results)[0]
+
+
+def query_batch(
+    collection: chromadb.api.models.Collection.Collection,
+    query_texts: Sequence[str],
+    n_results: int = 4,
+) -> List[List[dict]]:
+    """
+    Return top matches for each query using a single Chroma query call.
+
+    Chroma embeds every query text in one embedding-function call and searches
+    them together. Results are over-fetched slightly and deduplicated by text
+    per query.
+    """
+
+    if not query_texts:
+        return []
+    fetch = min(max(2 * n_results, n_results + 4), max(collection.count(), 1))
+    with rag_metrics.span("chroma.query") as span:
+        span.set(queries=len(query_texts))
+        result = collection.query(query_texts=list(query_texts), n_results=fetch)
+    batches = []
+    for ids, docs, metadatas in zip(
+        result["ids"], result["documents"], result["metadatas"]
+    ):
+        seen = set()
+        matches = []
         for doc_id, text, metadata in zip(ids, docs, metadatas):
+            if text in seen:
+                continue
+            seen.add(text)
             matches.append({"id": doc_id, "text": text, "metadata": metadata})
+            if len(matches) == n_results:
+                break
+        batches.append(matches)
+    return batches
+
+
+def build_lexical_index(
+    collection: chromadb.api.models.Collection.Collection,
+    page_size: int = 1000,
+) -> LexicalIndex:
+    """Build an in-memory BM25 index over every document stored in the collection."""
+    lexical = LexicalIndex()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return lexical
+        lexical.add(page["ids"], [text or "" for text in page["documents"]])
+        offset += len(page["ids"])
+
+
+def hybrid_query(
+    collection: chromadb.api.models.Collection.Collection,
+    lexical: LexicalIndex,
+    query_text: str,
+    n_results: int = 4,
+) -> List[dict]:
+    """
+    Return top matches fusing Chroma's vector ranking with BM25 (reciprocal-rank fusion).
+
+    Exact terms such as rating-scale or compound names are often missed by the
+    embedding model alone; the lexical ranking recovers them.
+    """
+    fetch = max(2 * n_results, n_results + 4)
+    vector_ids = [
+        match["id"]
+        for match in query_batch(collection, [query_text], n_results=fetch)[0]
+    ]
+    lexical_ids = [doc_id for doc_id, _ in lexical.search(query_text, fetch)]
+    fused = [doc_id for doc_id, _ in reciprocal_rank_fusion([vector_ids, lexical_ids])]
+    if not fused:
+        return []
+    found = collection.get(ids=fused[:_GET_BATCH], include=["documents", "metadatas"])
+    by_id = {
+        doc_id: {"id": doc_id, "text": text, "metadata": metadata}
+        for doc_id, text, metadata in zip(
+            found["ids"], found["documents"], found["metadatas"]
+        )
+    }
+    seen = set()
+    matches = []
+    for doc_id in fused:
+        match = by_id.get(doc_id)
+        if match is None or match["text"] in seen:
+            continue
+        seen.add(match["text"])
+        matches.append(match)
+        if len(matches) == n_results:
+            break
     return matches
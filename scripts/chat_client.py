@@ -0,0 +1,286 @@
+"""
+Pooled asyncio HTTP client for the chat-completion endpoints.
+
+Shared by ``rag_utils.call_chat_api`` (Terpedia KB chat) and
+``generate_reports.call_openrouter``. One ``AsyncChatClient`` keeps a
+connection pool open, caps the number of in-flight requests, retries 429 and
+5xx responses with exponential backoff (honouring ``Retry-After``), and can
+stream OpenAI-style server-sent events token by token.
+
+Inside an event loop (e.g. FastAPI) use ``get_client()`` to share a client per
+loop; CLIs call the sync wrappers, which go through ``run_sync``. The sync
+wrappers keep their ``requests``-based contract: ``requests_errors`` and
+``to_requests_response`` translate httpx exceptions and responses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import httpx
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_CONCURRENCY = 8
+
+T = TypeVar("T")
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Backoff before retry number ``attempt`` (1-based), with full jitter."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.replace(".", "", 1).isdigit():
+                return min(float(retry_after), self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+class AsyncChatClient:
+    """Connection-pooled, concurrency-bounded JSON POST client with retries."""
+
+    def __init__(
+        self,
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        retry: Optional[RetryPolicy] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.retry = retry or RetryPolicy()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncChatClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        POST ``payload`` and return the final response.
+
+        Retryable statuses and transport errors are retried up to
+        ``retry.max_attempts`` times; the last response is returned as-is so the
+        caller decides how to report HTTP errors.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(
+                        url,
+                        json=payload,
+                        headers=headers,
+                        timeout=(
+                            timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                        ),
+                    )
+            except httpx.TransportError:
+                if attempt >= self.retry.max_attempts:
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+
+            if (
+                response.status_code in self.retry.retry_statuses
+                and attempt < self.retry.max_attempts
+            ):
+                await asyncio.sleep(self.retry.delay(attempt, response))
+                continue
+            return response
+
+    async def stream_sse(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        POST ``payload`` with ``"stream": true`` and yield content deltas.
+
+        Expects OpenAI-style server-sent events (``data: {...}`` lines ending
+        with ``data: [DONE]``). Retries apply only until the first byte arrives.
+        """
+        payload = {**payload, "stream": True}
+        attempt = 0
+        started = False
+        while True:
+            attempt += 1
+            async with self._semaphore:
+                try:
+                    async with self._client.stream(
+                        "POST",
+                        url,
+                        json=payload,
+                        headers=headers,
+                        timeout=(
+                            timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                        ),
+                    ) as response:
+                        if (
+                            response.status_code in self.retry.retry_statuses
+                            and attempt < self.retry.max_attempts
+                        ):
+                            delay = self.retry.delay(attempt, response)
+                        else:
+                            if response.status_code >= 400:
+                                await response.aread()
+                                response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                delta = _parse_sse_line(line)
+                                if delta is None:
+                                    break
+                                if delta:
+                                    started = True
+                                    yield delta
+                            return
+                except httpx.TransportError:
+                    if started or attempt >= self.retry.max_attempts:
+                        raise
+                    delay = self.retry.delay(attempt)
+            await asyncio.sleep(delay)
+
+
+def _parse_sse_line(line: str) -> Optional[str]:
+    """Return the content delta of one SSE line, ``""`` to skip it, or ``None`` at ``[DONE]``."""
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:") :].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        return ""
+    choices = event.get("choices") or [{}]
+    delta = choices[0].get("delta") or choices[0].get("message") or {}
+    return delta.get("content") or ""
+
+
+_loop_clients: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncChatClient]"
+) = weakref.WeakKeyDictionary()
+_loop_clients_lock = threading.Lock()
+
+
+def get_client() -> AsyncChatClient:
+    """Return the shared client for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _loop_clients_lock:
+        client = _loop_clients.get(loop)
+        if client is None:
+            client = _loop_clients[loop] = AsyncChatClient()
+        return client
+
+
+def run_sync(awaitable: Awaitable[T]) -> T:
+    """
+    Run ``awaitable`` to completion from synchronous code.
+
+    Works inside environments that already run an event loop in this thread
+    (Jupyter, Colab) by running it on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_with_own_client(awaitable))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, _with_own_client(awaitable)).result()
+
+
+async def _with_own_client(awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` and close the loop's shared client before the loop ends."""
+    try:
+        return await awaitable
+    finally:
+        loop = asyncio.get_running_loop()
+        with _loop_clients_lock:
+            client = _loop_clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+def to_requests_response(response: httpx.Response) -> "requests.Response":
+    """Copy a fully read ``httpx.Response`` into a ``requests.Response``."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.reason = response.reason_phrase
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.encoding = response.encoding
+    converted._content = response.content
+    try:
+        converted.url = str(response.request.url)
+    except RuntimeError:  # built without a request
+        converted.url = ""
+    return converted
+
+
+@contextmanager
+def requests_errors() -> Iterator[None]:
+    """Re-raise httpx errors as the ``requests`` exceptions the sync wrappers always raised."""
+    import requests
+
+    try:
+        yield
+    except httpx.HTTPStatusError as exc:
+        raise requests.HTTPError(
+            str(exc), response=to_requests_response(exc.response)
+        ) from exc
+    except httpx.TimeoutException as exc:
+        raise requests.Timeout(str(exc)) from exc
+    except httpx.TransportError as exc:
+        raise requests.ConnectionError(str(exc)) from exc
@@ -2,51 +2,196 @@
 """
 Mermaid syntax checker for project diagrams.
 
-Collects all .mmd sources plus inline Mermaid blocks in HTML files
-and validates them using @mermaid-js/mermaid-cli. Intended to run
-automatically via the pre-push git hook (see githooks/pre-push).
+Collects all .mmd and .inq sources plus inline Mermaid blocks in HTML
+files and validates them using @mermaid-js/mermaid-cli. Intended to run
+automatically via the pre-push git hook (see githooks/pre-push), which
+passes the pushed commit range so only files changed by the push are
+scanned. In that mode files are read from the pushed commit (``--until``), not
+the working tree, so uncommitted edits cannot hide or cause failures.
+
+Snippets are validated concurrently (--jobs), and diagrams that passed
+before are remembered by content hash in .cache/mermaid-check.json, so
+unchanged diagrams never start the CLI again.
 """
 
 from __future__ import annotations
 
-import html
-import re
+import argparse
+import hashlib
+import io
+import json
+import os
 import subprocess
 import sys
 import tempfile
-from pathlib import Path
-from typing import Iterable, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from html.parser import HTMLParser
+from pathlib import Path, PurePosixPath
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
 
 
 ROOT = Path(__file__).resolve().parents[1]
 MERMAID_CLI = ["npx", "-y", "@mermaid-js/mermaid-cli@10.9.0"]
 
-INLINE_SOURCES: Iterable[Path] = (
-    ROOT / "meta-methods.html",
-    ROOT / "study-methods.html",
-)
+# Globs relative to the repository root. .inq inquiry graphs are plain
+# Mermaid flowcharts, so they are validated like .mmd files.
+INLINE_GLOBS: Sequence[str] = ("*.html",)
+DIAGRAM_GLOBS: Sequence[str] = ("*.mmd", "*.inq")
 
-MMD_FILES: Iterable[Path] = (
-    ROOT / "META-METHODS.mmd",
-)
+CACHE_PATH = ROOT / ".cache" / "mermaid-check.json"
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+READ_CHUNK_SIZE = 1 << 16
 
 
 class MermaidError(Exception):
     """Raised when mermaid-cli reports a syntax error."""
 
 
+class MermaidBlockParser(HTMLParser):
+    """
+    Incremental extractor for ``<div class="... mermaid ...">`` blocks.
+
+    Nested elements inside a block are kept verbatim (Mermaid reads the
+    element's inner HTML, so ``<br/>`` in labels is significant), nested
+    ``<div>``s are balanced rather than ending the block early, and each block
+    remembers the line its opening tag started on.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Tuple[int, str]] = []
+        self._depth = 0
+        self._line = 0
+        self._parts: List[str] = []
+
+    @staticmethod
+    def _is_mermaid(attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        classes = dict(attrs).get("class") or ""
+        return "mermaid" in classes.split()
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._depth:
+            if tag == "div":
+                self._depth += 1
+            self._parts.append(self.get_starttag_text() or "")
+        elif tag == "div" and self._is_mermaid(attrs):
+            self._depth = 1
+            self._line = self.getpos()[0]
+            self._parts = []
+
+    def handle_startendtag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        if self._depth:
+            self._parts.append(self.get_starttag_text() or "")
+
+    def handle_endtag(self, tag: str) -> None:
+        if not self._depth:
+            return
+        if tag == "div":
+            self._depth -= 1
+            if not self._depth:
+                self.blocks.append((self._line, "".join(self._parts).strip()))
+                self._parts = []
+                return
+        self._parts.append(f"</{tag}>")
+
+    def handle_data(self, data: str) -> None:
+        if self._depth:
+            self._parts.append(data)
+
+
+def iter_inline_mermaid(
+    path: Path, chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[Tuple[str, str]]:
+    """Stream ``path`` through ``MermaidBlockParser`` and yield ``(label, definition)`` pairs."""
+    with path.open(encoding="utf-8") as handle:
+        yield from iter_inline_mermaid_stream(path.name, handle, chunk_size)
+
+
+def iter_inline_mermaid_stream(
+    name: str, handle: TextIO, chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[Tuple[str, str]]:
+    """Like ``iter_inline_mermaid``, for HTML read from ``handle`` and labelled with ``name``."""
+    parser = MermaidBlockParser()
+    index = 0
+    for chunk in iter(lambda: handle.read(chunk_size), ""):
+        parser.feed(chunk)
+        for line, definition in parser.blocks:
+            index += 1
+            if definition:
+                yield f"{name}:{line} (block {index})", definition
+        parser.blocks.clear()
+    parser.close()
+    for line, definition in parser.blocks:
+        index += 1
+        if definition:
+            yield f"{name}:{line} (block {index})", definition
+
+
 def find_inline_mermaid(path: Path) -> List[Tuple[str, str]]:
-    content = path.read_text(encoding="utf-8")
-    pattern = re.compile(
-        r'<div[^>]*class="[^"]*mermaid[^"]*"[^>]*>(.*?)</div>',
-        re.DOTALL | re.IGNORECASE,
+    return list(iter_inline_mermaid(path))
+
+
+def expand_globs(patterns: Iterable[str], root: Path = ROOT) -> List[Path]:
+    paths = {
+        path for pattern in patterns for path in root.glob(pattern) if path.is_file()
+    }
+    return sorted(paths)
+
+
+def match_globs(paths: Iterable[str], patterns: Iterable[str]) -> List[str]:
+    """Filter repo-relative POSIX paths the way ``expand_globs`` matches files on disk."""
+    patterns = [PurePosixPath(pattern).parts for pattern in patterns]
+    matched = set()
+    for path in paths:
+        parts = PurePosixPath(path).parts
+        if any(
+            len(parts) == len(pattern) and all(map(fnmatchcase, parts, pattern))
+            for pattern in patterns
+        ):
+            matched.add(path)
+    return sorted(matched)
+
+
+def git_changed_files(since: str, until: str = "HEAD") -> Optional[Set[str]]:
+    """
+    Return repo-relative paths added or modified between two commits, or
+    ``None`` when git cannot tell (e.g. the base commit is not available
+    locally). Deleted files are left out.
+    """
+    result = subprocess.run(
+        ["git", "diff", "--name-only", "--no-renames", "--diff-filter=d", since, until],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        return None
+    return {line.strip() for line in result.stdout.splitlines() if line.strip()}
+
+
+def git_file_text(commit: str, path: str) -> str:
+    """Return the contents of ``path`` as committed in ``commit``."""
+    result = subprocess.run(
+        ["git", "show", f"{commit}:{path}"],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
     )
-    blocks: List[Tuple[str, str]] = []
-    for idx, match in enumerate(pattern.finditer(content), start=1):
-        raw = html.unescape(match.group(1)).strip()
-        if raw:
-            blocks.append((f"{path.name} (block {idx})", raw))
-    return blocks
+    return result.stdout.decode("utf-8")
 
 
 def run_mermaid_cli(label: str, definition: str) -> None:
@@ -76,27 +221,114 @@ def run_mermaid_cli(label: str, definition: str) -> None:
             raise MermaidError(f"{label}: {message or 'unknown error'}")
 
 
-def main() -> int:
+def snippet_hash(definition: str) -> str:
+    """Cache key for a diagram: the CLI version plus the exact definition text."""
+    payload = " ".join(MERMAID_CLI) + "\n" + definition
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_cache(path: Path = CACHE_PATH) -> Dict[str, str]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return {}
+
+
+def save_cache(cache: Dict[str, str], path: Path = CACHE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(cache, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def validate(label: str, definition: str) -> Optional[str]:
+    """Return an error message for the snippet, or ``None`` if it is valid."""
+    try:
+        run_mermaid_cli(label, definition)
+    except MermaidError as exc:
+        return str(exc)
+    return None
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Validate Mermaid diagrams with mermaid-cli."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.environ.get("MERMAID_CHECK_JOBS", DEFAULT_JOBS)),
+        help="Number of mermaid-cli processes to run at once.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-validate every diagram, ignoring previously passed ones.",
+    )
+    parser.add_argument(
+        "--inline-glob",
+        action="append",
+        help=f"Glob of HTML files with inline diagrams (default {', '.join(INLINE_GLOBS)}).",
+    )
+    parser.add_argument(
+        "--diagram-glob",
+        action="append",
+        help=f"Glob of Mermaid source files (default {', '.join(DIAGRAM_GLOBS)}).",
+    )
+    parser.add_argument(
+        "--since",
+        help="Only scan files changed between this commit and --until (e.g. the remote tip).",
+    )
+    parser.add_argument("--until", default="HEAD", help="End of the --since range.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
     snippets: List[Tuple[str, str]] = []
 
-    for path in MMD_FILES:
-        if path.exists():
-            snippets.append((str(path.relative_to(ROOT)), path.read_text(encoding="utf-8")))
+    diagram_globs = args.diagram_glob or DIAGRAM_GLOBS
+    inline_globs = args.inline_glob or INLINE_GLOBS
+    changed = git_changed_files(args.since, args.until) if args.since else None
+    if args.since and changed is None:
+        print(f"Could not diff against {args.since}; checking all diagrams.")
 
-    for path in INLINE_SOURCES:
-        if path.exists():
-            snippets.extend(find_inline_mermaid(path))
+    if changed is not None:
+        # Check what is being pushed, not whatever the working tree holds.
+        for path in match_globs(changed, diagram_globs):
+            snippets.append((path, git_file_text(args.until, path)))
+        for path in match_globs(changed, inline_globs):
+            text = io.StringIO(git_file_text(args.until, path))
+            snippets.extend(iter_inline_mermaid_stream(PurePosixPath(path).name, text))
+    else:
+        for path in expand_globs(diagram_globs):
+            snippets.append(
+                (str(path.relative_to(ROOT)), path.read_text(encoding="utf-8"))
+            )
+        for path in expand_globs(inline_globs):
+            snippets.extend(iter_inline_mermaid(path))
 
     if not snippets:
         print("No Mermaid definitions found. Skipping check.")
         return 0
 
+    cache = {} if args.no_cache else load_cache()
+    pending = [
+        (label, definition)
+        for label, definition in snippets
+        if snippet_hash(definition) not in cache
+    ]
+
     errors: List[str] = []
-    for label, definition in snippets:
-        try:
-            run_mermaid_cli(label, definition)
-        except MermaidError as exc:
-            errors.append(str(exc))
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            outcomes = executor.map(lambda snippet: validate(*snippet), pending)
+            for (label, definition), error in zip(pending, outcomes):
+                if error:
+                    errors.append(error)
+                else:
+                    cache[snippet_hash(definition)] = label
+        save_cache(cache)
 
     if errors:
         print("Mermaid syntax check failed:\n")
@@ -105,7 +337,11 @@ def main() -> int:
         print("\nFix the issues above before pushing.")
         return 1
 
-    print(f"Mermaid syntax check passed for {len(snippets)} snippet(s).")
+    skipped = len(snippets) - len(pending)
+    print(
+        f"Mermaid syntax check passed for {len(snippets)} snippet(s) "
+        f"({skipped} unchanged since last check)."
+    )
     return 0
 
 
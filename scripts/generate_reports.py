@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Generate a single report from a template by calling OpenRouter.
+Generate reports from templates by calling OpenRouter, one at a time or as a
+batch of jobs.
 
 Usage examples:
 
@@ -14,6 +15,24 @@ Usage examples:
         --output study.md \
         --model openrouter/gpt-5
 
+    python scripts/generate_reports.py --jobs reports.jobs.json --concurrency 4
+
+A jobs file is a JSON list (or JSON Lines) of objects with ``template``,
+``output`` and optional ``context`` (a path or an inline object), ``model``
+and ``schema`` keys; relative paths are resolved against the jobs file. Batch runs share one
+connection pool, run up to --concurrency jobs at once, and skip jobs whose
+merged prompt, model and schema (name and file contents) match the last
+successful run recorded in the ledger (--ledger, default
+``.report-ledger.json`` beside the jobs file).
+
+Responses to identical low-temperature requests are served from a local
+response cache (``.cache/llm-responses.sqlite``); pass --no-cache to bypass it.
+
+With --schema NAME (or a ``schema`` key on a job) the response must be a
+JSON document valid against ``schemas/NAME.schema.json``; it is written as
+JSON only after validation passes (see ``schema_validate``), and invalid
+responses are reported with their field paths and never cached.
+
 If --dry-run is supplied, the merged prompt is written to the output file
 without calling the LLM. OPENROUTER_API_KEY must be set to perform generation.
 """
@@ -21,15 +40,25 @@ without calling the LLM. OPENROUTER_API_KEY must be set to perform generation.
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
 import json
 import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-import requests
+import rag_metrics
+from chat_client import AsyncChatClient, get_client, requests_errors, run_sync
+from rag_cache import DEFAULT_RESPONSE_TTL, ResponseCache
 
 
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_BASE_URL = os.environ.get(
+    "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1/chat/completions"
+)
 DEFAULT_MODEL = "openai/gpt-4o-mini"
 
 
@@ -57,7 +86,9 @@ def merge_template(template: str, context: Dict[str, Any]) -> str:
     return content
 
 
-def call_openrouter(prompt: str, model: str) -> str:
+def build_openrouter_request(
+    prompt: str, model: str
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         raise RuntimeError("OPENROUTER_API_KEY is not set. Aborting request.")
@@ -89,20 +120,162 @@ def call_openrouter(prompt: str, model: str) -> str:
         "temperature": 0.2,
         "max_tokens": 4096,
     }
+    return headers, payload
 
-    response = requests.post(OPENROUTER_BASE_URL, headers=headers, json=payload, timeout=120)
-    if response.status_code >= 400:
-        raise RuntimeError(
-            f"OpenRouter error {response.status_code}: {response.text}"
+
+class SchemaValidationError(RuntimeError):
+    """Raised when a response does not validate against the requested schema."""
+
+
+def validated_json(content: str, schema: str) -> str:
+    """Parse ``content`` (optionally fenced as a code block) and validate it; returns indented JSON."""
+    from schema_validate import validate_document
+
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    try:
+        document = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise SchemaValidationError(
+            f"Response is not valid JSON for schema {schema}: {exc}"
+        ) from exc
+    issues = validate_document(document, schema, source="response")
+    if issues:
+        details = "; ".join(f"{issue.path}: {issue.message}" for issue in issues)
+        raise SchemaValidationError(
+            f"Response does not match schema {schema}: {details}"
         )
+    return json.dumps(document, indent=2, ensure_ascii=False)
+
+
+class Completion(NamedTuple):
+    content: str
+    usage: Dict[str, int]
+    cached: bool = False
+
+
+async def acomplete_openrouter(
+    prompt: str,
+    model: str,
+    client: Optional[AsyncChatClient] = None,
+    cache: Optional[ResponseCache] = None,
+    schema: Optional[str] = None,
+) -> Completion:
+    """
+    Return the generated content and the ``usage`` block reported by OpenRouter.
+
+    With a ``cache``, low-temperature requests identical to an earlier one are
+    answered from it without calling OpenRouter. With a ``schema`` the content
+    is validated JSON (``SchemaValidationError`` otherwise), and only valid
+    responses are cached.
+    """
+    headers, payload = build_openrouter_request(prompt, model)
+    key = None
+    if cache is not None and cache.cacheable(payload["temperature"]):
+        key = cache.response_key(
+            model, payload["messages"], payload["temperature"], payload["max_tokens"]
+        )
+        hit = cache.get(key)
+        if hit is not None:
+            try:
+                content = (
+                    validated_json(hit["content"], schema) if schema else hit["content"]
+                )
+                return Completion(content, hit.get("usage") or {}, cached=True)
+            except SchemaValidationError:
+                pass  # cached before the schema gate; ask again
+
+    client = client or get_client()
+    with rag_metrics.span("openrouter.request", model=model) as span:
+        response = await client.post_json(
+            OPENROUTER_BASE_URL, payload, headers=headers, timeout=120
+        )
+        span.set(status=response.status_code)
+    rag_metrics.incr("openrouter.requests", model=model, status=response.status_code)
+    if response.status_code >= 400:
+        raise RuntimeError(f"OpenRouter error {response.status_code}: {response.text}")
     data = response.json()
     try:
-        return data["choices"][0]["message"]["content"]
+        completion = Completion(
+            data["choices"][0]["message"]["content"], data.get("usage") or {}
+        )
     except (KeyError, IndexError) as exc:
         raise RuntimeError(f"Unexpected OpenRouter response: {data}") from exc
+    rag_metrics.incr(
+        "openrouter.prompt_tokens",
+        completion.usage.get("prompt_tokens", 0),
+        model=model,
+    )
+    rag_metrics.incr(
+        "openrouter.completion_tokens",
+        completion.usage.get("completion_tokens", 0),
+        model=model,
+    )
+    if schema:
+        completion = completion._replace(
+            content=validated_json(completion.content, schema)
+        )
+    if key is not None:
+        cache.put(key, {"content": completion.content, "usage": completion.usage})
+    return completion
+
+
+async def acall_openrouter(
+    prompt: str,
+    model: str,
+    client: Optional[AsyncChatClient] = None,
+    cache: Optional[ResponseCache] = None,
+    schema: Optional[str] = None,
+) -> str:
+    return (await acomplete_openrouter(prompt, model, client, cache, schema)).content
 
 
-def generate(template_path: Path, output_path: Path, context: Dict[str, Any], model: str, dry_run: bool) -> None:
+async def astream_openrouter(
+    prompt: str, model: str, client: Optional[AsyncChatClient] = None
+) -> AsyncIterator[str]:
+    """Yield generated tokens as OpenRouter streams them."""
+    headers, payload = build_openrouter_request(prompt, model)
+    client = client or get_client()
+    with rag_metrics.span("openrouter.stream", model=model):
+        async for token in client.stream_sse(
+            OPENROUTER_BASE_URL, payload, headers=headers, timeout=120
+        ):
+            yield token
+
+
+def call_openrouter(
+    prompt: str,
+    model: str,
+    cache: Optional[ResponseCache] = None,
+    schema: Optional[str] = None,
+) -> str:
+    # Transport failures raise requests exceptions, as before the async client.
+    with requests_errors():
+        return run_sync(acall_openrouter(prompt, model, cache=cache, schema=schema))
+
+
+async def _collect_stream(prompt: str, model: str) -> str:
+    parts = []
+    async for token in astream_openrouter(prompt, model):
+        sys.stdout.write(token)
+        sys.stdout.flush()
+        parts.append(token)
+    sys.stdout.write("\n")
+    return "".join(parts)
+
+
+def generate(
+    template_path: Path,
+    output_path: Path,
+    context: Dict[str, Any],
+    model: str,
+    dry_run: bool,
+    stream: bool = False,
+    cache: Optional[ResponseCache] = None,
+    schema: Optional[str] = None,
+) -> None:
     template = read_file(template_path)
     prompt = merge_template(template, context)
 
@@ -111,38 +284,290 @@ def generate(template_path: Path, output_path: Path, context: Dict[str, Any], mo
         print(f"[dry-run] Wrote merged template to {output_path}")
         return
 
-    content = call_openrouter(prompt, model=model)
+    if stream:
+        content = run_sync(_collect_stream(prompt, model))
+        if schema:
+            content = validated_json(content, schema)
+    else:
+        content = call_openrouter(prompt, model=model, cache=cache, schema=schema)
     output_path.write_text(content.strip() + "\n", encoding="utf-8")
     print(f"Generated {output_path.name} using {model}")
 
 
+@dataclass
+class ReportJob:
+    template: Path
+    output: Path
+    context: Dict[str, Any] = field(default_factory=dict)
+    model: str = DEFAULT_MODEL
+    schema: Optional[str] = None
+
+
+@dataclass
+class JobResult:
+    job: ReportJob
+    status: str
+    seconds: float = 0.0
+    usage: Dict[str, int] = field(default_factory=dict)
+    error: str = ""
+
+
+def prompt_hash(prompt: str, model: str, schema: Optional[str] = None) -> str:
+    """Ledger key of a job; a schema adds its name and the digest of its file."""
+    text = f"{model}\n{prompt}"
+    if schema:
+        from schema_validate import resolve_schema_path
+
+        schema_digest = hashlib.sha256(resolve_schema_path(schema).read_bytes())
+        text = f"{text}\nschema:{schema}:{schema_digest.hexdigest()}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_jobs(
+    path: Path, default_model: str = DEFAULT_MODEL, default_schema: Optional[str] = None
+) -> List[ReportJob]:
+    """Parse a JSON list or JSON Lines jobs file; relative paths are resolved against it."""
+    text = read_file(path)
+    if text.lstrip().startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    base = path.parent
+    jobs = []
+    for entry in entries:
+        context = entry.get("context") or {}
+        if isinstance(context, str):
+            context = read_context(base / context)
+        jobs.append(
+            ReportJob(
+                template=base / entry["template"],
+                output=base / entry["output"],
+                context=context,
+                model=entry.get("model", default_model),
+                schema=entry.get("schema", default_schema),
+            )
+        )
+    return jobs
+
+
+def load_ledger(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_ledger(path: Path, ledger: Dict[str, Dict[str, Any]]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(ledger, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+async def run_job(
+    job: ReportJob,
+    client: AsyncChatClient,
+    ledger: Dict[str, Dict[str, Any]],
+    dry_run: bool = False,
+    force: bool = False,
+    cache: Optional[ResponseCache] = None,
+) -> JobResult:
+    start = time.perf_counter()
+    try:
+        prompt = merge_template(read_file(job.template), job.context)
+        digest = prompt_hash(prompt, job.model, job.schema)
+        key = str(job.output)
+        unchanged = (
+            job.output.exists() and ledger.get(key, {}).get("prompt_hash") == digest
+        )
+        if unchanged and not force and not dry_run:
+            return JobResult(job, "skipped", time.perf_counter() - start)
+
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        if dry_run:
+            job.output.write_text(prompt, encoding="utf-8")
+            return JobResult(job, "dry-run", time.perf_counter() - start)
+
+        completion = await acomplete_openrouter(
+            prompt, job.model, client, cache, job.schema
+        )
+        job.output.write_text(completion.content.strip() + "\n", encoding="utf-8")
+        ledger[key] = {
+            "prompt_hash": digest,
+            "model": job.model,
+            "schema": job.schema,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        status = "cached" if completion.cached else "generated"
+        return JobResult(job, status, time.perf_counter() - start, completion.usage)
+    except Exception as exc:  # noqa: BLE001 - report per job, keep the batch going
+        return JobResult(job, "failed", time.perf_counter() - start, error=str(exc))
+
+
+async def run_batch(
+    jobs: List[ReportJob],
+    ledger_path: Path,
+    concurrency: int = 4,
+    dry_run: bool = False,
+    force: bool = False,
+    cache: Optional[ResponseCache] = None,
+) -> List[JobResult]:
+    """Run ``jobs`` concurrently over one pooled client, updating the ledger as they finish."""
+    ledger = load_ledger(ledger_path)
+    async with AsyncChatClient(
+        max_concurrency=concurrency, max_connections=concurrency
+    ) as client:
+
+        async def run_and_record(job: ReportJob) -> JobResult:
+            result = await run_job(
+                job, client, ledger, dry_run=dry_run, force=force, cache=cache
+            )
+            rag_metrics.incr("reports.jobs", status=result.status)
+            rag_metrics.observe(
+                "reports.job_seconds", result.seconds, status=result.status
+            )
+            if result.status in ("generated", "cached"):
+                save_ledger(ledger_path, ledger)
+            return result
+
+        return list(await asyncio.gather(*(run_and_record(job) for job in jobs)))
+
+
+def print_summary(results: List[JobResult]) -> None:
+    print(
+        f"{'output':40} {'status':10} {'seconds':>8} {'prompt':>8} {'completion':>10}"
+    )
+    for result in results:
+        usage = result.usage
+        print(
+            f"{result.job.output.name:40} {result.status:10} {result.seconds:8.2f} "
+            f"{usage.get('prompt_tokens', 0):8d} {usage.get('completion_tokens', 0):10d}"
+        )
+        if result.error:
+            print(f"    error: {result.error}")
+    total = {
+        key: sum(result.usage.get(key, 0) for result in results)
+        for key in ("prompt_tokens", "completion_tokens")
+    }
+    counts = {
+        status: sum(result.status == status for result in results)
+        for status in ("generated", "cached", "skipped", "failed")
+    }
+    print(
+        f"{counts['generated']} generated, {counts['cached']} from cache, "
+        f"{counts['skipped']} skipped, {counts['failed']} failed; "
+        f"{total['prompt_tokens']} prompt + {total['completion_tokens']} completion tokens."
+    )
+
+
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Generate a Terpedia report via OpenRouter.")
+    parser = argparse.ArgumentParser(
+        description="Generate a Terpedia report via OpenRouter."
+    )
     parser.add_argument(
         "--template",
         type=Path,
-        required=True,
         help="Path to template Markdown file (e.g., meta-template.md).",
     )
     parser.add_argument(
         "--output",
         type=Path,
-        required=True,
         help="Destination Markdown file for the generated report.",
     )
-    parser.add_argument("--context", type=Path, help="Optional JSON context file with placeholder replacements.")
-    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"OpenRouter model (default {DEFAULT_MODEL}).")
+    parser.add_argument(
+        "--context",
+        type=Path,
+        help="Optional JSON context file with placeholder replacements.",
+    )
+    parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL,
+        help=f"OpenRouter model (default {DEFAULT_MODEL}).",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Do not call OpenRouter; just merge placeholders for inspection.",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print tokens to stdout as they are generated.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=Path,
+        help="Jobs file for batch generation (see module docstring).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of batch jobs calling OpenRouter at once.",
+    )
+    parser.add_argument(
+        "--ledger", type=Path, help="Prompt-hash ledger for batch runs."
+    )
+    parser.add_argument(
+        "--schema",
+        help="Require a JSON response valid against this schema (e.g. metastudy) before writing it.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate batch jobs even if their prompt is unchanged.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call OpenRouter instead of reusing cached responses.",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_RESPONSE_TTL / 3600,
+        help="Hours a cached response stays valid.",
+    )
     args = parser.parse_args()
 
+    cache = None if args.no_cache else ResponseCache(ttl=args.cache_ttl * 3600)
+
+    if args.jobs:
+        jobs = read_jobs(
+            args.jobs, default_model=args.model, default_schema=args.schema
+        )
+        ledger_path = args.ledger or args.jobs.parent / ".report-ledger.json"
+        results = asyncio.run(
+            run_batch(
+                jobs,
+                ledger_path,
+                args.concurrency,
+                dry_run=args.dry_run,
+                force=args.force,
+                cache=cache,
+            )
+        )
+        print_summary(results)
+        if cache is not None:
+            print(f"Response cache: {cache.stats}")
+        sys.exit(1 if any(result.status == "failed" for result in results) else 0)
+    if not args.template or not args.output:
+        parser.error("--template and --output are required unless --jobs is given.")
+
     context = read_context(args.context)
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
-    generate(args.template, args.output, context, args.model, args.dry_run)
+    generate(
+        args.template,
+        args.output,
+        context,
+        args.model,
+        args.dry_run,
+        stream=args.stream,
+        cache=cache,
+        schema=args.schema,
+    )
+    if cache is not None and not args.dry_run and not args.stream:
+        print(f"Response cache: {cache.stats}")
 
 
 if __name__ == "__main__":
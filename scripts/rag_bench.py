@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the RAG ingestion and retrieval helpers.
+
+Generates synthetic Markdown corpora of a given number of chunks, then runs
+each stage in a fresh process so timings and peak RSS are not polluted by
+earlier runs:
+
+- ingest: ``rag_ingest.build_vector_store`` → docs/s, chunks/s, peak RSS and
+  index size on disk;
+- query: ``rag_utils.retrieve_context`` → cold latency (first call, including
+  loading the store) and warm p50/p95/p99, plus recall@k of the index against
+  exact search;
+- chroma: ``local_chroma.upsert_documents``/``query`` when ``chromadb`` is
+  installed.
+
+Everything runs offline with the deterministic ``hashing:<dim>`` embedder
+from ``rag_embeddings`` unless --model names a local Sentence-Transformers
+model. Usage:
+
+    python scripts/rag_bench.py run --sizes 1k 10k --output bench/HEAD.json
+    python scripts/rag_bench.py compare bench/main.json bench/HEAD.json
+
+``compare`` exits non-zero when a metric regressed by more than --threshold.
+
+``imports`` checks cold start instead: each helper module is imported (and
+each CLI run with ``--help``) in a fresh interpreter, and the command fails if
+one takes longer than --budget-ms or pulls in a heavy backend (FAISS,
+LangChain, torch, chromadb) that should only load on first use:
+
+    python scripts/rag_bench.py imports --budget-ms 300
+
+``tests/test_import_budget.py`` runs the same checks under pytest.
+
+``chunk`` times ``rag_chunker`` against ``RecursiveCharacterTextSplitter``
+(character-sized as before, and sized by the model's tokenizer) on the
+repository's Markdown documents repeated up to --mb megabytes, and reports
+how many chunks of each exceed the model's token limit:
+
+    python scripts/rag_bench.py chunk --mb 50 --model sentence-transformers/all-MiniLM-L6-v2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_WORK_DIR = REPO_ROOT / ".cache" / "rag-bench"
+DEFAULT_MODEL = "hashing:256"
+DEFAULT_SIZES = ("1k", "10k")
+DEFAULT_THRESHOLD = 0.10
+# A generated paragraph is ~85 words, so ingestion still yields about one chunk per paragraph.
+BENCH_CHUNK_TOKENS = 128
+CHUNKS_PER_FILE = 50
+VOCABULARY_SIZE = 20_000
+DOMAIN_TERMS = (
+    "ADHD-RS-IV",
+    "Conners 3",
+    "linalool",
+    "limonene",
+    "beta-caryophyllene",
+    "pinene",
+    "myrcene",
+    "methylphenidate",
+    "atomoxetine",
+    "inattention",
+    "hyperactivity",
+    "randomized",
+    "placebo",
+    "meta-analysis",
+    "effect size",
+    "dopamine",
+)
+
+IMPORT_MODULES = (
+    "rag_utils",
+    "rag_ingest",
+    "rag_cache",
+    "rag_context",
+    "rag_chunker",
+    "rag_worker",
+    "generate_reports",
+    "local_chroma",
+)
+IMPORT_CLIS = ("rag_ingest.py", "rag_worker.py", "generate_reports.py")
+HEAVY_MODULES = (
+    "faiss",
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "sentence_transformers",
+    "torch",
+    "chromadb",
+)
+DEFAULT_IMPORT_BUDGET_MS = 300.0
+# ru_maxrss survives exec on Linux (the child would report the parent's peak), so prefer VmHWM.
+_IMPORT_PROBE = """
+import json, resource, sys, time
+sys.path[:0] = sys.argv[2:]
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+try:
+    with open("/proc/self/status") as status:
+        rss = next(int(line.split()[1]) * 1024 for line in status if line.startswith("VmHWM:"))
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+print(json.dumps({{"ms": elapsed * 1000, "rss_mb": round(rss / 1e6, 1), "heavy": heavy}}))
+"""
+
+# Metric name -> True if higher is better. Only these are compared.
+METRICS = {
+    "ingest_docs_per_s": True,
+    "ingest_chunks_per_s": True,
+    "ingest_peak_rss_mb": False,
+    "index_mb": False,
+    "cold_query_ms": False,
+    "query_p50_ms": False,
+    "query_p95_ms": False,
+    "query_p99_ms": False,
+    "query_peak_rss_mb": False,
+    "recall_at_k": True,
+}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def format_size(size: int) -> str:
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f"{size // 1_000_000}m"
+    if size >= 1_000 and size % 1_000 == 0:
+        return f"{size // 1_000}k"
+    return str(size)
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of this process and its finished children (Linux reports KiB, macOS bytes)."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return round(peak * scale / 1e6, 1)
+
+
+def directory_mb(path: Path) -> float:
+    return round(sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) / 1e6, 2)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3) if values else 0.0
+
+
+def git_commit() -> Optional[str]:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return result.stdout.strip() or None
+
+
+def generate_corpus(
+    directory: Path, num_chunks: int, chunk_size: int = 800, seed: int = 0
+) -> Path:
+    """
+    Write ``num_chunks`` paragraphs of Zipf-distributed pseudo-words to
+    ``directory``, ``CHUNKS_PER_FILE`` per Markdown file, plus ``queries.json``.
+
+    Each paragraph is a little shorter than ``chunk_size`` characters and
+    ``BENCH_CHUNK_TOKENS`` tokens, so ingestion yields about one chunk per
+    paragraph. Reuses an existing corpus with the
+    same parameters.
+    """
+    marker = directory / "corpus.json"
+    params = {"num_chunks": num_chunks, "chunk_size": chunk_size, "seed": seed}
+    if marker.exists() and json.loads(marker.read_text(encoding="utf-8")) == params:
+        return directory
+    docs_dir = directory / "docs"
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    for stale in docs_dir.glob("*.md"):
+        stale.unlink()
+
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    vocabulary = np.array(
+        [
+            "".join(rng.choice(letters, size=rng.integers(3, 10)))
+            for _ in range(VOCABULARY_SIZE)
+        ]
+        + list(DOMAIN_TERMS)
+    )
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    rng.shuffle(weights)
+    weights /= weights.sum()
+    words_per_chunk = max(8, int(chunk_size * 0.85) // 8)
+
+    queries: List[str] = []
+    query_every = max(1, num_chunks // 1000)
+    for file_index, start in enumerate(range(0, num_chunks, CHUNKS_PER_FILE)):
+        count = min(CHUNKS_PER_FILE, num_chunks - start)
+        words = vocabulary[
+            rng.choice(len(vocabulary), size=(count, words_per_chunk), p=weights)
+        ]
+        paragraphs = [" ".join(row) for row in words]
+        for offset, row in enumerate(words):
+            if (start + offset) % query_every == 0:
+                queries.append(" ".join(rng.choice(row, size=8, replace=False)))
+        (docs_dir / f"doc-{file_index:06d}.md").write_text(
+            "\n\n".join(paragraphs), encoding="utf-8"
+        )
+
+    (directory / "queries.json").write_text(json.dumps(queries), encoding="utf-8")
+    marker.write_text(json.dumps(params), encoding="utf-8")
+    return directory
+
+
+def _ingest_job(
+    corpus_dir: str,
+    store_dir: str,
+    model: str,
+    index: str,
+    workers: int,
+    batch_size: int,
+) -> dict:
+    import rag_ingest
+    from rag_index import parse_index_spec
+
+    store = Path(store_dir)
+    files = sorted((Path(corpus_dir) / "docs").glob("*.md"))
+    start = time.perf_counter()
+    rag_ingest.build_vector_store(
+        source_dirs=[Path(corpus_dir) / "docs"],
+        output_dir=store / "vectorstore",
+        embedding_model=model,
+        chunk_tokens=BENCH_CHUNK_TOKENS,
+        manifest_path=store / "docs-manifest.json",
+        use_embedding_cache=False,
+        workers=workers,
+        batch_size=batch_size,
+        index_spec=parse_index_spec(index),
+    )
+    elapsed = time.perf_counter() - start
+    manifest = json.loads((store / "docs-manifest.json").read_text(encoding="utf-8"))
+    return {
+        "ingest_s": round(elapsed, 2),
+        "num_files": len(files),
+        "num_chunks": manifest["num_chunks"],
+        "ingest_docs_per_s": round(len(files) / elapsed, 1),
+        "ingest_chunks_per_s": round(manifest["num_chunks"] / elapsed, 1),
+        "ingest_peak_rss_mb": peak_rss_mb(),
+        "index_mb": directory_mb(store / "vectorstore"),
+    }
+
+
+def _query_job(
+    store_dir: str, queries: List[str], model: str, k: int, mode: str
+) -> dict:
+    import faiss
+    import rag_utils
+    from rag_index_report import recall_at_k, store_vectors
+
+    persist_dir = Path(store_dir) / "vectorstore"
+    start = time.perf_counter()
+    rag_utils.retrieve_context(
+        queries[0], k=k, embeddings_model=model, persist_dir=persist_dir, mode=mode
+    )
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for query in queries[1:]:
+        start = time.perf_counter()
+        rag_utils.retrieve_context(
+            query, k=k, embeddings_model=model, persist_dir=persist_dir, mode=mode
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    vectorstore = rag_utils.get_vector_store(model, persist_dir)
+    vectors = np.ascontiguousarray(store_vectors(vectorstore), dtype=np.float32)
+    query_vectors = np.asarray(
+        rag_utils.get_embeddings(model).embed_queries(queries), dtype=np.float32
+    )
+    exact_index = faiss.IndexFlatL2(vectors.shape[1])
+    exact_index.add(vectors)
+    _, exact = exact_index.search(query_vectors, k)
+    _, approx = vectorstore.index.search(query_vectors, k)
+    return {
+        "num_queries": len(queries),
+        "cold_query_ms": round(cold_ms, 2),
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "query_p99_ms": percentile(latencies, 99),
+        "query_peak_rss_mb": peak_rss_mb(),
+        "recall_at_k": round(recall_at_k(approx, exact), 4),
+    }
+
+
+def _chroma_job(
+    corpus_dir: str, store_dir: str, queries: List[str], model: str, k: int
+) -> dict:
+    try:
+        import chromadb  # noqa: F401
+    except ImportError:
+        return {"skipped": "chromadb is not installed"}
+    sys.path.insert(0, str(REPO_ROOT / "research" / "rag" / "pipelines"))
+    import local_chroma
+    from rag_embeddings import load_embeddings
+
+    embeddings = load_embeddings(model)
+
+    class EmbeddingFunction:
+        def __call__(self, input):
+            return embeddings.embed_documents(list(input))
+
+    documents = []
+    for path in sorted((Path(corpus_dir) / "docs").glob("*.md")):
+        for index, text in enumerate(path.read_text(encoding="utf-8").split("\n\n")):
+            documents.append(
+                local_chroma.CorpusDocument(
+                    f"{path.stem}-{index}", text, path.name, [], {}
+                )
+            )
+
+    client = local_chroma.get_chroma_client(Path(store_dir) / "chroma")
+    collection = client.get_or_create_collection(
+        "bench", embedding_function=EmbeddingFunction()
+    )
+    stats = local_chroma.upsert_documents(collection, documents, skip_unchanged=False)
+
+    start = time.perf_counter()
+    local_chroma.query(collection, queries[0], n_results=k)
+    cold_ms = (time.perf_counter() - start) * 1000
+    latencies = []
+    results = []
+    for query in queries[1:]:
+        start = time.perf_counter()
+        results.append(local_chroma.query(collection, query, n_results=k))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    matrix = np.asarray(
+        embeddings.embed_documents([doc.text for doc in documents]), dtype=np.float32
+    )
+    ids = np.array([doc.doc_id for doc in documents])
+    hits = 0
+    for query, matches in zip(queries[1:], results):
+        distances = (
+            (matrix - np.asarray(embeddings.embed_query(query), dtype=np.float32)) ** 2
+        ).sum(axis=1)
+        exact = set(ids[np.argsort(distances)[:k]])
+        hits += len(exact & {match["id"] for match in matches})
+    return {
+        "ingest_chunks_per_s": round(stats.docs_per_second, 1),
+        "ingest_peak_rss_mb": peak_rss_mb(),
+        "index_mb": directory_mb(Path(store_dir) / "chroma"),
+        "cold_query_ms": round(cold_ms, 2),
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "query_p99_ms": percentile(latencies, 99),
+        "recall_at_k": round(hits / max(1, len(results) * k), 4),
+    }
+
+
+def _run_isolated(func, *args) -> dict:
+    """Run ``func`` in a fresh spawned process so its RSS and cold-start times are its own."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(func, *args).result()
+
+
+def import_times(
+    modules: Sequence[str] = IMPORT_MODULES,
+    clis: Sequence[str] = IMPORT_CLIS,
+    repeat: int = 3,
+) -> List[dict]:
+    """
+    Cold-start cost of each module import and CLI ``--help``, best of ``repeat``
+    fresh interpreters (the first run also warms the OS page cache).
+    """
+    paths = [
+        str(REPO_ROOT / "scripts"),
+        str(REPO_ROOT / "research" / "rag" / "pipelines"),
+    ]
+    probe = _IMPORT_PROBE.format(heavy=HEAVY_MODULES)
+    rows: List[dict] = []
+    for module in modules:
+        samples = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, "-c", probe, module, *paths],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if result.returncode:
+                error = (result.stderr.strip().splitlines() or ["failed"])[-1]
+                samples = [
+                    {"ms": float("nan"), "rss_mb": None, "heavy": [], "error": error}
+                ]
+                break
+            samples.append(json.loads(result.stdout))
+        best = min(samples, key=lambda sample: sample["ms"])
+        rows.append(
+            {
+                "target": f"import {module}",
+                "ms": round(best["ms"], 1),
+                "rss_mb": best["rss_mb"],
+                "heavy": best["heavy"],
+                "error": best.get("error"),
+            }
+        )
+    for script in clis:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, str(REPO_ROOT / "scripts" / script), "--help"],
+                capture_output=True,
+                check=False,
+            )
+            timings.append((time.perf_counter() - start) * 1000)
+        rows.append(
+            {
+                "target": f"{script} --help",
+                "ms": round(min(timings), 1),
+                "rss_mb": None,
+                "heavy": [],
+                "error": (
+                    None
+                    if result.returncode == 0
+                    else f"exit status {result.returncode}"
+                ),
+            }
+        )
+    return rows
+
+
+def render_import_times(rows: Sequence[dict], budget_ms: float) -> str:
+    lines = [
+        "| target | ms | peak RSS MB | heavy modules loaded |",
+        "|---|---|---|---|",
+    ]
+    for row in rows:
+        flags = []
+        if row["error"]:
+            flags.append(f"**{row['error']}**")
+        if row["ms"] > budget_ms:
+            flags.append("**over budget**")
+        heavy = ", ".join(row["heavy"]) or "-"
+        rss = row["rss_mb"] if row["rss_mb"] is not None else "-"
+        lines.append(
+            f"| {row['target']} | {row['ms']}{' ' + ' '.join(flags) if flags else ''} | {rss} | {heavy} |"
+        )
+    return "\n".join(lines)
+
+
+def chunk_corpus(target_mb: float) -> List[str]:
+    """The repository's Markdown documents, repeated until they add up to ``target_mb``."""
+    paths = sorted(REPO_ROOT.glob("*.md")) + sorted((REPO_ROOT / "docs").rglob("*.md"))
+    texts = [
+        text
+        for text in (path.read_text(encoding="utf-8") for path in paths)
+        if text.strip()
+    ]
+    corpus: List[str] = []
+    size = 0
+    while size < target_mb * 1e6:
+        text = texts[len(corpus) % len(texts)]
+        corpus.append(text)
+        size += len(text.encode("utf-8"))
+    return corpus
+
+
+def chunk_benchmark(
+    target_mb: float, model: str, chunk_tokens: int, chunk_overlap_tokens: int
+) -> dict:
+    """
+    Time ``Chunker.split_documents`` against ``RecursiveCharacterTextSplitter``
+    on the same documents: as ingestion configured it before (800/120
+    characters) and sized by the same tokenizer, which is what token-accurate
+    chunks cost with that splitter.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.documents import Document
+
+    from rag_chunker import Chunker, load_tokenizer
+
+    corpus = chunk_corpus(target_mb)
+    megabytes = sum(len(text.encode("utf-8")) for text in corpus) / 1e6
+    documents = [
+        Document(page_content=text, metadata={"source": f"doc-{i}.md"})
+        for i, text in enumerate(corpus)
+    ]
+    tokenizer = load_tokenizer(model)
+    chunker = Chunker(tokenizer, chunk_tokens, chunk_overlap_tokens)
+
+    def count_tokens(text: str) -> int:
+        return len(tokenizer.token_starts([text])[0]) + tokenizer.special_tokens
+
+    separators = ["\n\n", "\n", ".", " ", ""]
+    splitters = {
+        "chunker": chunker,
+        "char_splitter": RecursiveCharacterTextSplitter(
+            chunk_size=800, chunk_overlap=120, separators=separators
+        ),
+        "token_splitter": RecursiveCharacterTextSplitter(
+            chunk_size=chunker.max_tokens,
+            chunk_overlap=chunker.overlap_tokens,
+            separators=separators,
+            length_function=count_tokens,
+        ),
+    }
+    result: Dict[str, object] = {
+        "model": model,
+        "tokenizer": tokenizer.name,
+        "token_limit": chunker.max_tokens,
+        "documents": len(corpus),
+        "mb": round(megabytes, 1),
+    }
+    for name, splitter in splitters.items():
+        start = time.perf_counter()
+        chunks = splitter.split_documents(documents)
+        seconds = time.perf_counter() - start
+        tokens = np.array(
+            [
+                len(starts) + tokenizer.special_tokens
+                for starts in tokenizer.token_starts([c.page_content for c in chunks])
+            ]
+        )
+        result[name] = {
+            "seconds": round(seconds, 2),
+            "mb_per_s": round(megabytes / seconds, 1),
+            "chunks": len(chunks),
+            "mean_tokens": round(float(tokens.mean()), 1),
+            "max_tokens": int(tokens.max()),
+            "over_limit": round(float((tokens > chunker.max_tokens).mean()), 4),
+        }
+    for name in ("char_splitter", "token_splitter"):
+        result[f"speedup_vs_{name}"] = round(
+            result[name]["seconds"] / result["chunker"]["seconds"], 1
+        )
+    return result
+
+
+def run(args: argparse.Namespace) -> dict:
+    # Keep the query-embedding cache out of data/rag and away from earlier runs.
+    os.environ["RAG_EMBED_CACHE"] = str(args.work_dir / "embedding-cache.sqlite")
+    report = {
+        "commit": git_commit(),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "model": args.model,
+            "index": args.index,
+            "mode": args.mode,
+            "k": args.k,
+            "workers": args.workers,
+            "batch_size": args.batch_size,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        num_chunks = parse_size(size)
+        label = format_size(num_chunks)
+        corpus_dir = generate_corpus(
+            args.work_dir / f"corpus-{label}", num_chunks, seed=args.seed
+        )
+        queries = json.loads((corpus_dir / "queries.json").read_text(encoding="utf-8"))[
+            : args.queries
+        ]
+        store_dir = args.work_dir / f"store-{label}-{args.index}"
+        cache_path = Path(os.environ["RAG_EMBED_CACHE"])
+        for path in (cache_path, *cache_path.parent.glob(cache_path.name + "-*")):
+            path.unlink(missing_ok=True)
+
+        print(f"[{label}] ingesting {num_chunks} chunks …", flush=True)
+        row: Dict[str, object] = {"size": label, "target": "faiss"}
+        row.update(
+            _run_isolated(
+                _ingest_job,
+                str(corpus_dir),
+                str(store_dir),
+                args.model,
+                args.index,
+                args.workers,
+                args.batch_size,
+            )
+        )
+        print(f"[{label}] querying …", flush=True)
+        row.update(
+            _run_isolated(
+                _query_job, str(store_dir), queries, args.model, args.k, args.mode
+            )
+        )
+        report["results"].append(row)
+        print(f"[{label}] {json.dumps(row)}", flush=True)
+
+        if args.chroma:
+            chroma_row: Dict[str, object] = {"size": label, "target": "chroma"}
+            chroma_row.update(
+                _run_isolated(
+                    _chroma_job,
+                    str(corpus_dir),
+                    str(store_dir),
+                    queries,
+                    args.model,
+                    args.k,
+                )
+            )
+            report["results"].append(chroma_row)
+            print(f"[{label}] {json.dumps(chroma_row)}", flush=True)
+    return report
+
+
+def compare(base: dict, head: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """Return one row per shared (size, target, metric), flagging changes worse than ``threshold``."""
+    base_rows = {(row["size"], row["target"]): row for row in base["results"]}
+    rows = []
+    for head_row in head["results"]:
+        base_row = base_rows.get((head_row["size"], head_row["target"]))
+        if base_row is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base_row.get(metric), head_row.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "size": head_row["size"],
+                    "target": head_row["target"],
+                    "metric": metric,
+                    "base": old,
+                    "head": new,
+                    "change": round(change, 4),
+                    "regression": worse > threshold,
+                }
+            )
+    return rows
+
+
+def render_comparison(rows: Sequence[dict], base: dict, head: dict) -> str:
+    lines = [
+        f"base {base.get('commit') or '?'} → head {head.get('commit') or '?'}",
+        "",
+        "| size | target | metric | base | head | change |",
+        "|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        flag = " **regression**" if row["regression"] else ""
+        lines.append(
+            f"| {row['size']} | {row['target']} | {row['metric']} | {row['base']} | {row['head']} "
+            f"| {row['change']:+.1%}{flag} |"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark RAG ingestion and retrieval at several corpus sizes."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="Run the benchmark and write a JSON report."
+    )
+    run_parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=list(DEFAULT_SIZES),
+        help="Chunk counts, e.g. 1k 10k 100k 1m.",
+    )
+    run_parser.add_argument(
+        "--model",
+        default=DEFAULT_MODEL,
+        help="Embedding model (default offline hashing embedder).",
+    )
+    run_parser.add_argument(
+        "--index", default="flat", help="FAISS index kind (see rag_index)."
+    )
+    run_parser.add_argument(
+        "--mode", default="vector", choices=("vector", "lexical", "hybrid")
+    )
+    run_parser.add_argument("--k", type=int, default=10)
+    run_parser.add_argument(
+        "--queries",
+        type=int,
+        default=200,
+        help="Queries per size (first one is the cold query).",
+    )
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument("--batch-size", type=int, default=256)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument(
+        "--chroma",
+        action="store_true",
+        help="Also benchmark local_chroma (needs chromadb).",
+    )
+    run_parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=DEFAULT_WORK_DIR,
+        help="Where corpora and stores are kept.",
+    )
+    run_parser.add_argument("--output", type=Path, help="Write the JSON report here.")
+
+    imports_parser = subparsers.add_parser(
+        "imports", help="Check module import and CLI start-up times."
+    )
+    imports_parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_IMPORT_BUDGET_MS,
+        help="Maximum cold import / --help time per target.",
+    )
+    imports_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Fresh interpreters per target (best is kept).",
+    )
+    imports_parser.add_argument("--output", type=Path, help="Write the JSON rows here.")
+
+    chunk_parser = subparsers.add_parser(
+        "chunk", help="Compare the token-aware chunker with the character splitter."
+    )
+    chunk_parser.add_argument(
+        "--mb", type=float, default=50.0, help="Corpus size in megabytes."
+    )
+    chunk_parser.add_argument(
+        "--model",
+        default=os.environ.get(
+            "RAG_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+        ),
+        help="Embedding model whose tokenizer sizes the chunks.",
+    )
+    chunk_parser.add_argument("--chunk-tokens", type=int, default=256)
+    chunk_parser.add_argument("--chunk-overlap-tokens", type=int, default=32)
+    chunk_parser.add_argument("--output", type=Path, help="Write the JSON result here.")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare two reports and flag regressions."
+    )
+    compare_parser.add_argument("base", type=Path)
+    compare_parser.add_argument("head", type=Path)
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative change counted as a regression (default 0.10).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.command == "imports":
+        rows = import_times(repeat=args.repeat)
+        print(render_import_times(rows, args.budget_ms))
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        failures = [
+            row
+            for row in rows
+            if row["error"] or row["heavy"] or row["ms"] > args.budget_ms
+        ]
+        if failures:
+            print(
+                f"\n{len(failures)} target(s) over {args.budget_ms:g} ms, failing or loading heavy backends."
+            )
+            return 1
+        return 0
+
+    if args.command == "chunk":
+        result = chunk_benchmark(
+            args.mb, args.model, args.chunk_tokens, args.chunk_overlap_tokens
+        )
+        output = json.dumps(result, indent=2)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(output, encoding="utf-8")
+        print(output)
+        return 0
+
+    if args.command == "compare":
+        base = json.loads(args.base.read_text(encoding="utf-8"))
+        head = json.loads(args.head.read_text(encoding="utf-8"))
+        rows = compare(base, head, args.threshold)
+        print(render_comparison(rows, base, head))
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(
+                f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}."
+            )
+            return 1
+        return 0
+
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output, encoding="utf-8")
+        print(f"Wrote {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
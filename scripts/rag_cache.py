@@ -0,0 +1,441 @@
+"""
+On-disk caches shared by the RAG ingestion, retrieval and generation helpers.
+
+``EmbeddingCache`` stores embedding vectors in a local SQLite file keyed by
+embedding model name and the SHA-256 of the chunk text, so re-running
+ingestion with different chunking settings only pays for chunks whose text
+actually changed. The cache is bounded by size and evicts the least recently
+used vectors first.
+
+``ResponseCache`` stores chat-completion responses keyed by a hash of the
+model, messages, temperature and max_tokens, with a TTL and the same
+size-bounded LRU eviction.
+
+The LangChain wrapper over ``EmbeddingCache`` is ``rag_embeddings.CachedEmbeddings``;
+this module itself never imports LangChain, so report generation starts fast.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import rag_metrics
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_PATH = Path(
+    os.environ.get(
+        "RAG_EMBED_CACHE", REPO_ROOT / "data" / "rag" / "embedding-cache.sqlite"
+    )
+)
+DEFAULT_MAX_BYTES = int(
+    float(os.environ.get("RAG_EMBED_CACHE_MAX_MB", 1024)) * 1024 * 1024
+)
+DEFAULT_RESPONSE_CACHE_PATH = Path(
+    os.environ.get("LLM_CACHE_PATH", REPO_ROOT / ".cache" / "llm-responses.sqlite")
+)
+DEFAULT_RESPONSE_MAX_BYTES = int(
+    float(os.environ.get("LLM_CACHE_MAX_MB", 256)) * 1024 * 1024
+)
+DEFAULT_RESPONSE_TTL = float(os.environ.get("LLM_CACHE_TTL_HOURS", 24 * 7)) * 3600
+# Sampling above this temperature is not repeatable enough to serve from cache.
+MAX_CACHEABLE_TEMPERATURE = 0.2
+
+# Keep well under SQLite's bound-parameter limit when querying many keys at once.
+_QUERY_BATCH = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _init_size_counter(conn: sqlite3.Connection, table: str) -> None:
+    """
+    Create the running byte total for ``table`` in the one-row-per-table
+    ``cache_meta`` table, seeding it from the stored rows the first time.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+    )
+    name = f"{table}_bytes"
+    if (
+        conn.execute("SELECT 1 FROM cache_meta WHERE name = ?", (name,)).fetchone()
+        is None
+    ):
+        conn.execute(
+            f"INSERT OR IGNORE INTO cache_meta (name, value) "
+            f"SELECT ?, COALESCE(SUM(nbytes), 0) FROM {table}",
+            (name,),
+        )
+
+
+def _add_size(conn: sqlite3.Connection, table: str, delta: int) -> int:
+    """Add ``delta`` to the byte total of ``table`` and return the new total."""
+    (total,) = conn.execute(
+        "UPDATE cache_meta SET value = value + ? WHERE name = ? RETURNING value",
+        (delta, f"{table}_bytes"),
+    ).fetchone()
+    return total
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%} hit rate), {self.evictions} evictions"
+        )
+
+
+class EmbeddingCache:
+    """
+    Size-bounded LRU store of embedding vectors backed by SQLite.
+
+    Several processes may share one cache file, so the byte total lives in
+    the file (``cache_meta``) and is updated in the same transaction as the
+    rows it counts; eviction only scans when that total exceeds ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_CACHE_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        _init_size_counter(self._conn, "embeddings")
+        self._conn.commit()
+
+    def get_many(self, model: str, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for ``keys``; missing keys are absent from the result."""
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_BATCH):
+                batch = list(keys[start : start + _QUERY_BATCH])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND key IN ({placeholders})",
+                        [now, model, *batch],
+                    )
+            self._conn.commit()
+            self.stats.hits += len(found)
+            self.stats.misses += len(set(keys)) - len(found)
+        rag_metrics.incr("embedding_cache.hits", len(found))
+        rag_metrics.incr("embedding_cache.misses", len(set(keys)) - len(found))
+        return found
+
+    def put_many(self, model: str, items: Dict[str, Sequence[float]]) -> None:
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array("f", vector).tobytes()
+            rows.append((model, key, blob, len(blob), now))
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so the byte total cannot
+            # change under us from another process.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                replaced = 0
+                keys = [row[1] for row in rows]
+                for start in range(0, len(keys), _QUERY_BATCH):
+                    batch = keys[start : start + _QUERY_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    (nbytes,) = self._conn.execute(
+                        f"SELECT COALESCE(SUM(nbytes), 0) FROM embeddings "
+                        f"WHERE model = ? AND key IN ({placeholders})",
+                        [model, *batch],
+                    ).fetchone()
+                    replaced += nbytes
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector, nbytes, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                total = _add_size(
+                    self._conn, "embeddings", sum(row[3] for row in rows) - replaced
+                )
+                if total > self.max_bytes:
+                    self._evict(total)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _evict(self, total: int) -> None:
+        """Drop least recently used vectors until the cache fits in ``max_bytes``."""
+        removed = 0
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT model, key, nbytes FROM embeddings ORDER BY last_used LIMIT ?",
+                (_QUERY_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            for model, key, nbytes in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE model = ? AND key = ?", (model, key)
+                )
+                total -= nbytes
+                removed += nbytes
+                self.stats.evictions += 1
+        if removed:
+            _add_size(self._conn, "embeddings", -removed)
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            (total,) = self._conn.execute(
+                "SELECT value FROM cache_meta WHERE name = 'embeddings_bytes'"
+            ).fetchone()
+            return total
+
+    def embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], List[List[float]]],
+    ) -> List[List[float]]:
+        """Return embeddings for ``texts``, calling ``compute`` only for uncached ones."""
+        keys = [text_hash(text) for text in texts]
+        cached = self.get_many(model, keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = compute(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.put_many(model, fresh)
+            cached.update({key: list(vector) for key, vector in fresh.items()})
+        return [cached[key] for key in keys]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_shared: Dict[Path, EmbeddingCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache(path: Path | str = DEFAULT_CACHE_PATH) -> EmbeddingCache:
+    """Return the process-wide cache instance for ``path``."""
+    path = Path(path).resolve()
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = EmbeddingCache(path)
+        return _shared[path]
+
+
+class ResponseCache:
+    """
+    Size-bounded, TTL-limited LRU store of chat-completion responses.
+
+    Entries are keyed by ``response_key`` over the request fields that affect
+    the output. Only requests with ``temperature`` unset or at most
+    ``MAX_CACHEABLE_TEMPERATURE`` are cached.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = DEFAULT_RESPONSE_CACHE_PATH,
+        max_bytes: int = DEFAULT_RESPONSE_MAX_BYTES,
+        ttl: float = DEFAULT_RESPONSE_TTL,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)"
+        )
+        _init_size_counter(self._conn, "responses")
+        self._conn.commit()
+
+    @staticmethod
+    def response_key(
+        model: str,
+        messages: Sequence[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": list(messages),
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cacheable(temperature: Optional[float]) -> bool:
+        return temperature is None or temperature <= MAX_CACHEABLE_TEMPERATURE
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, nbytes FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    _add_size(self._conn, "responses", -row[2])
+                    self._conn.commit()
+                    self.stats.evictions += 1
+                self.stats.misses += 1
+                rag_metrics.incr("response_cache.misses")
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.stats.hits += 1
+        rag_metrics.incr("response_cache.hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        nbytes = len(data.encode("utf-8"))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._conn.execute(
+                    "SELECT nbytes FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, nbytes, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, data, nbytes, now, now),
+                )
+                _add_size(
+                    self._conn, "responses", nbytes - (existing[0] if existing else 0)
+                )
+                self._evict(now)
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under ``max_bytes``."""
+        expired = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ? RETURNING nbytes",
+            (now - self.ttl,),
+        ).fetchall()
+        self.stats.evictions += len(expired)
+        total = _add_size(self._conn, "responses", -sum(row[0] for row in expired))
+        removed = 0
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, nbytes FROM responses ORDER BY last_used LIMIT ?",
+                (_QUERY_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+            for key, nbytes in rows:
+                if total <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= nbytes
+                removed += nbytes
+                self.stats.evictions += 1
+        if removed:
+            _add_size(self._conn, "responses", -removed)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingFunction:
+    """Chroma ``EmbeddingFunction`` wrapper that consults an ``EmbeddingCache`` first."""
+
+    def __init__(
+        self,
+        inner: Callable[[List[str]], List[List[float]]],
+        model_name: str,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache or get_embedding_cache()
+
+    # ``input`` is the parameter name of Chroma's embedding function protocol.
+    def __call__(self, input: List[str]) -> List[List[float]]:  # noqa: A002
+        return self.cache.embed(
+            self.model_name, list(input), lambda texts: self.inner(texts)
+        )
@@ -0,0 +1,365 @@
+"""
+Structure-aware chunking sized in embedding-model tokens.
+
+``RecursiveCharacterTextSplitter`` measures chunks in characters, so the
+number of tokens the embedding model sees varies widely and long chunks are
+silently truncated (all-MiniLM-L6-v2 keeps 256 word pieces). ``Chunker``
+instead:
+
+1. tokenizes each document once, a whole batch of documents per tokenizer
+   call, keeping the character offset of every token;
+2. splits on Markdown headings, then paragraphs, lines, sentences and words,
+   descending a level only for pieces that are still over budget (and finally
+   between tokens); headings inside fenced code blocks are ignored;
+3. packs consecutive pieces greedily up to ``max_tokens`` (special tokens
+   included), starts a new chunk at a heading once the current one is half
+   full, and repeats up to ``overlap_tokens`` of trailing pieces at the start
+   of the next chunk within a section.
+
+Every size check is a binary search in the token-offset array, so the text
+is scanned by a few regexes plus one tokenizer pass. Chunks are exact slices
+of the source text: ``start_index``/``end_index`` give their character
+offsets, ``num_tokens`` the count the model sees and ``section`` the heading
+path.
+
+``load_tokenizer`` uses the Hugging Face fast tokenizer of a
+Sentence-Transformers model and its ``max_seq_length``. For ``hashing:<dim>``
+it counts that embedder's own ``\\w+`` tokens. When no tokenizer can be loaded
+(offline, no ``transformers``) it falls back to BERT-style basic tokens (word
+runs and single punctuation marks), a lower bound on the word-piece count.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+DEFAULT_CHUNK_TOKENS = int(os.environ.get("RAG_CHUNK_TOKENS", 256))
+DEFAULT_OVERLAP_TOKENS = int(os.environ.get("RAG_CHUNK_OVERLAP_TOKENS", 32))
+# Same prefix as rag_embeddings, which would pull in LangChain on import.
+HASHING_PREFIX = "hashing:"
+
+# Matched against "\n" + text: a leading literal lets ``re`` skip ahead instead of
+# trying ``^`` at every offset, and the match start is the line's offset in text.
+_FENCE_RE = re.compile(r"\n[ \t]{0,3}(?:```|~~~)")
+_HEADING_RE = re.compile(r"\n[ \t]{0,3}(#{1,6})[ \t]+([^\n]*)")
+_CLOSING_HASHES = re.compile(r"(?:^|[ \t]+)#+[ \t]*$")
+# Below headings, strongest first; a new piece starts where a match ends.
+_SEPARATORS = (
+    re.compile(r"\n[ \t]*\n\s*"),
+    re.compile(r"\n"),
+    re.compile(r"[.!?][\"')\]]*[ \t]+"),
+    re.compile(r"[ \t]+"),
+)
+_HEADING, _TOKEN = 0, len(_SEPARATORS) + 1
+_WORD, _SPACE = 1, 2
+
+
+def _char_class(char: str) -> int:
+    return (_WORD if char.isalnum() or char == "_" else 0) | (
+        _SPACE if char.isspace() else 0
+    )
+
+
+@lru_cache(maxsize=1)
+def _bmp_classes() -> np.ndarray:
+    """``_WORD``/``_SPACE`` flags of every Basic Multilingual Plane code point."""
+    return np.fromiter(
+        (_char_class(chr(code)) for code in range(0x10000)),
+        dtype=np.uint8,
+        count=0x10000,
+    )
+
+
+class RegexTokenizer:
+    """
+    Token offsets without a model tokenizer: runs of word characters (Python's
+    ``\\w``) and, unless ``words_only``, every other non-space character.
+    """
+
+    special_tokens = 0
+    max_length: Optional[int] = None
+
+    def __init__(self, words_only: bool = False) -> None:
+        self.words_only = words_only
+        self.name = "regex:words" if words_only else "regex:basic"
+
+    @staticmethod
+    def _classify(text: str) -> np.ndarray:
+        codes = np.frombuffer(
+            text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        )
+        table = _bmp_classes()
+        if codes.size and codes.max() < len(table):
+            return table[codes]
+        astral = codes >= len(table)
+        classes = table[np.where(astral, 0, codes)]
+        unique, inverse = np.unique(codes[astral], return_inverse=True)
+        classes[astral] = np.array(
+            [_char_class(chr(code)) for code in unique.tolist()], dtype=np.uint8
+        )[inverse]
+        return classes
+
+    def _starts(self, text: str) -> np.ndarray:
+        classes = self._classify(text)
+        word = (classes & _WORD).astype(bool)
+        starts = word.copy()
+        starts[1:] &= ~word[:-1]
+        if not self.words_only:
+            starts |= classes == 0
+        return np.flatnonzero(starts)
+
+    def token_starts(self, texts: Sequence[str]) -> List[np.ndarray]:
+        return [self._starts(text) for text in texts]
+
+
+class HFTokenizer:
+    """A Hugging Face fast tokenizer; a batch of texts is encoded in parallel in one call."""
+
+    def __init__(self, tokenizer, name: str, max_length: Optional[int] = None) -> None:
+        self.name = name
+        self.backend = tokenizer.backend_tokenizer
+        self.backend.no_truncation()
+        self.backend.no_padding()
+        self.special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+        self.max_length = max_length
+
+    def token_starts(self, texts: Sequence[str]) -> List[np.ndarray]:
+        encodings = self.backend.encode_batch(list(texts), add_special_tokens=False)
+        return [
+            np.fromiter(
+                (start for start, _ in encoding.offsets),
+                dtype=np.int64,
+                count=len(encoding.offsets),
+            )
+            for encoding in encodings
+        ]
+
+
+def _max_seq_length(model_name: str, tokenizer) -> Optional[int]:
+    """Input length the Sentence-Transformers model truncates to, else the tokenizer's limit."""
+    try:
+        config_path = Path(model_name) / "sentence_bert_config.json"
+        if not config_path.exists():
+            from huggingface_hub import hf_hub_download
+
+            config_path = Path(hf_hub_download(model_name, "sentence_bert_config.json"))
+        return int(
+            json.loads(config_path.read_text(encoding="utf-8"))["max_seq_length"]
+        )
+    except Exception:  # noqa: BLE001 - not a Sentence-Transformers model, or offline
+        limit = getattr(tokenizer, "model_max_length", None)
+        return int(limit) if limit and limit < 1_000_000 else None
+
+
+@lru_cache(maxsize=8)
+def load_tokenizer(model_name: str):
+    """The tokenizer ``model_name`` embeds with, loaded once per process."""
+    if model_name.startswith(HASHING_PREFIX):
+        return RegexTokenizer(words_only=True)
+    try:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if not tokenizer.is_fast:
+            raise ValueError("no fast tokenizer available")
+    except Exception as exc:  # noqa: BLE001 - fall back to approximate counts
+        print(
+            f"Could not load the tokenizer of {model_name} ({type(exc).__name__}: {exc}); "
+            "sizing chunks by basic word/punctuation tokens.",
+            file=sys.stderr,
+        )
+        return RegexTokenizer()
+    return HFTokenizer(
+        tokenizer, f"hf:{model_name}", _max_seq_length(model_name, tokenizer)
+    )
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int
+    end: int
+    num_tokens: int
+    section: str = ""
+
+
+def _headings(text: str) -> Tuple[List[int], List[str]]:
+    """Start offsets of the Markdown headings outside code fences and the heading path at each."""
+    lines = "\n" + text
+    fences = [match.start() for match in _FENCE_RE.finditer(lines)]
+    positions: List[int] = []
+    paths: List[str] = []
+    stack: List[Tuple[int, str]] = []
+    for match in _HEADING_RE.finditer(lines):
+        # An odd number of fences before the heading means it is inside a code block.
+        if bisect_right(fences, match.start()) % 2:
+            continue
+        level = len(match.group(1))
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        stack.append((level, _CLOSING_HASHES.sub("", match.group(2)).strip()))
+        positions.append(match.start())
+        paths.append(" > ".join(title for _, title in stack))
+    return positions, paths
+
+
+class Chunker:
+    """Split text into chunks of at most ``max_tokens`` model tokens along its structure."""
+
+    def __init__(
+        self,
+        tokenizer,
+        max_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    ) -> None:
+        if tokenizer.max_length and max_tokens > tokenizer.max_length:
+            print(
+                f"Chunk size {max_tokens} exceeds the model's {tokenizer.max_length} tokens; "
+                f"using {tokenizer.max_length}.",
+                file=sys.stderr,
+            )
+            max_tokens = tokenizer.max_length
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.budget = max_tokens - tokenizer.special_tokens
+        if self.budget < 1:
+            raise ValueError(
+                f"max_tokens must exceed the tokenizer's {tokenizer.special_tokens} special tokens."
+            )
+        if not 0 <= overlap_tokens < self.budget // 2 + 1:
+            raise ValueError("overlap_tokens must be less than half of the chunk size.")
+        self.overlap_tokens = overlap_tokens
+
+    def _pieces(
+        self, text: str, starts: np.ndarray, headings: List[int]
+    ) -> Tuple[List[int], List[int], List[int]]:
+        """
+        Cut ``text`` into pieces of at most ``budget`` tokens, as coarsely as
+        possible: the start offset and token count of each piece, and the
+        strength of the boundary it starts at.
+        """
+        cuts = [0, *(position for position in headings if position > 0)]
+        strengths = [_HEADING] * len(cuts)
+        for level, separator in enumerate((*_SEPARATORS, None), start=1):
+            bounds = [*cuts, len(text)]
+            counts = np.diff(starts.searchsorted(bounds)).tolist()
+            if max(counts) <= self.budget:
+                break
+            refined_cuts: List[int] = []
+            refined_strengths: List[int] = []
+            for index, count in enumerate(counts):
+                refined_cuts.append(cuts[index])
+                refined_strengths.append(strengths[index])
+                if count <= self.budget:
+                    continue
+                if separator is None:
+                    # Still too long without any whitespace (URLs, tables of symbols): cut between tokens.
+                    first = int(starts.searchsorted(cuts[index]))
+                    positions = starts[
+                        first + self.budget : first + count : self.budget
+                    ].tolist()
+                    refined_cuts.extend(positions)
+                    refined_strengths.extend([_TOKEN] * len(positions))
+                    continue
+                end = bounds[index + 1]
+                for match in separator.finditer(text, cuts[index], end):
+                    position = match.end()
+                    if position >= end:
+                        break
+                    if position > refined_cuts[-1]:
+                        refined_cuts.append(position)
+                        refined_strengths.append(level)
+            cuts, strengths = refined_cuts, refined_strengths
+        else:
+            counts = np.diff(starts.searchsorted([*cuts, len(text)])).tolist()
+        return cuts, counts, strengths
+
+    def chunk_text(self, text: str, starts: np.ndarray) -> List[Chunk]:
+        """Chunk one text given the character offsets of its tokens."""
+        headings, paths = _headings(text)
+        piece_starts, counts, strengths = self._pieces(text, starts, headings)
+        piece_ends = [*piece_starts[1:], len(text)]
+
+        chunks: List[Chunk] = []
+
+        def emit(first: int, last: int, tokens: int) -> None:
+            start, end = piece_starts[first], piece_ends[last]
+            raw = text[start:end]
+            stripped = raw.strip()
+            if not stripped:
+                return
+            start += len(raw) - len(raw.lstrip())
+            section = bisect_right(headings, start) - 1
+            chunks.append(
+                Chunk(
+                    text=stripped,
+                    start=start,
+                    end=start + len(stripped),
+                    num_tokens=tokens + self.tokenizer.special_tokens,
+                    section=paths[section] if section >= 0 else "",
+                )
+            )
+
+        first, tokens = 0, 0
+        for index, count in enumerate(counts):
+            new_section = strengths[index] == _HEADING
+            if tokens and (
+                tokens + count > self.budget
+                or (new_section and tokens >= self.budget // 2)
+            ):
+                emit(first, index - 1, tokens)
+                start, overlap = index, 0
+                if not new_section:
+                    while (
+                        start - 1 > first
+                        and strengths[start] != _HEADING
+                        and overlap + counts[start - 1] <= self.overlap_tokens
+                        and overlap + counts[start - 1] + count <= self.budget
+                    ):
+                        start -= 1
+                        overlap += counts[start]
+                first, tokens = start, overlap
+            tokens += count
+        if counts:
+            emit(first, len(counts) - 1, tokens)
+        return chunks
+
+    def chunk_texts(self, texts: Sequence[str]) -> List[List[Chunk]]:
+        """Chunk several texts with a single tokenizer call."""
+        return [
+            self.chunk_text(text, starts)
+            for text, starts in zip(texts, self.tokenizer.token_starts(texts))
+        ]
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        """``TextSplitter.split_documents`` equivalent that adds offsets, token counts and sections."""
+        from langchain_core.documents import Document
+
+        result: List[Document] = []
+        for doc, chunks in zip(
+            documents, self.chunk_texts([doc.page_content for doc in documents])
+        ):
+            for chunk in chunks:
+                metadata = {
+                    **doc.metadata,
+                    "start_index": chunk.start,
+                    "end_index": chunk.end,
+                    "num_tokens": chunk.num_tokens,
+                }
+                if chunk.section:
+                    metadata["section"] = chunk.section
+                result.append(Document(page_content=chunk.text, metadata=metadata))
+        return result
@@ -0,0 +1,212 @@
+"""
+Context packing for chat prompts.
+
+Retrieved chunks share up to ``chunk_overlap`` tokens of text when they are
+neighbours in the same source, and near-identical passages often appear in
+several files. ``pack_context`` turns the ranked retrieval results into the
+smallest set of passages that still covers them:
+
+1. adjacent chunks of the same source (consecutive ``chunk_id`` indices) are
+   stitched together with the shared overlap removed;
+2. passages whose word shingles mostly repeat an already selected passage are
+   dropped;
+3. passages are added best-score first until ``token_budget`` is reached.
+
+Token counts are estimated at ~4 characters per token, which is close enough
+for budgeting against OpenAI-style tokenizers.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = (
+    int(os.environ["RAG_CONTEXT_TOKENS"])
+    if os.environ.get("RAG_CONTEXT_TOKENS")
+    else None
+)
+DUPLICATE_THRESHOLD = 0.85
+SHINGLE_SIZE = 5
+# Overlaps shorter than this are treated as coincidental.
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 1000
+
+_CHUNK_INDEX_RE = re.compile(r"-(\d+)$")
+_WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@dataclass
+class PackStats:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    merged: int = 0
+    duplicates: int = 0
+    dropped: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.input_tokens - self.output_tokens
+
+    def add(self, other: "PackStats") -> None:
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.merged += other.merged
+        self.duplicates += other.duplicates
+        self.dropped += other.dropped
+
+    def __str__(self) -> str:
+        return (
+            f"~{self.output_tokens} of ~{self.input_tokens} context tokens "
+            f"(saved ~{self.saved_tokens}: {self.merged} merged, "
+            f"{self.duplicates} near-duplicates, {self.dropped} over budget)"
+        )
+
+
+@dataclass
+class _Passage:
+    source: str
+    first: int
+    last: int
+    text: str
+    score: float
+    metadata: dict
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+def chunk_position(doc: Document) -> Optional[int]:
+    """Index of the chunk within its source, parsed from ``rag_ingest`` chunk IDs."""
+    match = _CHUNK_INDEX_RE.search(str(doc.metadata.get("chunk_id", "")))
+    return int(match.group(1)) if match else None
+
+
+def merge_overlap(left: str, right: str) -> str:
+    """Join two consecutive chunks, removing the text ``right`` repeats from the end of ``left``."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) == MIN_OVERLAP_CHARS:
+        window_start = max(0, len(left) - MAX_OVERLAP_CHARS)
+        position = left.find(probe, window_start)
+        while position != -1:
+            if right.startswith(left[position:]):
+                return left[:position] + right
+            position = left.find(probe, position + 1)
+    return f"{left}\n{right}"
+
+
+def _shingles(text: str) -> Set[int]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {hash(" ".join(words))}
+    return {
+        hash(" ".join(words[i : i + SHINGLE_SIZE]))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _merge_adjacent(passages: List[_Passage], stats: PackStats) -> List[_Passage]:
+    by_source: Dict[str, List[_Passage]] = {}
+    for passage in passages:
+        by_source.setdefault(passage.source, []).append(passage)
+    merged: List[_Passage] = []
+    for group in by_source.values():
+        group.sort(key=lambda p: p.first)
+        current = group[0]
+        for passage in group[1:]:
+            if passage.first <= current.last:
+                # The same chunk retrieved twice (e.g. by both vector and BM25 search).
+                current.score = max(current.score, passage.score)
+                stats.duplicates += 1
+                continue
+            if passage.first == current.last + 1:
+                current.text = merge_overlap(current.text, passage.text)
+                current.last = passage.last
+                current.score = max(current.score, passage.score)
+                current.chunk_ids.extend(passage.chunk_ids)
+                stats.merged += 1
+                continue
+            merged.append(current)
+            current = passage
+        merged.append(current)
+    return merged
+
+
+def pack_context(
+    documents: Sequence[Document],
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    scores: Optional[Sequence[float]] = None,
+) -> Tuple[List[Document], PackStats]:
+    """
+    Merge, deduplicate and budget ranked ``documents`` for a prompt.
+
+    ``scores`` are relevance scores (higher is better) aligned with
+    ``documents``; without them the retrieval order is used. Returns the packed
+    documents, most relevant first, and the token accounting. Merged
+    documents keep the first chunk's metadata plus a ``chunk_ids`` list.
+    """
+    from langchain_core.documents import Document
+
+    stats = PackStats()
+    passages: List[_Passage] = []
+    for rank, doc in enumerate(documents):
+        text = doc.page_content.strip()
+        stats.input_tokens += estimate_tokens(text)
+        position = chunk_position(doc)
+        score = scores[rank] if scores is not None else -float(rank)
+        source = str(doc.metadata.get("source", "unknown"))
+        if position is None:
+            # Without a position the chunk can't be stitched; give it a unique slot.
+            source, position = f"{source}\0{rank}", 0
+        passages.append(
+            _Passage(
+                source=source,
+                first=position,
+                last=position,
+                text=text,
+                score=score,
+                metadata=dict(doc.metadata),
+                chunk_ids=[str(doc.metadata.get("chunk_id", ""))],
+            )
+        )
+
+    passages = sorted(
+        _merge_adjacent(passages, stats), key=lambda p: p.score, reverse=True
+    )
+
+    packed: List[Document] = []
+    selected_shingles: List[Set[int]] = []
+    remaining = token_budget
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        if any(
+            len(shingles & seen) / max(len(shingles), 1) >= DUPLICATE_THRESHOLD
+            for seen in selected_shingles
+        ):
+            stats.duplicates += 1
+            continue
+        tokens = estimate_tokens(passage.text)
+        if remaining is not None and tokens > remaining:
+            if packed:
+                stats.dropped += 1
+                continue
+            # Never return an empty context: truncate the best passage to fit.
+            passage.text = passage.text[: remaining * CHARS_PER_TOKEN]
+            tokens = estimate_tokens(passage.text)
+        metadata = passage.metadata
+        if len(passage.chunk_ids) > 1:
+            metadata["chunk_ids"] = passage.chunk_ids
+        packed.append(Document(page_content=passage.text, metadata=metadata))
+        selected_shingles.append(shingles)
+        stats.output_tokens += tokens
+        if remaining is not None:
+            remaining -= tokens
+    return packed, stats
@@ -0,0 +1,143 @@
+"""
+Embedding model factory shared by ingestion and retrieval.
+
+Model names are Sentence-Transformers model IDs, except ``hashing:<dim>``
+which selects ``HashingEmbeddings``: a deterministic feature-hashing embedder
+with no model download, used by ``rag_bench`` and for offline smoke runs. Its
+vectors only capture token overlap, so it is not meant for real retrieval.
+
+``CachedEmbeddings`` wraps any of them with the on-disk ``rag_cache``
+embedding cache. Sentence-Transformers (and with it torch) is only imported
+when such a model is actually loaded. With ``RAG_WORKER=1`` and a running
+``rag_worker``, models are not loaded here at all: ``WorkerEmbeddings`` sends
+the texts to the worker, which keeps the model resident between runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import rag_worker
+from rag_cache import EmbeddingCache, get_embedding_cache
+
+HASHING_PREFIX = "hashing:"
+DEFAULT_HASHING_DIM = 256
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Signed feature hashing of lower-cased word unigrams and bigrams, L2-normalised."""
+
+    def __init__(self, dim: int = DEFAULT_HASHING_DIM) -> None:
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = _TOKEN_RE.findall(text.lower())
+        for feature in [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]:
+            digest = int.from_bytes(
+                hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(),
+                "little",
+            )
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class WorkerEmbeddings(Embeddings):
+    """Embeds through a running ``rag_worker`` instead of loading ``model_name`` in this process."""
+
+    def __init__(
+        self, model_name: str, socket_path: Path = rag_worker.DEFAULT_SOCKET
+    ) -> None:
+        self.model_name = model_name
+        self.socket_path = socket_path
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        if not texts:
+            return []
+        response = rag_worker.request(
+            {"op": "embed", "model": self.model_name, "texts": texts, "kind": kind},
+            self.socket_path,
+        )
+        return rag_worker.decode_vectors(response["vectors"], response["dim"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), "documents")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries through the worker's query path in one request."""
+        return self._embed(list(texts), "query")
+
+
+def load_embeddings(model_name: str) -> Embeddings:
+    """
+    Instantiate the embedding model for ``model_name``.
+
+    With ``RAG_WORKER`` set and a worker listening, returns ``WorkerEmbeddings``
+    instead (the hashing embedder is always built locally; it costs nothing).
+    """
+    if model_name.startswith(HASHING_PREFIX):
+        return HashingEmbeddings(
+            int(model_name[len(HASHING_PREFIX) :] or DEFAULT_HASHING_DIM)
+        )
+    if rag_worker.worker_enabled() and rag_worker.is_running():
+        return WorkerEmbeddings(model_name)
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+    return SentenceTransformerEmbeddings(model_name=model_name)
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain ``Embeddings`` wrapper that consults an ``EmbeddingCache`` first."""
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model_name: str,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache or get_embedding_cache()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.embed(self.model_name, texts, self.inner.embed_documents)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries through the model's query path.
+
+        Uses the inner model's own ``embed_queries`` when it has one (one
+        worker round trip) and ``embed_query`` per text otherwise, so the
+        vectors match what ``embed_query`` caches under the same namespace.
+        """
+        return self.cache.embed(f"{self.model_name}#query", texts, self._query_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from passages, so keep them apart.
+        return self.cache.embed(
+            f"{self.model_name}#query", [text], self._query_vectors
+        )[0]
+
+    def _query_vectors(self, texts: List[str]) -> List[List[float]]:
+        embed_queries = getattr(self.inner, "embed_queries", None)
+        if embed_queries is not None:
+            return embed_queries(texts)
+        return [self.inner.embed_query(text) for text in texts]
@@ -0,0 +1,187 @@
+"""
+FAISS index specifications for the RAG vector store.
+
+``rag_ingest`` builds the index described by an ``IndexSpec`` and records the
+resolved spec in the manifest; ``rag_utils`` reads it back to apply the right
+query-time settings (``nprobe`` for IVF indexes, ``efSearch`` for HNSW).
+
+Supported kinds:
+
+- ``flat`` – exact L2 search (the default, same as ``FAISS.from_documents``).
+- ``ivf-flat`` – inverted file with full vectors; trained on a sample.
+- ``ivf-pq`` – inverted file with product-quantised vectors; trained on a sample.
+- ``hnsw`` – graph index, no training.
+
+Any other value is passed to ``faiss.index_factory`` unchanged.
+
+FAISS itself is imported on first use, so modules that only need
+``IndexSpec`` start without loading it.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import faiss
+
+INDEX_KINDS = ("flat", "ivf-flat", "ivf-pq", "hnsw")
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+DEFAULT_HNSW_M = 32
+DEFAULT_TRAIN_SIZE = 50_000
+
+# FAISS wants roughly this many training points per k-means centroid.
+_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class IndexSpec:
+    kind: str = "flat"
+    nlist: Optional[int] = None
+    pq_m: Optional[int] = None
+    pq_bits: int = 8
+    hnsw_m: int = DEFAULT_HNSW_M
+    nprobe: int = DEFAULT_NPROBE
+    ef_search: int = DEFAULT_EF_SEARCH
+    factory: Optional[str] = None
+    trained_on: int = 0
+
+    @property
+    def needs_training(self) -> bool:
+        return self.kind.startswith("ivf") or (
+            self.kind not in INDEX_KINDS and ("IVF" in self.kind or "PQ" in self.kind)
+        )
+
+    @property
+    def supports_removal(self) -> bool:
+        """Whether LangChain's FAISS.delete keeps ID mappings consistent for this index."""
+        return self.kind == "flat"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "IndexSpec":
+        return cls(**data) if data else cls()
+
+
+def parse_index_spec(
+    kind: str = "flat",
+    *,
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    hnsw_m: int = DEFAULT_HNSW_M,
+    nprobe: int = DEFAULT_NPROBE,
+    ef_search: int = DEFAULT_EF_SEARCH,
+) -> IndexSpec:
+    kind = kind.strip()
+    if kind.lower() in INDEX_KINDS:
+        kind = kind.lower()
+    return IndexSpec(
+        kind=kind,
+        nlist=nlist,
+        pq_m=pq_m,
+        hnsw_m=hnsw_m,
+        nprobe=nprobe,
+        ef_search=ef_search,
+    )
+
+
+def _default_pq_m(dim: int) -> int:
+    """Largest divisor of ``dim`` giving sub-vectors of at least 8 dimensions."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def resolve_factory(spec: IndexSpec, dim: int, num_train: int) -> str:
+    """Fill in size-dependent parameters and return the ``index_factory`` string."""
+    if spec.kind == "flat":
+        return "Flat"
+    if spec.kind == "hnsw":
+        return f"HNSW{spec.hnsw_m}"
+    if spec.kind in ("ivf-flat", "ivf-pq"):
+        if spec.nlist is None:
+            spec.nlist = int(4 * math.sqrt(max(num_train, 1)))
+        spec.nlist = max(1, min(spec.nlist, num_train // _POINTS_PER_CENTROID or 1))
+        if spec.kind == "ivf-flat":
+            return f"IVF{spec.nlist},Flat"
+        spec.pq_m = spec.pq_m or _default_pq_m(dim)
+        # Each PQ codebook needs at least 2**bits training points.
+        spec.pq_bits = max(1, min(spec.pq_bits, int(math.log2(max(num_train, 2)))))
+        return f"IVF{spec.nlist},PQ{spec.pq_m}x{spec.pq_bits}"
+    return spec.kind
+
+
+def build_index(
+    spec: IndexSpec, dim: int, train_vectors: Optional[np.ndarray] = None
+) -> "faiss.Index":
+    """Create (and, if needed, train) an empty L2 index for ``spec``."""
+    import faiss
+
+    num_train = 0 if train_vectors is None else len(train_vectors)
+    spec.factory = resolve_factory(spec, dim, num_train)
+    index = faiss.index_factory(dim, spec.factory, faiss.METRIC_L2)
+    if not index.is_trained:
+        if not num_train:
+            raise ValueError(f"Index {spec.factory!r} needs training vectors.")
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+        spec.trained_on = num_train
+    apply_search_params(index, spec.nprobe, spec.ef_search)
+    return index
+
+
+def apply_search_params(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> None:
+    """Set default query-time parameters on ``index`` where they apply."""
+    ivf = _as_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = _as_hnsw(index)
+    if hnsw is not None and ef_search:
+        hnsw.hnsw.efSearch = ef_search
+
+
+def search_parameters(
+    index: "faiss.Index",
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+):
+    """
+    Per-call search parameters for ``index.search(..., params=...)``.
+
+    Unlike ``apply_search_params`` this does not mutate the shared index, so it
+    is safe when several threads query with different settings.
+    """
+    import faiss
+
+    if nprobe and _as_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe)
+    if ef_search and _as_hnsw(index) is not None:
+        return faiss.SearchParametersHNSW(efSearch=ef_search)
+    return None
+
+
+def _as_ivf(index: "faiss.Index"):
+    import faiss
+
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _as_hnsw(index: "faiss.Index"):
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return index if isinstance(index, faiss.IndexHNSW) else None
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Recall@k versus latency report for approximate FAISS index types.
+
+Builds each requested index spec over the vectors of an existing vector store,
+sweeps its query-time knob (``nprobe`` for IVF, ``efSearch`` for HNSW) and
+compares the results against exact flat search.
+
+Usage:
+
+    python scripts/rag_index_report.py --specs ivf-flat ivf-pq hnsw --k 10
+
+Pass --output report.json to keep the raw numbers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from rag_index import INDEX_KINDS, build_index, parse_index_spec, search_parameters
+from rag_utils import (
+    DEFAULT_EMBED_MODEL,
+    VECTORSTORE_DIR,
+    get_embeddings,
+    load_vector_store,
+)
+
+DEFAULT_NPROBE_SWEEP = (1, 4, 16, 64)
+DEFAULT_EF_SWEEP = (16, 64, 256)
+
+
+def store_vectors(vectorstore) -> np.ndarray:
+    """Return the stored vectors, re-embedding the chunk text if the index is lossy."""
+    index = vectorstore.index
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    except RuntimeError:
+        ids = [vectorstore.index_to_docstore_id[i] for i in range(index.ntotal)]
+        texts = [vectorstore.docstore.search(_id).page_content for _id in ids]
+        return np.asarray(
+            vectorstore.embeddings.embed_documents(texts), dtype=np.float32
+        )
+
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    hits = sum(len(set(a[a >= 0]) & set(e)) for a, e in zip(approx, exact))
+    return hits / (len(exact) * k)
+
+
+def time_queries(
+    index, queries: np.ndarray, k: int, params=None
+) -> tuple[np.ndarray, List[float]]:
+    """Search one query at a time so per-query latency is measured, not batch throughput."""
+    results = np.empty((len(queries), k), dtype=np.int64)
+    latencies: List[float] = []
+    for row, query in enumerate(queries):
+        query = query.reshape(1, -1)
+        start = time.perf_counter()
+        if params is None:
+            _, indices = index.search(query, k)
+        else:
+            _, indices = index.search(query, k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[row] = indices[0]
+    return results, latencies
+
+
+def evaluate(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    specs: Sequence[str],
+    k: int,
+    train_size: int,
+    nprobe_sweep: Sequence[int] = DEFAULT_NPROBE_SWEEP,
+    ef_sweep: Sequence[int] = DEFAULT_EF_SWEEP,
+    seed: int = 0,
+) -> List[Dict[str, object]]:
+    dim = vectors.shape[1]
+    exact_index = faiss.IndexFlatL2(dim)
+    exact_index.add(vectors)
+    exact, exact_latency = time_queries(exact_index, queries, k)
+    rows: List[Dict[str, object]] = [
+        _row("flat", "Flat", None, 1.0, exact_latency, exact_index)
+    ]
+
+    rng = np.random.default_rng(seed)
+    sample = vectors[
+        rng.choice(len(vectors), size=min(train_size, len(vectors)), replace=False)
+    ]
+    for kind in specs:
+        if kind == "flat":
+            continue
+        spec = parse_index_spec(kind)
+        index = build_index(spec, dim, sample if spec.needs_training else None)
+        index.add(vectors)
+        if spec.kind.startswith("ivf"):
+            sweep = [("nprobe", value) for value in nprobe_sweep]
+        elif spec.kind == "hnsw":
+            sweep = [("efSearch", value) for value in ef_sweep]
+        else:
+            sweep = [(None, None)]
+        for knob, value in sweep:
+            params = search_parameters(
+                index,
+                nprobe=value if knob == "nprobe" else None,
+                ef_search=value if knob == "efSearch" else None,
+            )
+            approx, latency = time_queries(index, queries, k, params)
+            label = f"{knob}={value}" if knob else None
+            rows.append(
+                _row(
+                    spec.kind,
+                    spec.factory,
+                    label,
+                    recall_at_k(approx, exact),
+                    latency,
+                    index,
+                )
+            )
+    return rows
+
+
+def _row(
+    kind: str,
+    factory: str,
+    setting: Optional[str],
+    recall: float,
+    latency: List[float],
+    index,
+) -> dict:
+    return {
+        "kind": kind,
+        "factory": factory,
+        "setting": setting,
+        "recall": round(recall, 4),
+        "p50_ms": round(float(np.percentile(latency, 50)), 4),
+        "p95_ms": round(float(np.percentile(latency, 95)), 4),
+        "index_bytes": int(faiss.serialize_index(index).size),
+    }
+
+
+def render_table(rows: Sequence[dict], k: int) -> str:
+    lines = [
+        f"| index | factory | setting | recall@{k} | p50 ms | p95 ms | size MB |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['kind']} | {row['factory']} | {row['setting'] or '-'} | {row['recall']:.3f} "
+            f"| {row['p50_ms']:.3f} | {row['p95_ms']:.3f} | {row['index_bytes'] / 1e6:.1f} |"
+        )
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare approximate FAISS indexes to exact search."
+    )
+    parser.add_argument("--persist-dir", type=Path, default=VECTORSTORE_DIR)
+    parser.add_argument(
+        "--model", default=DEFAULT_EMBED_MODEL, help="Embedding model of the store."
+    )
+    parser.add_argument(
+        "--specs",
+        nargs="+",
+        default=[kind for kind in INDEX_KINDS if kind != "flat"],
+        help="Index kinds (or faiss factory strings) to evaluate.",
+    )
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Number of sampled query chunks."
+    )
+    parser.add_argument(
+        "--query-file", type=Path, help="Text file with one query per line."
+    )
+    parser.add_argument("--train-size", type=int, default=50_000)
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=list(DEFAULT_NPROBE_SWEEP)
+    )
+    parser.add_argument(
+        "--ef-search", type=int, nargs="+", default=list(DEFAULT_EF_SWEEP)
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write the raw rows as JSON.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    vectorstore = load_vector_store(args.model, args.persist_dir)
+    vectors = np.ascontiguousarray(store_vectors(vectorstore), dtype=np.float32)
+
+    if args.query_file:
+        texts = [
+            line.strip()
+            for line in args.query_file.read_text(encoding="utf-8").splitlines()
+        ]
+        queries = get_embeddings(args.model).embed_queries(
+            [text for text in texts if text]
+        )
+        queries = np.asarray(queries, dtype=np.float32)
+    else:
+        rng = np.random.default_rng(args.seed)
+        queries = vectors[
+            rng.choice(
+                len(vectors), size=min(args.queries, len(vectors)), replace=False
+            )
+        ]
+
+    k = min(args.k, len(vectors))
+    rows = evaluate(
+        vectors,
+        queries,
+        args.specs,
+        k,
+        args.train_size,
+        nprobe_sweep=args.nprobe,
+        ef_sweep=args.ef_search,
+        seed=args.seed,
+    )
+    print(f"{len(vectors)} vectors, {len(queries)} queries, dim {vectors.shape[1]}\n")
+    print(render_table(rows, k))
+    if args.output:
+        args.output.write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
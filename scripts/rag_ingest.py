@@ -1,24 +1,63 @@
 """
 Utilities for building a FAISS vector store from repository documents.
 
-Run locally, in CI, or from Colab to keep the RAG corpus in sync.
+Run locally, in CI, or from Colab to keep the RAG corpus in sync. LangChain,
+FAISS and the embedding model are imported only once a build starts, so
+``--help`` and importing the helpers stay fast.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
+import signal
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List, Sequence
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader, PyPDFLoader
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+import numpy as np
+
+import rag_metrics
+from rag_context import CHARS_PER_TOKEN
+from rag_chunker import (
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_OVERLAP_TOKENS,
+    Chunker,
+    load_tokenizer,
+)
+from rag_index import (
+    DEFAULT_TRAIN_SIZE,
+    INDEX_KINDS,
+    IndexSpec,
+    build_index,
+    parse_index_spec,
+)
+from rag_lexical import LEXICAL_INDEX_NAME, LexicalIndex
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_SOURCE_DIRS = [
@@ -28,8 +67,16 @@ DEFAULT_SOURCE_DIRS = [
 RAG_DIR = REPO_ROOT / "data" / "rag"
 VECTORSTORE_DIR = RAG_DIR / "vectorstore"
 MANIFEST_PATH = RAG_DIR / "docs-manifest.json"
+MANIFEST_VERSION = 4
 
 SUPPORTED_SUFFIXES = {".md", ".txt", ".pdf", ".mdx"}
+# Structured artifacts are only ingested when a schema is given to validate them.
+STRUCTURED_SUFFIXES = {".json", ".jsonl"}
+HASH_BLOCK_SIZE = 1 << 20
+DEFAULT_LOAD_TIMEOUT = 300.0
+DEFAULT_BATCH_SIZE = 256
+
+T = TypeVar("T")
 
 
 @dataclass
@@ -38,7 +85,26 @@ class DocumentRecord:
     chunk_id: str
     chunk_index: int
     num_tokens: int
+    start_index: int
+    end_index: int
     created_at: str
+    page: Optional[int] = None
+
+
+@dataclass
+class SourceFileRecord:
+    """Fingerprint of an ingested source file, used to detect changes."""
+
+    source: str
+    sha256: str
+    mtime: float
+    size: int
+    ingested_at: str
+    num_chunks: int = 0
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return [make_chunk_id(self.source, index) for index in range(self.num_chunks)]
 
 
 def ensure_directories(*paths: Path) -> None:
@@ -46,11 +112,74 @@ def ensure_directories(*paths: Path) -> None:
         path.mkdir(parents=True, exist_ok=True)
 
 
-def load_file(path: Path) -> List[Document]:
+def source_key(path: Path) -> str:
+    """Repo-relative path for files in the repo, absolute path for anything else."""
+    path = path.resolve()
+    try:
+        return str(path.relative_to(REPO_ROOT))
+    except ValueError:
+        return str(path)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_chunks_path(manifest_path: Path) -> Path:
+    """Per-chunk manifest records live next to the manifest as JSON Lines."""
+    return manifest_path.with_suffix(".jsonl")
+
+
+def make_chunk_id(source: str, index: int) -> str:
+    """Stable chunk ID derived from the source path and the chunk's position in it."""
+    prefix = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return f"chunk-{prefix}-{index:05d}"
+
+
+def load_structured_file(path: Path, schema: str) -> List[Document]:
+    """One document per JSON document in ``path``; raises ``ValueError`` unless all are valid."""
+    from langchain_core.documents import Document
+
+    import schema_validate
+
+    validator = schema_validate.get_validator(schema)
+    docs: List[Document] = []
+    issues = []
+    for source, text in schema_validate.iter_raw_documents(path):
+        for item_source, document in schema_validate.expand_documents(
+            validator, source, json.loads(text)
+        ):
+            issues.extend(
+                schema_validate.document_issues(validator, document, item_source)
+            )
+            content = json.dumps(document, indent=2, ensure_ascii=False)
+            docs.append(
+                Document(page_content=content, metadata={"document": item_source})
+            )
+    if issues:
+        details = "; ".join(
+            f"{issue.source} {issue.path}: {issue.message}" for issue in issues[:5]
+        )
+        raise ValueError(f"{len(issues)} schema error(s) against {schema}: {details}")
+    return docs
+
+
+def load_file(path: Path, schema: Optional[str] = None) -> List[Document]:
     suffix = path.suffix.lower()
+    if schema and suffix in STRUCTURED_SUFFIXES:
+        docs = load_structured_file(path, schema)
+        for doc in docs:
+            doc.metadata["source"] = source_key(path)
+        return docs
     if suffix not in SUPPORTED_SUFFIXES:
         return []
 
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
     if suffix == ".pdf":
         loader = PyPDFLoader(str(path))
         docs = loader.load()
@@ -59,74 +188,621 @@ def load_file(path: Path) -> List[Document]:
         docs = loader.load()
 
     for doc in docs:
-        doc.metadata.setdefault("source", str(path.relative_to(REPO_ROOT)))
+        doc.metadata["source"] = source_key(path)
     return docs
 
 
-def collect_documents(source_dirs: Sequence[Path]) -> List[Document]:
-    documents: List[Document] = []
+def iter_source_files(
+    source_dirs: Sequence[Path], structured: bool = False
+) -> List[Path]:
+    """Return supported files (plus JSON artifacts if ``structured``) under ``source_dirs`` in a stable order."""
+    suffixes = (
+        SUPPORTED_SUFFIXES | STRUCTURED_SUFFIXES if structured else SUPPORTED_SUFFIXES
+    )
+    paths: List[Path] = []
     for directory in source_dirs:
         if not directory.exists():
             continue
         for path in directory.rglob("*"):
-            if path.is_file():
-                documents.extend(load_file(path))
+            if path.is_file() and path.suffix.lower() in suffixes:
+                paths.append(path)
+    return sorted(set(paths))
+
+
+@dataclass
+class LoadResult:
+    path: Path
+    documents: List[Document]
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+class LoadTimeout(Exception):
+    """Raised inside a loader worker when a single file exceeds its time budget."""
+
+
+def _raise_load_timeout(signum, frame):  # pragma: no cover - signal handler
+    raise LoadTimeout()
+
+
+def _load_file_isolated(
+    task: Tuple[Path, Optional[float], Optional[str]]
+) -> LoadResult:
+    """Load one file, turning any failure (or timeout) into an error string."""
+    path, timeout, schema = task
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_load_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        return LoadResult(
+            path, load_file(path, schema), seconds=time.perf_counter() - start
+        )
+    except LoadTimeout:
+        return LoadResult(
+            path, [], f"timed out after {timeout:g}s", time.perf_counter() - start
+        )
+    except Exception as exc:  # noqa: BLE001 - one bad file must not abort the build
+        return LoadResult(
+            path, [], f"{type(exc).__name__}: {exc}", time.perf_counter() - start
+        )
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def load_documents(
+    paths: Sequence[Path],
+    workers: int = 1,
+    timeout: Optional[float] = DEFAULT_LOAD_TIMEOUT,
+    schema: Optional[str] = None,
+) -> Iterator[LoadResult]:
+    """
+    Load ``paths`` and yield one ``LoadResult`` per file, in the order given.
+
+    With ``workers > 1`` files are parsed in a process pool, which matters for
+    CPU-bound PDF extraction. Each file gets its own ``timeout`` (enforced with
+    ``SIGALRM`` where available) and any loader error is captured on the result
+    instead of propagating. With a ``schema``, JSON files that fail validation
+    become load errors too, so they are never indexed.
+    """
+    tasks = ((path, timeout, schema) for path in paths)
+    if workers <= 1:
+        yield from map(_load_file_isolated, tasks)
+        return
+
+    # Only a small window of files is in flight, so loaded documents never pile
+    # up faster than the rest of the pipeline consumes them. Results are yielded
+    # in submission order, which keeps chunk IDs deterministic.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque(
+            executor.submit(_load_file_isolated, task)
+            for task in islice(tasks, workers * 2)
+        )
+        while pending:
+            result = pending.popleft().result()
+            for task in islice(tasks, 1):
+                pending.append(executor.submit(_load_file_isolated, task))
+            yield result
+
+
+def collect_documents(
+    source_dirs: Sequence[Path],
+    paths: Optional[Sequence[Path]] = None,
+    workers: int = 1,
+    timeout: Optional[float] = DEFAULT_LOAD_TIMEOUT,
+    failures: Optional[List[LoadResult]] = None,
+    schema: Optional[str] = None,
+) -> List[Document]:
+    """
+    Load every supported file under ``source_dirs`` (or just ``paths``).
+
+    Files that fail to load are logged to stderr and appended to ``failures``
+    when a list is supplied.
+    """
+    documents: List[Document] = []
+    paths = (
+        paths
+        if paths is not None
+        else iter_source_files(source_dirs, structured=bool(schema))
+    )
+    for result in load_documents(
+        paths, workers=workers, timeout=timeout, schema=schema
+    ):
+        if result.error:
+            print(f"Failed to load {result.path}: {result.error}", file=sys.stderr)
+            if failures is not None:
+                failures.append(result)
+            continue
+        documents.extend(result.documents)
     return documents
 
 
+def make_chunker(
+    embedding_model: str,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> Chunker:
+    """Chunker sized in ``embedding_model``'s tokens (see ``rag_chunker``)."""
+    return Chunker(load_tokenizer(embedding_model), chunk_tokens, chunk_overlap_tokens)
+
+
 def split_documents(
     documents: Iterable[Document],
-    chunk_size: int,
-    chunk_overlap: int,
+    embedding_model: str,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
 ) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ".", " ", ""],
+    chunker = make_chunker(embedding_model, chunk_tokens, chunk_overlap_tokens)
+    return chunker.split_documents(list(documents))
+
+
+def chars_to_tokens(chars: int, old_name: str, new_name: str) -> int:
+    """Convert a deprecated character-based chunk setting, with a warning."""
+    tokens = max(0, round(chars / CHARS_PER_TOKEN))
+    print(
+        f"{old_name} is deprecated: chunks are now sized in model tokens. "
+        f"Using {new_name}={tokens} (~{CHARS_PER_TOKEN} characters per token).",
+        file=sys.stderr,
     )
-    return splitter.split_documents(list(documents))
+    return tokens
+
+
+def iter_chunks(
+    results: Iterable[LoadResult],
+    chunker: Chunker,
+    on_file: Optional[Callable[[LoadResult, int], None]] = None,
+) -> Iterator[Document]:
+    """
+    Split loaded files one at a time and yield their chunks tagged with ``chunk_id``.
+
+    All documents of a file (the pages of a PDF) are tokenized in one batch.
+
+    ``on_file`` is called after each file with its ``LoadResult`` and the number
+    of chunks it produced (zero for files that failed to load).
+    """
+    for result in results:
+        if result.error:
+            print(f"Failed to load {result.path}: {result.error}", file=sys.stderr)
+            if on_file:
+                on_file(result, 0)
+            continue
+        source = source_key(result.path)
+        with rag_metrics.span("ingest.split"):
+            chunks = chunker.split_documents(result.documents)
+        if on_file:
+            on_file(result, len(chunks))
+        for index, chunk in enumerate(chunks):
+            chunk.metadata["chunk_id"] = make_chunk_id(source, index)
+            yield chunk
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def load_manifest(manifest_path: Path = MANIFEST_PATH) -> Optional[dict]:
+    """Return the saved manifest header, or ``None`` if it is missing or outdated."""
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def iter_manifest_chunks(manifest_path: Path = MANIFEST_PATH) -> Iterator[dict]:
+    """Stream the per-chunk records written alongside ``manifest_path``."""
+    chunks_path = manifest_chunks_path(manifest_path)
+    if not chunks_path.exists():
+        return
+    with chunks_path.open(encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_manifest(
+    manifest_path: Path,
+    settings: dict,
+    files: Dict[str, SourceFileRecord],
+    index_spec: Optional[IndexSpec] = None,
+    build_id: Optional[str] = None,
+) -> None:
+    """Write the manifest header; ``build_id`` changes whenever the index does."""
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "build_id": build_id or uuid.uuid4().hex,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "settings": settings,
+        "index": (index_spec or IndexSpec()).to_dict(),
+        "chunks_path": manifest_chunks_path(manifest_path).name,
+        "num_chunks": sum(record.num_chunks for record in files.values()),
+        "files": {source: asdict(record) for source, record in sorted(files.items())},
+    }
+    with manifest_path.open("w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+class IndexBuilder:
+    """
+    Feed embedded batches into a FAISS store built from an ``IndexSpec``.
+
+    Indexes that need training (IVF, PQ) buffer the first ``train_size``
+    vectors, train on them, and then stream the rest straight into the index.
+    """
+
+    def __init__(
+        self,
+        spec: IndexSpec,
+        embeddings,
+        vectorstore: Optional[FAISS] = None,
+        train_size: int = DEFAULT_TRAIN_SIZE,
+    ) -> None:
+        self.spec = spec
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.train_size = train_size
+        self._pending: List[
+            Tuple[List[Tuple[str, List[float]]], List[dict], List[str]]
+        ] = []
+        self._pending_count = 0
+
+    def add(
+        self,
+        text_embeddings: List[Tuple[str, List[float]]],
+        metadatas: List[dict],
+        ids: List[str],
+    ) -> None:
+        if self.vectorstore is not None:
+            self.vectorstore.add_embeddings(
+                text_embeddings, metadatas=metadatas, ids=ids
+            )
+            return
+        self._pending.append((text_embeddings, metadatas, ids))
+        self._pending_count += len(ids)
+        if not self.spec.needs_training or self._pending_count >= self.train_size:
+            self._create()
+
+    def _create(self) -> None:
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        vectors = np.array(
+            [vector for batch, _, _ in self._pending for _, vector in batch],
+            dtype=np.float32,
+        )
+        index = build_index(
+            self.spec, vectors.shape[1], vectors if self.spec.needs_training else None
+        )
+        self.vectorstore = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        pending, self._pending = self._pending, []
+        for text_embeddings, metadatas, ids in pending:
+            self.vectorstore.add_embeddings(
+                text_embeddings, metadatas=metadatas, ids=ids
+            )
+
+    def finish(self) -> Optional[FAISS]:
+        if self.vectorstore is None and self._pending:
+            self._create()
+        return self.vectorstore
+
+
+def diff_sources(
+    paths: Sequence[Path],
+    previous: Dict[str, dict],
+) -> tuple[Dict[str, SourceFileRecord], List[Path], List[str]]:
+    """
+    Compare the files on disk with the previous manifest.
+
+    Files whose size and mtime are unchanged are trusted without hashing; the
+    rest are hashed so that a touched-but-identical file is not re-embedded.
+    Returns the refreshed file records, the paths that need (re-)ingesting,
+    and the sources that disappeared.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    records: Dict[str, SourceFileRecord] = {}
+    changed: List[Path] = []
+
+    for path in paths:
+        source = source_key(path)
+        stat = path.stat()
+        prev = previous.get(source)
+        if prev and prev["size"] == stat.st_size and prev["mtime"] == stat.st_mtime:
+            records[source] = SourceFileRecord(**prev)
+            continue
+
+        sha = file_sha256(path)
+        if prev and prev["sha256"] == sha:
+            records[source] = SourceFileRecord(**{**prev, "mtime": stat.st_mtime})
+            continue
+
+        records[source] = SourceFileRecord(
+            source=source,
+            sha256=sha,
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            ingested_at=now,
+        )
+        changed.append(path)
+
+    removed = sorted(set(previous) - set(records))
+    return records, changed, removed
 
 
 def build_vector_store(
     source_dirs: Sequence[Path] = DEFAULT_SOURCE_DIRS,
     output_dir: Path = VECTORSTORE_DIR,
-    chunk_size: int = 800,
-    chunk_overlap: int = 120,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    chunk_overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+    incremental: bool = False,
+    manifest_path: Path = MANIFEST_PATH,
+    use_embedding_cache: bool = True,
+    workers: int = 1,
+    load_timeout: Optional[float] = DEFAULT_LOAD_TIMEOUT,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    index_spec: Optional[IndexSpec] = None,
+    train_size: int = DEFAULT_TRAIN_SIZE,
+    schema: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
 ) -> None:
-    ensure_directories(*source_dirs, output_dir, RAG_DIR)
+    """
+    Build the FAISS index and manifest for ``source_dirs``.
+
+    With ``incremental=True`` the previous manifest is compared against the
+    files on disk and only new or changed files are re-embedded; vectors for
+    changed and removed files are deleted from the saved index before the new
+    chunks are merged in. A full rebuild happens when no compatible index or
+    manifest exists, or when the chunking/embedding settings changed.
+
+    Chunk embeddings are looked up in the shared on-disk embedding cache first
+    (see ``rag_cache``), so even a full rebuild only embeds text it has not
+    seen before under ``embedding_model``.
+
+    Files are parsed by ``workers`` processes with a per-file ``load_timeout``.
+    Files that fail to load are skipped and left out of the manifest, so the
+    next incremental run retries them.
+
+    Chunks hold at most ``chunk_tokens`` tokens of ``embedding_model``'s own
+    tokenizer and overlap by up to ``chunk_overlap_tokens`` tokens (see
+    ``rag_chunker``); the manifest records each chunk's token count and
+    character offsets in its source document. The deprecated character-based
+    ``chunk_size``/``chunk_overlap`` are converted to tokens with a warning.
+    The tokenizer is only loaded once there is something to chunk.
+
+    Ingestion is streamed: each file is split as soon as it is loaded, chunks
+    are embedded and added to the index ``batch_size`` at a time, and chunk
+    records are appended to the JSON Lines manifest as they are indexed, so
+    peak memory follows the batch size rather than the corpus size. (The saved
+    FAISS docstore itself still holds every chunk's text.)
+
+    ``index_spec`` selects the FAISS index type (see ``rag_index``). IVF and PQ
+    indexes are trained on the first ``train_size`` chunk vectors. The
+    resolved spec is recorded in the manifest for ``rag_utils``. Only flat
+    indexes support in-place deletion, so an incremental run that changes or
+    removes files under another index type rebuilds the whole index.
+
+    A BM25 ``LexicalIndex`` over the same chunk IDs is saved beside the FAISS
+    files and updated with the same deletions and additions, so hybrid
+    retrieval in ``rag_utils`` always sees the chunks listed in the manifest.
+
+    With a ``schema`` (see ``schema_validate``), ``.json`` and ``.jsonl``
+    artifacts are ingested as well, one document per JSON document, and a
+    file with any invalid document is skipped like any other load failure.
+    """
+    ensure_directories(*source_dirs, output_dir, manifest_path.parent)
+
+    index_spec = index_spec or IndexSpec()
+    if chunk_size is not None:
+        chunk_tokens = chars_to_tokens(chunk_size, "chunk_size", "chunk_tokens")
+    if chunk_overlap is not None:
+        chunk_overlap_tokens = chars_to_tokens(
+            chunk_overlap, "chunk_overlap", "chunk_overlap_tokens"
+        )
+    # The tokenizer actually used (the model's or the fallback) is added once it is loaded.
+    settings = {
+        "embedding_model": embedding_model,
+        "chunk_tokens": chunk_tokens,
+        "chunk_overlap_tokens": chunk_overlap_tokens,
+        "index": index_spec.kind,
+    }
+    if schema:
+        settings["schema"] = schema
+    paths = iter_source_files(source_dirs, structured=bool(schema))
+
+    previous = load_manifest(manifest_path) if incremental else None
+    previous_settings = (
+        dict(previous.get("settings") or {}) if previous is not None else {}
+    )
+    previous_tokenizer = previous_settings.pop("tokenizer", None)
+    if previous is not None and (
+        previous_settings != settings
+        or not (output_dir / "index.faiss").exists()
+        or not (output_dir / LEXICAL_INDEX_NAME).exists()
+    ):
+        print("Ingestion settings or index changed; falling back to a full rebuild.")
+        previous = None
 
-    documents = collect_documents(source_dirs)
-    if not documents:
+    prev_files: Dict[str, dict] = previous["files"] if previous else {}
+    files, changed, removed = diff_sources(paths, prev_files)
+    if not files:
         raise RuntimeError(
             "No documents discovered. Add files to data/uploads or specify --source."
         )
 
-    chunks = split_documents(documents, chunk_size, chunk_overlap)
-    print(f"Loaded {len(documents)} documents → {len(chunks)} chunks.")
+    if previous is not None and not changed and not removed:
+        if any(files[source].mtime != prev_files[source]["mtime"] for source in files):
+            write_manifest(
+                manifest_path,
+                {**settings, "tokenizer": previous_tokenizer},
+                files,
+                index_spec=IndexSpec.from_dict(previous.get("index")),
+                build_id=previous["build_id"],
+            )
+        print(f"Vector store is up to date ({len(files)} files unchanged).")
+        return
+
+    chunker = make_chunker(embedding_model, chunk_tokens, chunk_overlap_tokens)
+    settings["tokenizer"] = chunker.tokenizer.name
+    if previous is not None and previous_tokenizer != settings["tokenizer"]:
+        print(f"Tokenizer changed to {settings['tokenizer']}; rebuilding in full.")
+        previous, changed, removed = None, list(paths), []
+
+    if (
+        previous is not None
+        and not index_spec.supports_removal
+        and (removed or any(source_key(path) in prev_files for path in changed))
+    ):
+        print(
+            f"{index_spec.kind} indexes cannot drop stale vectors; rebuilding in full."
+        )
+        previous, changed, removed = None, list(paths), []
+
+    from langchain_community.vectorstores import FAISS
+
+    from rag_embeddings import CachedEmbeddings, load_embeddings
+
+    embeddings = load_embeddings(embedding_model)
+    if use_embedding_cache:
+        embeddings = CachedEmbeddings(embeddings, embedding_model)
+
+    vectorstore: Optional[FAISS] = None
+    lexical = LexicalIndex()
+    stale_ids: List[str] = []
+    if previous is not None:
+        lexical = LexicalIndex.load(output_dir / LEXICAL_INDEX_NAME)
+        vectorstore = FAISS.load_local(
+            str(output_dir),
+            embeddings,
+            allow_dangerous_deserialization=True,
+        )
+        stale_ids = [
+            chunk_id
+            for source in [*map(source_key, changed), *removed]
+            if source in prev_files
+            for chunk_id in SourceFileRecord(**prev_files[source]).chunk_ids
+        ]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+            lexical.remove(stale_ids)
+        index_spec = IndexSpec.from_dict(previous.get("index"))
+    builder = IndexBuilder(index_spec, embeddings, vectorstore, train_size=train_size)
+
+    failures: List[LoadResult] = []
+    num_documents = 0
 
-    embeddings = SentenceTransformerEmbeddings(model_name=embedding_model)
-    vectorstore = FAISS.from_documents(chunks, embedding=embeddings)
-    vectorstore.save_local(str(output_dir))
-    print(f"Saved FAISS index to {output_dir}")
+    def on_file(result: LoadResult, num_chunks: int) -> None:
+        nonlocal num_documents
+        source = source_key(result.path)
+        rag_metrics.observe("ingest.load_seconds", result.seconds)
+        if result.error:
+            rag_metrics.incr("ingest.files", status="failed")
+            failures.append(result)
+            files.pop(source, None)
+            return
+        rag_metrics.incr("ingest.files", status="loaded")
+        rag_metrics.incr("ingest.bytes_read", files[source].size)
+        num_documents += len(result.documents)
+        files[source].num_chunks = num_chunks
 
-    manifest_records = []
+    chunks_path = manifest_chunks_path(manifest_path)
+    partial_path = chunks_path.with_name(chunks_path.name + ".partial")
     now = datetime.now(timezone.utc).isoformat()
-    for idx, chunk in enumerate(chunks):
-        chunk_id = f"chunk-{idx:05d}"
-        manifest_records.append(
-            DocumentRecord(
-                source=chunk.metadata.get("source", "unknown"),
-                chunk_id=chunk_id,
-                chunk_index=idx,
-                num_tokens=len(chunk.page_content.split()),
-                created_at=now,
-            )
+    changed_sources = {source_key(path) for path in changed}
+    num_chunks = 0
+    num_new_chunks = 0
+
+    def write_record(handle, record: dict) -> None:
+        nonlocal num_chunks
+        record = DocumentRecord(**{**record, "chunk_index": num_chunks})
+        handle.write(json.dumps(asdict(record)) + "\n")
+        num_chunks += 1
+
+    # Stream: load -> split -> embed a fixed-size batch -> add to the index ->
+    # append manifest lines. Only one batch of chunks and vectors is held at a time.
+    with partial_path.open("w", encoding="utf-8") as manifest_lines:
+        if previous is not None:
+            for record in iter_manifest_chunks(manifest_path):
+                if (
+                    record["source"] in files
+                    and record["source"] not in changed_sources
+                ):
+                    write_record(manifest_lines, record)
+
+        results = load_documents(
+            changed, workers=workers, timeout=load_timeout, schema=schema
+        )
+        for batch in batched(iter_chunks(results, chunker, on_file), batch_size):
+            texts = [chunk.page_content for chunk in batch]
+            rag_metrics.observe("ingest.batch_size", len(batch))
+            rag_metrics.incr("ingest.chunks", len(batch))
+            with rag_metrics.span("ingest.embed", model=embedding_model) as span:
+                span.set(batch_size=len(batch), chars=sum(map(len, texts)))
+                text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+            metadatas = [chunk.metadata for chunk in batch]
+            ids = [chunk.metadata["chunk_id"] for chunk in batch]
+            with rag_metrics.span("ingest.index_add"):
+                builder.add(text_embeddings, metadatas, ids)
+            with rag_metrics.span("ingest.lexical_add"):
+                lexical.add(ids, texts)
+            for chunk in batch:
+                metadata = chunk.metadata
+                write_record(
+                    manifest_lines,
+                    {
+                        "source": metadata.get("source", "unknown"),
+                        "chunk_id": metadata["chunk_id"],
+                        "num_tokens": metadata["num_tokens"],
+                        "start_index": metadata["start_index"],
+                        "end_index": metadata["end_index"],
+                        "page": metadata.get("page"),
+                        "created_at": now,
+                    },
+                )
+            num_new_chunks += len(batch)
+
+    if failures:
+        print(f"Skipped {len(failures)} file(s) that failed to load.")
+    print(
+        f"Loaded {num_documents} documents from {len(changed) - len(failures)} new or changed "
+        f"files → {num_new_chunks} chunks."
+    )
+    vectorstore = builder.finish()
+    if vectorstore is None:
+        partial_path.unlink()
+        raise RuntimeError("None of the discovered documents could be loaded.")
+    if previous is not None:
+        print(
+            f"Merged {num_new_chunks} new chunks, removed {len(stale_ids)} stale chunks "
+            f"({len(removed)} deleted files)."
         )
 
-    with MANIFEST_PATH.open("w", encoding="utf-8") as manifest_file:
-        json.dump([asdict(record) for record in manifest_records], manifest_file, indent=2)
-    print(f"Wrote manifest with {len(manifest_records)} entries to {MANIFEST_PATH}")
+    with rag_metrics.span("ingest.save"):
+        vectorstore.save_local(str(output_dir))
+        lexical.save(output_dir / LEXICAL_INDEX_NAME)
+    print(
+        f"Saved {index_spec.factory or index_spec.kind} FAISS index and BM25 index to {output_dir}"
+    )
+    if use_embedding_cache:
+        print(f"Embedding cache: {embeddings.cache.stats}")
+
+    partial_path.replace(chunks_path)
+    write_manifest(manifest_path, settings, files, index_spec=index_spec)
+    print(
+        f"Wrote manifest with {num_chunks} entries to {manifest_path} and {chunks_path.name}"
+    )
+
+
+def _legacy_env(name: str, replacement: str) -> Optional[int]:
+    """A deprecated character-based setting from the environment, unless its replacement is set."""
+    value = os.environ.get(name)
+    return int(value) if value and not os.environ.get(replacement) else None
 
 
 def parse_args() -> argparse.Namespace:
@@ -138,17 +814,29 @@ def parse_args() -> argparse.Namespace:
         default=[],
         help="Source directory to include (defaults to data/uploads and docs).",
     )
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        help=f"Maximum chunk size in embedding-model tokens, capped at the model's input length "
+        f"(default RAG_CHUNK_TOKENS or {DEFAULT_CHUNK_TOKENS}).",
+    )
+    parser.add_argument(
+        "--chunk-overlap-tokens",
+        type=int,
+        help=f"Tokens of trailing context repeated at the start of the next chunk "
+        f"(default RAG_CHUNK_OVERLAP_TOKENS or {DEFAULT_OVERLAP_TOKENS}).",
+    )
     parser.add_argument(
         "--chunk-size",
         type=int,
-        default=int(os.environ.get("RAG_CHUNK_SIZE", 800)),
-        help="Text splitter chunk size.",
+        default=_legacy_env("RAG_CHUNK_SIZE", "RAG_CHUNK_TOKENS"),
+        help="Deprecated: chunk size in characters (RAG_CHUNK_SIZE), converted to --chunk-tokens.",
     )
     parser.add_argument(
         "--chunk-overlap",
         type=int,
-        default=int(os.environ.get("RAG_CHUNK_OVERLAP", 120)),
-        help="Text splitter overlap.",
+        default=_legacy_env("RAG_CHUNK_OVERLAP", "RAG_CHUNK_OVERLAP_TOKENS"),
+        help="Deprecated: overlap in characters (RAG_CHUNK_OVERLAP), converted to --chunk-overlap-tokens.",
     )
     parser.add_argument(
         "--model",
@@ -157,18 +845,123 @@ def parse_args() -> argparse.Namespace:
         ),
         help="SentenceTransformer model name.",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=os.environ.get("RAG_INCREMENTAL", "").lower() in {"1", "true", "yes"},
+        help="Only re-embed new or changed files and merge them into the saved index.",
+    )
+    parser.add_argument(
+        "--no-embed-cache",
+        dest="embed_cache",
+        action="store_false",
+        help="Recompute every embedding instead of using the on-disk embedding cache.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("RAG_LOAD_WORKERS", 1)),
+        help="Number of processes used to load and parse source files.",
+    )
+    parser.add_argument(
+        "--load-timeout",
+        type=float,
+        default=float(os.environ.get("RAG_LOAD_TIMEOUT", DEFAULT_LOAD_TIMEOUT)),
+        help="Seconds allowed for loading a single file before it is skipped.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=int(os.environ.get("RAG_EMBED_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        help="Number of chunks embedded and added to the index at a time.",
+    )
+    parser.add_argument(
+        "--index",
+        default=os.environ.get("RAG_INDEX", "flat"),
+        help=f"FAISS index type: one of {', '.join(INDEX_KINDS)} or a faiss index_factory string.",
+    )
+    parser.add_argument(
+        "--nlist", type=int, help="IVF cell count (default 4*sqrt(training size))."
+    )
+    parser.add_argument(
+        "--pq-m", type=int, help="PQ sub-quantizer count (default dim/8)."
+    )
+    parser.add_argument(
+        "--hnsw-m", type=int, default=32, help="HNSW neighbours per node."
+    )
+    parser.add_argument(
+        "--nprobe", type=int, default=16, help="Default IVF cells probed per query."
+    )
+    parser.add_argument(
+        "--ef-search", type=int, default=64, help="Default HNSW efSearch per query."
+    )
+    parser.add_argument(
+        "--train-size",
+        type=int,
+        default=DEFAULT_TRAIN_SIZE,
+        help="Number of chunk vectors used to train IVF/PQ indexes.",
+    )
+    parser.add_argument(
+        "--serving-dir",
+        type=Path,
+        help="Also export the memory-mapped serving format (see rag_utils) to this directory.",
+    )
+    parser.add_argument(
+        "--schema",
+        default=os.environ.get("RAG_SCHEMA") or None,
+        help="Also ingest .json/.jsonl artifacts, skipping any that do not validate against this schema.",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
-    sources = [Path(path) for path in args.sources] if args.sources else DEFAULT_SOURCE_DIRS
-    build_vector_store(
-        source_dirs=sources,
-        chunk_size=args.chunk_size,
-        chunk_overlap=args.chunk_overlap,
-        embedding_model=args.model,
+    sources = (
+        [Path(path) for path in args.sources] if args.sources else DEFAULT_SOURCE_DIRS
     )
+    with rag_metrics.span(
+        "ingest.build", index=args.index, incremental=args.incremental
+    ):
+        build_vector_store(
+            source_dirs=sources,
+            chunk_tokens=(
+                args.chunk_tokens
+                if args.chunk_tokens is not None
+                else DEFAULT_CHUNK_TOKENS
+            ),
+            chunk_overlap_tokens=(
+                args.chunk_overlap_tokens
+                if args.chunk_overlap_tokens is not None
+                else DEFAULT_OVERLAP_TOKENS
+            ),
+            chunk_size=args.chunk_size if args.chunk_tokens is None else None,
+            chunk_overlap=(
+                args.chunk_overlap if args.chunk_overlap_tokens is None else None
+            ),
+            embedding_model=args.model,
+            incremental=args.incremental,
+            use_embedding_cache=args.embed_cache,
+            workers=args.workers,
+            load_timeout=args.load_timeout,
+            batch_size=args.batch_size,
+            index_spec=parse_index_spec(
+                args.index,
+                nlist=args.nlist,
+                pq_m=args.pq_m,
+                hnsw_m=args.hnsw_m,
+                nprobe=args.nprobe,
+                ef_search=args.ef_search,
+            ),
+            train_size=args.train_size,
+            schema=args.schema,
+        )
+    if args.serving_dir:
+        from rag_utils import export_serving_store
+
+        export_serving_store(
+            VECTORSTORE_DIR, args.serving_dir, embeddings_model=args.model
+        )
+        print(f"Exported serving store to {args.serving_dir}")
 
 
 if __name__ == "__main__":
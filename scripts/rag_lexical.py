@@ -0,0 +1,240 @@
+"""
+In-memory BM25 index over RAG chunks.
+
+Dense MiniLM embeddings blur rare exact tokens such as instrument names
+("ADHD-RS-IV", "Conners 3") and compound names ("linalool", "beta-caryophyllene").
+``LexicalIndex`` complements the FAISS store: ``rag_ingest`` builds it from the
+same chunks, keyed by the manifest's chunk IDs, and saves it next to
+``index.faiss`` as ``lexical.npz``. ``rag_utils`` merges its hits with vector
+hits through ``reciprocal_rank_fusion``.
+
+Postings are kept as compressed-row numpy arrays, and per-term BM25 weights
+are precomputed on first use, so a query costs one ``np.unique`` over the
+postings of its terms.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+LEXICAL_INDEX_NAME = "lexical.npz"
+LEXICAL_FORMAT_VERSION = 1
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_RRF_K = 60
+
+K = TypeVar("K", bound=Hashable)
+
+# Hyphenated and dotted tokens are kept whole *and* split into their parts, so
+# "ADHD-RS-IV" matches both the full name and a bare "ADHD".
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./'][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-./']")
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have in into is it its of on or
+    that the their this to was were which with
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(
+                part
+                for part in _SPLIT_RE.split(token)
+                if part and part not in STOPWORDS
+            )
+    return tokens
+
+
+class LexicalIndex:
+    """Okapi BM25 index mapping document IDs to their term frequencies."""
+
+    def __init__(self, k1: float = DEFAULT_K1, b: float = DEFAULT_B) -> None:
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.lengths = array("i")
+        self._rows: Dict[str, array] = {}
+        self._tfs: Dict[str, array] = {}
+        self._weights: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._avgdl = 0.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def avgdl(self) -> float:
+        return (
+            float(np.frombuffer(self.lengths, dtype=np.int32).mean())
+            if self.lengths
+            else 0.0
+        )
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        for doc_id, text in zip(ids, texts):
+            row = len(self.ids)
+            tokens = tokenize(text)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, count in counts.items():
+                self._rows.setdefault(term, array("i")).append(row)
+                self._tfs.setdefault(term, array("i")).append(count)
+            self.ids.append(doc_id)
+            self.lengths.append(len(tokens))
+        self._weights.clear()
+        self._avgdl = 0.0
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Drop ``ids`` and renumber the remaining rows; returns how many were removed."""
+        drop = set(ids)
+        keep = np.array([doc_id not in drop for doc_id in self.ids], dtype=bool)
+        removed = int((~keep).sum())
+        if not removed:
+            return 0
+        new_row = np.cumsum(keep, dtype=np.int64) - 1
+        for term in list(self._rows):
+            rows = np.frombuffer(self._rows[term], dtype=np.int32)
+            mask = keep[rows]
+            if mask.all():
+                self._rows[term] = array("i", new_row[rows].astype(np.int32).tobytes())
+                continue
+            if not mask.any():
+                del self._rows[term], self._tfs[term]
+                continue
+            tfs = np.frombuffer(self._tfs[term], dtype=np.int32)
+            self._rows[term] = array(
+                "i", new_row[rows[mask]].astype(np.int32).tobytes()
+            )
+            self._tfs[term] = array("i", tfs[mask].tobytes())
+        self.ids = [doc_id for doc_id, kept in zip(self.ids, keep) if kept]
+        self.lengths = array(
+            "i", np.frombuffer(self.lengths, dtype=np.int32)[keep].tobytes()
+        )
+        self._weights.clear()
+        self._avgdl = 0.0
+        return removed
+
+    def _term_weights(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        cached = self._weights.get(term)
+        if cached is not None:
+            return cached
+        rows_buffer = self._rows.get(term)
+        if rows_buffer is None:
+            return None
+        rows = np.frombuffer(rows_buffer, dtype=np.int32)
+        tfs = np.frombuffer(self._tfs[term], dtype=np.int32).astype(np.float32)
+        lengths = np.frombuffer(self.lengths, dtype=np.int32)[rows].astype(np.float32)
+        n = len(self.ids)
+        avgdl = self._avgdl = self._avgdl or self.avgdl
+        idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(avgdl, 1e-9))
+        weights = (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32)
+        self._weights[term] = (rows, weights)
+        return rows, weights
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Return up to ``k`` ``(doc_id, score)`` pairs, best first."""
+        postings = [
+            p for p in map(self._term_weights, dict.fromkeys(tokenize(query))) if p
+        ]
+        if not postings or k <= 0:
+            return []
+        if len(postings) == 1:
+            rows, scores = postings[0]
+        else:
+            all_rows = np.concatenate([rows for rows, _ in postings])
+            all_weights = np.concatenate([weights for _, weights in postings])
+            rows, inverse = np.unique(all_rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=all_weights).astype(np.float32)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.lexsort((rows[top], -scores[top]))]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    def save(self, path: Path | str) -> None:
+        """Write the index as compressed-row arrays; replaced atomically."""
+        path = Path(path)
+        terms = sorted(self._rows)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for position, term in enumerate(terms):
+            offsets[position + 1] = offsets[position] + len(self._rows[term])
+        rows = np.concatenate(
+            [np.frombuffer(self._rows[t], dtype=np.int32) for t in terms]
+            or [np.empty(0, np.int32)]
+        )
+        tfs = np.concatenate(
+            [np.frombuffer(self._tfs[t], dtype=np.int32) for t in terms]
+            or [np.empty(0, np.int32)]
+        )
+        header = {
+            "version": LEXICAL_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "terms": terms,
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            np.savez(
+                handle,
+                header=np.frombuffer(
+                    json.dumps(header).encode("utf-8"), dtype=np.uint8
+                ),
+                lengths=np.frombuffer(self.lengths, dtype=np.int32),
+                offsets=offsets,
+                rows=rows,
+                tfs=tfs,
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "LexicalIndex":
+        with np.load(path) as data:
+            header = json.loads(data["header"].tobytes().decode("utf-8"))
+            if header.get("version") != LEXICAL_FORMAT_VERSION:
+                raise ValueError(f"Unsupported lexical index format in {path}")
+            index = cls(k1=header["k1"], b=header["b"])
+            index.ids = header["ids"]
+            index.lengths = array("i", data["lengths"].astype(np.int32).tobytes())
+            offsets, rows, tfs = data["offsets"], data["rows"], data["tfs"]
+            for position, term in enumerate(header["terms"]):
+                start, end = offsets[position], offsets[position + 1]
+                index._rows[term] = array("i", rows[start:end].tobytes())
+                index._tfs[term] = array("i", tfs[start:end].tobytes())
+        return index
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[K]],
+    k: int = DEFAULT_RRF_K,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[K, float]]:
+    """
+    Merge ranked ID lists with reciprocal-rank fusion.
+
+    Each list contributes ``weight / (k + rank)`` (rank starting at 1) to every
+    ID it contains; IDs are returned best first with their fused score.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[K, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,226 @@
+"""
+Lightweight timings and counters for the RAG and report-generation helpers.
+
+Disabled unless ``RAG_METRICS=1`` (or ``configure(enabled=True)``). While
+disabled, ``span`` returns a shared no-op context manager and ``incr`` /
+``observe`` return after a single flag check, so instrumented code pays
+essentially nothing.
+
+When enabled:
+
+- every finished span is written as one JSON line (``{"ts", "type": "span",
+  "name", "ms", ...labels}``) to ``RAG_METRICS_LOG`` or stderr;
+- spans, counters and observations are aggregated in memory and rendered in
+  the Prometheus text format by ``render_prometheus``; ``add_metrics_route``
+  exposes that on a FastAPI app.
+
+Metric names are dotted (``ingest.embed``) and become ``rag_ingest_embed_*``
+in Prometheus. Labels should stay low-cardinality (mode, model, status).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO, Tuple
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_enabled = os.environ.get("RAG_METRICS", "").lower() in ("1", "true", "yes", "on")
+_log_path: Optional[str] = os.environ.get("RAG_METRICS_LOG") or None
+_log_file: Optional[TextIO] = None
+_lock = threading.Lock()
+_counters: Dict[_Key, float] = {}
+# name/labels -> [count, sum, max]
+_summaries: Dict[_Key, list] = {}
+_span_keys: set = set()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def configure(enabled: Optional[bool] = None, log_path: Optional[str] = None) -> None:
+    """Turn collection on or off and optionally redirect the JSON log (``"-"`` for stderr)."""
+    global _enabled, _log_path, _log_file
+    with _lock:
+        if enabled is not None:
+            _enabled = enabled
+        if log_path is not None:
+            if _log_file is not None:
+                _log_file.close()
+            _log_path, _log_file = (None if log_path == "-" else log_path), None
+
+
+def reset() -> None:
+    """Forget all aggregated values."""
+    with _lock:
+        _counters.clear()
+        _summaries.clear()
+        _span_keys.clear()
+
+
+def _key(name: str, labels: Dict[str, Any]) -> _Key:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _write_log(record: Dict[str, Any]) -> None:
+    global _log_file
+    line = json.dumps(record, default=str)
+    with _lock:
+        if _log_path is None:
+            stream: TextIO = sys.stderr
+        else:
+            if _log_file is None:
+                _log_file = open(_log_path, "a", encoding="utf-8")
+            stream = _log_file
+        stream.write(line + "\n")
+        stream.flush()
+
+
+def _observe(key: _Key, value: float) -> None:
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            _summaries[key] = [1, value, value]
+        else:
+            summary[0] += 1
+            summary[1] += value
+            if value > summary[2]:
+                summary[2] = value
+
+
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    """Add ``value`` to counter ``name`` (e.g. cache hits, bytes read, tokens sent)."""
+    if not _enabled or not value:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Record one observation of ``name`` (e.g. a batch size) as count/sum/max."""
+    if not _enabled:
+        return
+    _observe(_key(name, labels), value)
+
+
+class Span:
+    """Times a block; extra attributes set with ``set`` go to the JSON log only."""
+
+    __slots__ = ("name", "labels", "attributes", "_start")
+
+    def __init__(self, name: str, labels: Dict[str, Any]) -> None:
+        self.name = name
+        self.labels = labels
+        self.attributes: Dict[str, Any] = {}
+        self._start = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds = time.perf_counter() - self._start
+        key = _key(self.name, self.labels)
+        with _lock:
+            _span_keys.add(key)
+        _observe(key, seconds)
+        record = {
+            "ts": round(time.time(), 3),
+            "type": "span",
+            "name": self.name,
+            "ms": round(seconds * 1000, 3),
+            **self.labels,
+            **self.attributes,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _write_log(record)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **labels: Any):
+    """Context manager timing a block as span ``name``; a shared no-op when disabled."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+
+def _prometheus_name(name: str) -> str:
+    return "rag_" + "".join(char if char.isalnum() else "_" for char in name)
+
+
+def _prometheus_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus() -> str:
+    """Render the aggregated metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        summaries = sorted((key, list(values)) for key, values in _summaries.items())
+        span_keys = set(_span_keys)
+    typed = set()
+    for (name, labels), value in counters:
+        metric = _prometheus_name(name) + "_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_prometheus_labels(labels)} {value:g}")
+    families: Dict[str, list] = {}
+    for key, values in summaries:
+        name, labels = key
+        metric = _prometheus_name(name) + ("_seconds" if key in span_keys else "")
+        families.setdefault(metric, []).append((_prometheus_labels(labels), values))
+    for metric, rows in families.items():
+        lines.append(f"# TYPE {metric} summary")
+        for rendered, (count, total, _) in rows:
+            lines.append(f"{metric}_count{rendered} {count}")
+            lines.append(f"{metric}_sum{rendered} {total:.6g}")
+        lines.append(f"# TYPE {metric}_max gauge")
+        for rendered, (_, _, maximum) in rows:
+            lines.append(f"{metric}_max{rendered} {maximum:.6g}")
+    return "\n".join(lines) + "\n"
+
+
+def add_metrics_route(app, path: str = "/metrics") -> None:
+    """Serve ``render_prometheus`` from a FastAPI ``app`` at ``path``."""
+    from fastapi.responses import PlainTextResponse
+
+    @app.get(path, include_in_schema=False)
+    def metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            render_prometheus(), media_type="text/plain; version=0.0.4"
+        )
@@ -0,0 +1,208 @@
+"""
+Semantic cache for retrieval results and chat answers.
+
+``rag_cache.ResponseCache`` only helps when a request is byte-for-byte
+identical. Users of the chat backend and notebooks mostly ask *near*-identical
+questions, so ``SemanticCache`` matches on the query embedding instead: when a
+new query is within ``threshold`` cosine similarity of a cached one under the
+same scope (e.g. the same ``k`` and retrieval mode), the cached documents (or
+answer) are returned without searching the index or calling the chat API.
+
+Entries live in memory in a fixed-size matrix, so a lookup is one
+matrix-vector product, and the least recently used entry is evicted when the
+cache is full. Every lookup checks the ``build_id`` in the manifest beside
+the vector store (a stat call, re-reading the file only when it changed) and
+drops all entries once ``rag_ingest`` has rebuilt the index.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import rag_metrics
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
+
+DEFAULT_THRESHOLD = float(os.environ.get("RAG_SEMANTIC_THRESHOLD", 0.95))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RAG_SEMANTIC_CACHE_SIZE", 1024))
+MANIFEST_NAME = "docs-manifest.json"
+
+
+@dataclass
+class SemanticHit:
+    query: str
+    similarity: float
+    documents: Optional[List[Document]] = None
+    answer: Any = None
+
+
+@dataclass
+class SemanticCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), "
+            f"{self.evictions} evictions, {self.invalidations} invalidations"
+        )
+
+
+def read_build_id(persist_dir: Path | str) -> Optional[str]:
+    """The ``build_id`` that ``rag_ingest`` writes to the manifest beside ``persist_dir``."""
+    manifest_path = Path(persist_dir).parent / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return manifest.get("build_id") if isinstance(manifest, dict) else None
+
+
+class SemanticCache:
+    """Thread-safe LRU cache keyed by query-embedding similarity."""
+
+    def __init__(
+        self,
+        persist_dir: Optional[Path | str] = None,
+        embeddings: Optional[Embeddings] = None,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.persist_dir = Path(persist_dir) if persist_dir is not None else None
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.stats = SemanticCacheStats()
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: List[Optional[str]] = [None] * max_entries
+        self._entries: Dict[int, SemanticHit] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._manifest_signature: Optional[Tuple[int, int]] = None
+        self._build_id: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def embed(self, query: str) -> List[float]:
+        if self.embeddings is None:
+            raise ValueError("SemanticCache was created without an embedding model.")
+        return self.embeddings.embed_query(query)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._lru.clear()
+        self._scopes = [None] * self.max_entries
+
+    def _check_build(self) -> None:
+        if self.persist_dir is None:
+            return
+        try:
+            stat = (self.persist_dir.parent / MANIFEST_NAME).stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._manifest_signature:
+            return
+        self._manifest_signature = signature
+        build_id = read_build_id(self.persist_dir)
+        if build_id != self._build_id:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._clear()
+            self._build_id = build_id
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _nearest(self, vector: np.ndarray, scope: str) -> Tuple[Optional[int], float]:
+        if (
+            not self._entries
+            or self._vectors is None
+            or self._vectors.shape[1] != len(vector)
+        ):
+            return None, 0.0
+        similarities = self._vectors @ vector
+        slots = [slot for slot in self._entries if self._scopes[slot] == scope]
+        if not slots:
+            return None, 0.0
+        best = max(slots, key=lambda slot: similarities[slot])
+        return best, float(similarities[best])
+
+    def lookup(self, vector: Sequence[float], scope: str = "") -> Optional[SemanticHit]:
+        """Return the closest entry in ``scope`` if it is within the threshold."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._check_build()
+            slot, similarity = self._nearest(vector, scope)
+            if slot is None or similarity < self.threshold:
+                self.stats.misses += 1
+                rag_metrics.incr("semantic_cache.misses", scope=scope.split(":")[0])
+                return None
+            self.stats.hits += 1
+            rag_metrics.incr("semantic_cache.hits", scope=scope.split(":")[0])
+            self._lru.move_to_end(slot)
+            entry = self._entries[slot]
+            return SemanticHit(entry.query, similarity, entry.documents, entry.answer)
+
+    def put(
+        self,
+        vector: Sequence[float],
+        query: str,
+        scope: str = "",
+        *,
+        documents: Optional[List[Document]] = None,
+        answer: Any = None,
+    ) -> None:
+        """Store ``documents`` and/or ``answer``, replacing an entry for a near-identical query."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._check_build()
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros(
+                    (self.max_entries, len(vector)), dtype=np.float32
+                )
+                self._clear()
+            slot, similarity = self._nearest(vector, scope)
+            if slot is None or similarity < self.threshold:
+                if len(self._entries) < self.max_entries:
+                    slot = next(
+                        i for i in range(self.max_entries) if i not in self._entries
+                    )
+                else:
+                    slot, _ = self._lru.popitem(last=False)
+                    self.stats.evictions += 1
+                self._vectors[slot] = vector
+                self._scopes[slot] = scope
+                self._entries[slot] = SemanticHit(query, 1.0)
+            entry = self._entries[slot]
+            if documents is not None:
+                entry.documents = list(documents)
+            if answer is not None:
+                entry.answer = answer
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
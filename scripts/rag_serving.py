@@ -0,0 +1,282 @@
+"""
+Memory-mapped serving format for the RAG vector store.
+
+``rag_utils.export_serving_store`` writes it and ``rag_utils.load_vector_store``
+opens it as a ``MappedVectorStore``. Kept apart from ``rag_utils`` because it
+needs FAISS and the LangChain base classes at import time, which
+``rag_utils`` only loads once a store is actually opened.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from array import array
+from pathlib import Path
+from typing import Any, Iterable, List, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from rag_index import IndexSpec, apply_search_params
+from rag_lexical import LEXICAL_INDEX_NAME, LexicalIndex
+from rag_utils import (
+    DEFAULT_EMBED_MODEL,
+    SERVING_DIR,
+    SERVING_FORMAT_VERSION,
+    SERVING_META,
+    VECTORSTORE_DIR,
+    get_embeddings,
+    load_index_spec,
+    search_by_vectors,
+    serving_data_dir,
+)
+
+SERVING_VERSION_PREFIX = "v-"
+# Exports kept besides the current one, for readers that read the previous
+# pointer just before it was switched and have not opened its files yet.
+SERVING_KEEP_PREVIOUS = 1
+
+
+class _Column:
+    """Read-only variable-length byte column: a blob file plus an offsets array."""
+
+    def __init__(self, directory: Path, name: str) -> None:
+        self.offsets = np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+        blob_path = directory / f"{name}.bin"
+        self._file = blob_path.open("rb")
+        size = blob_path.stat().st_size
+        self._blob = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return self._blob[start:end].decode("utf-8")
+
+
+class _ColumnWriter:
+    def __init__(self, directory: Path, name: str) -> None:
+        self.directory = directory
+        self.name = name
+        self._blob = (directory / f"{name}.bin").open("wb")
+        self._offsets = array("q", [0])
+
+    def append(self, value: str) -> None:
+        data = value.encode("utf-8")
+        self._blob.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self) -> None:
+        self._blob.close()
+        np.save(
+            self.directory / f"{self.name}.offsets.npy",
+            np.frombuffer(self._offsets, dtype=np.int64),
+        )
+
+
+class _ColumnDocstore:
+    """Docstore view over the columnar chunk store; IDs are row numbers."""
+
+    def __init__(self, texts: _Column, metadata: _Column) -> None:
+        self.texts = texts
+        self.metadata = metadata
+
+    def search(self, row: int) -> Document:
+        return Document(
+            page_content=self.texts[row], metadata=json.loads(self.metadata[row])
+        )
+
+
+class _RowIds:
+    """Identity mapping from FAISS row to docstore row, mirroring ``index_to_docstore_id``."""
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+
+    def __getitem__(self, row: int) -> int:
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return int(row)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class MappedVectorStore(VectorStore):
+    """
+    Read-only vector store over the memory-mapped serving format.
+
+    The FAISS index is opened with ``IO_FLAG_MMAP_IFC`` (falling back to
+    ``IO_FLAG_MMAP`` on older FAISS builds, which maps IVF lists only), and chunk
+    text and metadata are sliced out of mmap'd columnar files on demand. Every
+    worker process serving the same directory therefore shares one copy of the
+    data through the OS page cache, and nothing is unpickled. It exposes the
+    same ``index``/``index_to_docstore_id``/``docstore`` attributes as the
+    LangChain FAISS store, so ``search_by_vectors`` works on either.
+
+    ``directory`` holds ``serving.json``, which points at the export to open;
+    a store keeps using the files it opened even after the pointer moves on
+    (``rag_utils.get_vector_store`` reopens when it does).
+    """
+
+    _normalize_L2 = False
+
+    def __init__(self, directory: Path | str, embeddings: Embeddings) -> None:
+        self.directory = Path(directory)
+        self.meta = json.loads(
+            (self.directory / SERVING_META).read_text(encoding="utf-8")
+        )
+        if self.meta.get("format_version") != SERVING_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported serving format in {directory}; re-export it with export_serving_store."
+            )
+        directory = serving_data_dir(self.directory, self.meta)
+        flags = (
+            getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            | faiss.IO_FLAG_READ_ONLY
+        )
+        self.index = faiss.read_index(str(directory / "index.faiss"), flags)
+        self._embeddings = embeddings
+        self.docstore = _ColumnDocstore(
+            _Column(directory, "texts"), _Column(directory, "metadata")
+        )
+        self.index_to_docstore_id = _RowIds(self.index.ntotal)
+        spec = IndexSpec.from_dict(self.meta.get("index"))
+        apply_search_params(
+            self.index,
+            nprobe=int(os.environ.get("RAG_NPROBE", spec.nprobe)),
+            ef_search=int(os.environ.get("RAG_EF_SEARCH", spec.ef_search)),
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return search_by_vectors(self, [embedding], k)[0]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self._embeddings.embed_query(query), k
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def add_texts(
+        self, texts: Iterable[str], metadatas=None, **kwargs: Any
+    ) -> List[str]:
+        raise NotImplementedError(
+            "The serving store is read-only; re-run rag_ingest and export."
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs: Any):
+        raise NotImplementedError(
+            "Build with rag_ingest and export with export_serving_store."
+        )
+
+
+def export_serving_store(
+    source_dir: Path | str = VECTORSTORE_DIR,
+    output_dir: Path | str = SERVING_DIR,
+    embeddings_model: str = DEFAULT_EMBED_MODEL,
+) -> Path:
+    """
+    Convert a saved FAISS store into the memory-mappable serving format.
+
+    Writes ``index.faiss``, ``texts.bin``/``metadata.bin`` with int64 offset
+    arrays and the BM25 index re-keyed by row into a new ``v-*`` directory
+    under ``output_dir``, then atomically replaces ``serving.json`` to point at
+    it. Files that running workers have mapped are never modified; the pointer
+    change tells them to reopen, and older exports are removed (open mappings
+    of removed files stay valid). Load the result with
+    ``load_vector_store(persist_dir=output_dir)``.
+    """
+    source_dir, output_dir = Path(source_dir), Path(output_dir)
+    version = f"{SERVING_VERSION_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    staging_dir = output_dir / f".{version}.partial"
+    staging_dir.mkdir(parents=True)
+    try:
+        vectorstore = FAISS.load_local(
+            str(source_dir),
+            get_embeddings(embeddings_model),
+            allow_dangerous_deserialization=True,
+        )
+        _write_export(vectorstore, source_dir, staging_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    staging_dir.rename(output_dir / version)
+
+    meta = {
+        "format_version": SERVING_FORMAT_VERSION,
+        "current": version,
+        "count": vectorstore.index.ntotal,
+        "dim": vectorstore.index.d,
+        "embedding_model": embeddings_model,
+        "index": load_index_spec(source_dir).to_dict(),
+    }
+    tmp_meta = output_dir / f"{SERVING_META}.{version}.tmp"
+    tmp_meta.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    tmp_meta.replace(output_dir / SERVING_META)
+    _remove_old_exports(output_dir, version)
+    return output_dir
+
+
+def _write_export(vectorstore: FAISS, source_dir: Path, directory: Path) -> None:
+    faiss.write_index(vectorstore.index, str(directory / "index.faiss"))
+    texts = _ColumnWriter(directory, "texts")
+    metadata = _ColumnWriter(directory, "metadata")
+    for row in range(vectorstore.index.ntotal):
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+        texts.append(doc.page_content)
+        metadata.append(json.dumps(doc.metadata))
+    texts.close()
+    metadata.close()
+
+    # The serving docstore is keyed by row, so re-key the BM25 index to match.
+    lexical_path = source_dir / LEXICAL_INDEX_NAME
+    if lexical_path.exists():
+        lexical = LexicalIndex.load(lexical_path)
+        rows = {doc_id: row for row, doc_id in vectorstore.index_to_docstore_id.items()}
+        lexical.ids = [str(rows[doc_id]) for doc_id in lexical.ids]
+        lexical.save(directory / LEXICAL_INDEX_NAME)
+
+
+def _remove_old_exports(output_dir: Path, current: str) -> None:
+    versions = sorted(
+        (
+            path
+            for path in output_dir.glob(f"{SERVING_VERSION_PREFIX}*")
+            if path.is_dir() and path.name != current
+        ),
+        key=lambda path: path.stat().st_mtime_ns,
+    )
+    for path in versions[: max(0, len(versions) - SERVING_KEEP_PREVIOUS)]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -1,45 +1,264 @@
 """
 Helper functions for working with the repository RAG assets.
+
+Importing this module is cheap: FAISS, LangChain and the embedding model are
+loaded on first use (``get_embeddings``, ``load_vector_store``), so CLIs,
+``format_context`` and the FastAPI app do not pay for them up front. The
+memory-mapped serving store lives in ``rag_serving``; ``MappedVectorStore``
+and ``export_serving_store`` are still importable from here.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import os
+import threading
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+import numpy as np
+
+from chat_client import (
+    AsyncChatClient,
+    get_client,
+    requests_errors,
+    run_sync,
+    to_requests_response,
+)
+import rag_metrics
+from rag_cache import ResponseCache
+from rag_context import DEFAULT_TOKEN_BUDGET, PackStats, estimate_tokens, pack_context
+from rag_index import IndexSpec, apply_search_params, search_parameters
+from rag_lexical import LEXICAL_INDEX_NAME, LexicalIndex, reciprocal_rank_fusion
+from rag_semantic_cache import SemanticCache
+
+if TYPE_CHECKING:
+    import requests
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.vectorstores import VectorStore
 
-import requests
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
+    from rag_embeddings import CachedEmbeddings
 
 REPO_ROOT = Path(__file__).resolve().parents[1]
 RAG_DIR = REPO_ROOT / "data" / "rag"
 VECTORSTORE_DIR = RAG_DIR / "vectorstore"
+SERVING_DIR = RAG_DIR / "serving"
+MANIFEST_NAME = "docs-manifest.json"
+SERVING_META = "serving.json"
+SERVING_FORMAT_VERSION = 2
 
 DEFAULT_EMBED_MODEL = os.environ.get(
     "RAG_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
 )
 DEFAULT_CHAT_URL = os.environ.get("KB_CHAT_URL", "https://kb.terpedia.com/v1/api/chat")
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+DEFAULT_RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "vector")
+
+# Files whose stat signature decides when a cached store is reloaded: the two
+# written by FAISS.save_local, and the pointer that export_serving_store
+# replaces last.
+INDEX_FILES = ("index.faiss", "index.pkl", SERVING_META)
+
+_embeddings: Dict[str, CachedEmbeddings] = {}
+_embeddings_lock = threading.Lock()
+_stores: Dict[Tuple[str, str], Tuple[VectorStore, tuple]] = {}
+_store_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_stores_lock = threading.Lock()
+_lexical: Dict[str, Tuple[Optional[LexicalIndex], tuple]] = {}
+_lexical_lock = threading.Lock()
+_semantic_caches: Dict[Tuple[str, str], SemanticCache] = {}
+_semantic_caches_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    # The serving store needs FAISS and LangChain at import time; load it on demand.
+    if name in ("MappedVectorStore", "export_serving_store"):
+        import rag_serving
+
+        return getattr(rag_serving, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_embeddings(embeddings_model: str = DEFAULT_EMBED_MODEL) -> CachedEmbeddings:
+    """Return the process-wide embedding model for ``embeddings_model``, loading it once."""
+    from rag_embeddings import CachedEmbeddings, load_embeddings
+
+    with _embeddings_lock:
+        if embeddings_model not in _embeddings:
+            _embeddings[embeddings_model] = CachedEmbeddings(
+                load_embeddings(embeddings_model),
+                embeddings_model,
+            )
+        return _embeddings[embeddings_model]
+
+
+def serving_data_dir(persist_dir: Path | str, meta: Optional[dict] = None) -> Path:
+    """
+    Directory of the export that ``serving.json`` in ``persist_dir`` points at,
+    or ``persist_dir`` itself for a store saved by ``rag_ingest``.
+    """
+    persist_dir = Path(persist_dir)
+    if meta is None:
+        try:
+            meta = json.loads((persist_dir / SERVING_META).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return persist_dir
+    return persist_dir / meta["current"] if meta.get("current") else persist_dir
+
+
+def load_index_spec(persist_dir: Path | str = VECTORSTORE_DIR) -> IndexSpec:
+    """Read the index spec recorded by ``rag_ingest`` in the manifest beside ``persist_dir``."""
+    manifest_path = Path(persist_dir).parent / MANIFEST_NAME
+    if not manifest_path.exists():
+        return IndexSpec()
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    return (
+        IndexSpec.from_dict(manifest.get("index"))
+        if isinstance(manifest, dict)
+        else IndexSpec()
+    )
 
 
 def load_vector_store(
     embeddings_model: str = DEFAULT_EMBED_MODEL,
     persist_dir: Path | str = VECTORSTORE_DIR,
 ):
-    """Load the FAISS vector store from disk."""
+    """
+    Load the FAISS vector store from disk, embedding queries through the shared cache.
+
+    IVF and HNSW indexes get the default ``nprobe``/``efSearch`` recorded in the
+    manifest; ``RAG_NPROBE`` and ``RAG_EF_SEARCH`` override them. A directory
+    written by ``export_serving_store`` is opened as a memory-mapped
+    ``MappedVectorStore`` instead, without unpickling anything.
+    """
     persist_dir = Path(persist_dir)
     if not persist_dir.exists():
         raise FileNotFoundError(
             f"Vector store not found at {persist_dir}. Run rag_ingest.build_vector_store first."
         )
+    if (persist_dir / SERVING_META).exists():
+        from rag_serving import MappedVectorStore
 
-    embeddings = SentenceTransformerEmbeddings(model_name=embeddings_model)
-    return FAISS.load_local(
+        return MappedVectorStore(persist_dir, get_embeddings(embeddings_model))
+
+    from langchain_community.vectorstores import FAISS
+
+    vectorstore = FAISS.load_local(
         str(persist_dir),
-        embeddings,
+        get_embeddings(embeddings_model),
         allow_dangerous_deserialization=True,
     )
+    spec = load_index_spec(persist_dir)
+    apply_search_params(
+        vectorstore.index,
+        nprobe=int(os.environ.get("RAG_NPROBE", spec.nprobe)),
+        ef_search=int(os.environ.get("RAG_EF_SEARCH", spec.ef_search)),
+    )
+    return vectorstore
+
+
+def _index_signature(persist_dir: Path) -> tuple:
+    signature = []
+    for name in INDEX_FILES:
+        try:
+            stat = (persist_dir / name).stat()
+        except FileNotFoundError:
+            continue
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def get_vector_store(
+    embeddings_model: str = DEFAULT_EMBED_MODEL,
+    persist_dir: Path | str = VECTORSTORE_DIR,
+):
+    """
+    Return a long-lived FAISS store for ``(persist_dir, embeddings_model)``.
+
+    The store is loaded on first use and shared by every caller in the process.
+    Each call stats the index files and transparently reloads the store when
+    they changed on disk (e.g. after ``rag_ingest`` ran). Safe to call from
+    concurrent threads; a given store is only ever loaded by one of them.
+    """
+    persist_dir = Path(persist_dir).resolve()
+    key = (str(persist_dir), embeddings_model)
+    with _stores_lock:
+        lock = _store_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        signature = _index_signature(persist_dir)
+        cached = _stores.get(key)
+        if cached is not None and cached[1] == signature:
+            return cached[0]
+        with rag_metrics.span("store.load"):
+            vectorstore = load_vector_store(embeddings_model, persist_dir)
+        _stores[key] = (vectorstore, signature)
+        return vectorstore
+
+
+def clear_vector_store_cache() -> None:
+    """Forget every cached store so the next retrieval reloads from disk."""
+    with _stores_lock:
+        _stores.clear()
+    with _lexical_lock:
+        _lexical.clear()
+
+
+def get_lexical_index(
+    persist_dir: Path | str = VECTORSTORE_DIR,
+) -> Optional[LexicalIndex]:
+    """
+    Return the shared BM25 index saved beside ``persist_dir``, or ``None`` if
+    the store was built without one. Reloaded when the file changes on disk.
+    """
+    path = serving_data_dir(Path(persist_dir).resolve()) / LEXICAL_INDEX_NAME
+    with _lexical_lock:
+        try:
+            stat = path.stat()
+            signature: tuple = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = ()
+        cached = _lexical.get(str(path))
+        if cached is not None and cached[1] == signature:
+            return cached[0]
+        lexical = LexicalIndex.load(path) if signature else None
+        _lexical[str(path)] = (lexical, signature)
+        return lexical
+
+
+def get_semantic_cache(
+    embeddings_model: str = DEFAULT_EMBED_MODEL,
+    persist_dir: Path | str = VECTORSTORE_DIR,
+) -> SemanticCache:
+    """
+    Return the process-wide semantic cache for ``(persist_dir, embeddings_model)``.
+
+    Its entries are dropped automatically when ``rag_ingest`` writes a new
+    ``build_id`` to the manifest. ``RAG_SEMANTIC_THRESHOLD`` and
+    ``RAG_SEMANTIC_CACHE_SIZE`` set the similarity threshold and capacity.
+    """
+    persist_dir = Path(persist_dir).resolve()
+    key = (str(persist_dir), embeddings_model)
+    with _semantic_caches_lock:
+        if key not in _semantic_caches:
+            _semantic_caches[key] = SemanticCache(
+                persist_dir, get_embeddings(embeddings_model)
+            )
+        return _semantic_caches[key]
 
 
 def retrieve_context(
@@ -47,15 +266,269 @@ def retrieve_context(
     *,
     retriever=None,
     k: int = 4,
+    embeddings_model: str = DEFAULT_EMBED_MODEL,
+    persist_dir: Path | str = VECTORSTORE_DIR,
+    mode: Optional[str] = None,
+    semantic_cache: Optional[SemanticCache] = None,
 ) -> List[Document]:
-    """Return the top-k documents for a query."""
-    if retriever is None:
-        retriever = load_vector_store().as_retriever(search_kwargs={"k": k})
-    return retriever.get_relevant_documents(query)
+    """
+    Return the top-k documents for a query.
+
+    Without an explicit ``retriever`` the shared store from ``get_vector_store``
+    is used, so only the first call in a process pays for loading the model
+    and index. ``mode`` (default ``RAG_RETRIEVAL_MODE``) selects ``vector``,
+    ``lexical`` (BM25 only) or ``hybrid`` retrieval; see
+    ``retrieve_context_batch``.
+
+    With a ``semantic_cache`` (see ``get_semantic_cache``) a query whose
+    embedding is close enough to an earlier one with the same ``k`` and
+    ``mode`` returns the earlier documents without searching the index.
+    """
+    mode = mode or DEFAULT_RETRIEVAL_MODE
+    with rag_metrics.span("retrieve", mode=mode) as span:
+        if retriever is None and semantic_cache is not None:
+            vector = semantic_cache.embed(query)
+            scope = f"retrieve:{mode}:{k}"
+            hit = semantic_cache.lookup(vector, scope)
+            span.set(semantic_hit=hit is not None and hit.documents is not None)
+            if hit is not None and hit.documents is not None:
+                return hit.documents
+            vectorstore = get_vector_store(embeddings_model, persist_dir)
+            lexical = get_lexical_index(persist_dir) if mode != "vector" else None
+            if lexical is not None and mode == "lexical":
+                documents = search_hybrid(vectorstore, lexical, [query], None, k)[0]
+            else:
+                documents = _search(vectorstore, lexical, [query], [vector], k)[0]
+            semantic_cache.put(vector, query, scope, documents=documents)
+            return documents
+        if retriever is None and mode != "vector":
+            return retrieve_context_batch(
+                [query],
+                k,
+                embeddings_model=embeddings_model,
+                persist_dir=persist_dir,
+                mode=mode,
+            )[0]
+        if retriever is None:
+            vectorstore = get_vector_store(embeddings_model, persist_dir)
+            retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+        return retriever.get_relevant_documents(query)
+
+
+def search_by_vectors(
+    vectorstore: FAISS,
+    vectors: Sequence[Sequence[float]],
+    k: int = 4,
+    *,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    Run one FAISS search for a matrix of query vectors.
+
+    Each row over-fetches a little and then drops chunks whose text was already
+    returned for that query, so duplicated passages do not crowd out the top-k.
+    ``nprobe``/``ef_search`` override the index defaults for this call only.
+    """
+    from langchain_core.documents import Document
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.size == 0:
+        return [[] for _ in range(len(matrix))]
+    scores, indices = _search_index(vectorstore, matrix, _fetch_k(k), nprobe, ef_search)
+
+    results: List[List[Tuple[Document, float]]] = []
+    for row_scores, row_indices in zip(scores, indices):
+        seen = set()
+        hits: List[Tuple[Document, float]] = []
+        for score, index in zip(row_scores, row_indices):
+            if index == -1:
+                continue
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[index])
+            if not isinstance(doc, Document) or doc.page_content in seen:
+                continue
+            seen.add(doc.page_content)
+            hits.append((doc, float(score)))
+            if len(hits) == k:
+                break
+        results.append(hits)
+    return results
+
+
+def _fetch_k(k: int) -> int:
+    return max(2 * k, k + 4)
+
+
+def _search_index(
+    vectorstore: FAISS,
+    matrix: np.ndarray,
+    fetch_k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    if vectorstore._normalize_L2:
+        matrix = matrix / np.maximum(
+            np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12
+        )
+    fetch_k = min(fetch_k, vectorstore.index.ntotal)
+    params = search_parameters(vectorstore.index, nprobe=nprobe, ef_search=ef_search)
+    with rag_metrics.span("retrieve.search"):
+        if params is None:
+            return vectorstore.index.search(matrix, fetch_k)
+        return vectorstore.index.search(matrix, fetch_k, params=params)
+
+
+def _docstore_key(vectorstore, doc_id: str):
+    """Lexical IDs are strings; the serving docstore is keyed by integer row."""
+    from rag_serving import MappedVectorStore
+
+    return int(doc_id) if isinstance(vectorstore, MappedVectorStore) else doc_id
+
+
+def search_hybrid(
+    vectorstore: FAISS,
+    lexical: LexicalIndex,
+    queries: Sequence[str],
+    vectors: Optional[Sequence[Sequence[float]]],
+    k: int = 4,
+    *,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Document]]:
+    """
+    Merge BM25 and vector hits per query with reciprocal-rank fusion.
+
+    Each ranking is over-fetched like ``search_by_vectors`` and the fused list
+    is deduplicated by text. With ``vectors=None`` only the BM25 ranking is
+    used, which needs neither the embedding model nor an index search.
+    """
+    from langchain_core.documents import Document
+
+    fetch_k = _fetch_k(k)
+    vector_ids: List[List[str]] = [[] for _ in queries]
+    if vectors is not None and len(queries):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        _, indices = _search_index(vectorstore, matrix, fetch_k, nprobe, ef_search)
+        vector_ids = [
+            [
+                str(vectorstore.index_to_docstore_id[index])
+                for index in row
+                if index != -1
+            ]
+            for row in indices
+        ]
+
+    results: List[List[Document]] = []
+    for query, ranked_vectors in zip(queries, vector_ids):
+        with rag_metrics.span("retrieve.lexical"):
+            ranked_lexical = [doc_id for doc_id, _ in lexical.search(query, fetch_k)]
+        seen = set()
+        docs: List[Document] = []
+        for doc_id, _ in reciprocal_rank_fusion([ranked_vectors, ranked_lexical]):
+            doc = vectorstore.docstore.search(_docstore_key(vectorstore, doc_id))
+            if not isinstance(doc, Document) or doc.page_content in seen:
+                continue
+            seen.add(doc.page_content)
+            docs.append(doc)
+            if len(docs) == k:
+                break
+        results.append(docs)
+    return results
 
 
-def format_context(documents: Iterable[Document]) -> str:
-    """Render retrieved documents into a prompt-friendly string."""
+def retrieve_context_batch(
+    queries: Sequence[str],
+    k: int = 4,
+    *,
+    embeddings_model: str = DEFAULT_EMBED_MODEL,
+    persist_dir: Path | str = VECTORSTORE_DIR,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> List[List[Document]]:
+    """
+    Return the top-k documents for each of ``queries``.
+
+    All queries are embedded in one encoder pass and searched with a single
+    matrix query against the shared index, which is much cheaper than calling
+    ``retrieve_context`` in a loop. Results are deduplicated per query.
+    ``nprobe``/``ef_search`` trade recall for speed on IVF/HNSW indexes.
+
+    ``mode="hybrid"`` fuses the vector ranking with the BM25 index built by
+    ``rag_ingest`` (``search_hybrid``), which recovers exact-term matches such
+    as instrument and compound names; ``mode="lexical"`` skips embedding
+    entirely. Both fall back to vector search for stores without a BM25 index.
+    """
+    mode = mode or DEFAULT_RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(
+            f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}."
+        )
+    if not queries:
+        return []
+    rag_metrics.observe("retrieve.batch_size", len(queries), mode=mode)
+    vectorstore = get_vector_store(embeddings_model, persist_dir)
+    lexical = get_lexical_index(persist_dir) if mode != "vector" else None
+    if lexical is not None and mode == "lexical":
+        return search_hybrid(vectorstore, lexical, queries, None, k)
+    with rag_metrics.span("retrieve.embed", queries=len(queries)):
+        vectors = get_embeddings(embeddings_model).embed_queries(list(queries))
+    return _search(
+        vectorstore, lexical, queries, vectors, k, nprobe=nprobe, ef_search=ef_search
+    )
+
+
+def _search(
+    vectorstore,
+    lexical: Optional[LexicalIndex],
+    queries: Sequence[str],
+    vectors: Sequence[Sequence[float]],
+    k: int,
+    *,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> List[List[Document]]:
+    if lexical is not None:
+        return search_hybrid(
+            vectorstore,
+            lexical,
+            queries,
+            vectors,
+            k,
+            nprobe=nprobe,
+            ef_search=ef_search,
+        )
+    hits = search_by_vectors(
+        vectorstore, vectors, k, nprobe=nprobe, ef_search=ef_search
+    )
+    return [[doc for doc, _ in row] for row in hits]
+
+
+def format_context(
+    documents: Iterable[Document],
+    *,
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    pack: bool = False,
+    pack_stats: Optional[PackStats] = None,
+) -> str:
+    """
+    Render retrieved documents into a prompt-friendly string, one numbered
+    passage per document.
+
+    With ``pack=True`` or a ``token_budget`` (default ``RAG_CONTEXT_TOKENS``,
+    unset means no packing) the documents first go through
+    ``rag_context.pack_context``: overlapping neighbours from the same source
+    are merged, near-duplicates dropped, and passages kept by rank until the
+    budget is used up, so the numbering no longer follows the retrieval order.
+    The token accounting is added to ``pack_stats`` when given.
+    """
+    documents = list(documents)
+    if pack or token_budget is not None:
+        documents, stats = pack_context(documents, token_budget)
+        rag_metrics.incr("context.tokens_in", stats.input_tokens)
+        rag_metrics.incr("context.tokens_saved", stats.saved_tokens)
+        if pack_stats is not None:
+            pack_stats.add(stats)
     lines = []
     for idx, doc in enumerate(documents, start=1):
         source = doc.metadata.get("source", "unknown")
@@ -64,38 +537,192 @@ def format_context(documents: Iterable[Document]) -> str:
     return "\n\n".join(lines)
 
 
-def call_chat_api(
+def build_chat_messages(
     prompt: str,
     context_documents: Iterable[Document],
-    *,
     history: Optional[List[dict]] = None,
-    api_url: str = DEFAULT_CHAT_URL,
-    api_key: Optional[str] = None,
-    timeout: int = 60,
-) -> requests.Response:
-    """
-    Send the prompt and retrieved context to the Terpedia chat endpoint.
+    *,
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    pack_stats: Optional[PackStats] = None,
+) -> List[dict]:
+    context = format_context(
+        context_documents, token_budget=token_budget, pack_stats=pack_stats
+    )
+    return _chat_messages(prompt, context, history)
 
-    The exact payload schema may vary; adjust as needed to match the upstream API.
-    """
-    context = format_context(context_documents)
-    history = history or []
-    messages = history + [
+
+def _chat_messages(
+    prompt: str, context: str, history: Optional[List[dict]] = None
+) -> List[dict]:
+    return (history or []) + [
         {
             "role": "user",
             "content": f"Context:\n{context}\n\nQuestion:\n{prompt}",
         }
     ]
 
+
+def _semantic_scope(api_url: str, context: str, payload: Dict[str, Any]) -> str:
+    """
+    Semantic-cache scope of a chat request: only the question is matched by
+    similarity, so the context and every other request parameter must be equal.
+    """
+    params = {name: value for name, value in payload.items() if name != "messages"}
+    digest = hashlib.sha256(
+        json.dumps([context, params], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"chat:{api_url}:{digest[:24]}"
+
+
+def _message_tokens(messages: Sequence[dict]) -> int:
+    return sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+
+
+def _chat_headers(api_key: Optional[str]) -> Dict[str, str]:
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
+    return headers
 
-    response = requests.post(
-        api_url,
-        json={"messages": messages},
-        timeout=timeout,
-        headers=headers,
+
+async def acall_chat_api(
+    prompt: str,
+    context_documents: Iterable[Document],
+    *,
+    history: Optional[List[dict]] = None,
+    api_url: str = DEFAULT_CHAT_URL,
+    api_key: Optional[str] = None,
+    timeout: int = 60,
+    client: Optional[AsyncChatClient] = None,
+    cache: Optional[ResponseCache] = None,
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    pack_stats: Optional[PackStats] = None,
+    semantic_cache: Optional[SemanticCache] = None,
+) -> httpx.Response:
+    """
+    Async version of ``call_chat_api`` for use inside an event loop.
+
+    Uses ``client`` or the event loop's shared pooled client, so concurrent
+    requests reuse connections and 429/5xx responses are retried with backoff.
+    With a ``cache``, a request identical to an earlier one (same endpoint,
+    messages and context) is answered from it. ``token_budget`` and
+    ``pack_stats`` are passed to ``format_context``.
+
+    With a ``semantic_cache``, a history-free prompt close enough to an earlier
+    one sent to the same endpoint with the same (packed) context and request
+    parameters is answered with the earlier response.
+
+    Returns an ``httpx.Response`` and raises httpx errors; ``call_chat_api``
+    converts both to their ``requests`` counterparts.
+    """
+    context = format_context(
+        context_documents, token_budget=token_budget, pack_stats=pack_stats
     )
+    messages = _chat_messages(prompt, context, history)
+    payload = {"messages": messages}
+
+    vector = None
+    scope = _semantic_scope(api_url, context, payload)
+    if semantic_cache is not None and not history:
+        vector = await asyncio.to_thread(semantic_cache.embed, prompt)
+        semantic_hit = semantic_cache.lookup(vector, scope)
+        if semantic_hit is not None and semantic_hit.answer is not None:
+            return httpx.Response(
+                200, json=semantic_hit.answer, request=httpx.Request("POST", api_url)
+            )
+
+    key = None
+    if cache is not None:
+        key = cache.response_key(api_url, messages)
+        hit = cache.get(key)
+        if hit is not None:
+            return httpx.Response(200, json=hit, request=httpx.Request("POST", api_url))
+
+    client = client or get_client()
+    rag_metrics.incr("chat.tokens_sent", _message_tokens(messages))
+    with rag_metrics.span("chat.request") as span:
+        response = await client.post_json(
+            api_url,
+            payload,
+            headers=_chat_headers(api_key),
+            timeout=timeout,
+        )
+        span.set(status=response.status_code)
+    rag_metrics.incr("chat.requests", status=response.status_code)
     response.raise_for_status()
+    if key is not None:
+        cache.put(key, response.json())
+    if vector is not None:
+        semantic_cache.put(vector, prompt, scope, answer=response.json())
     return response
+
+
+async def astream_chat_api(
+    prompt: str,
+    context_documents: Iterable[Document],
+    *,
+    history: Optional[List[dict]] = None,
+    api_url: str = DEFAULT_CHAT_URL,
+    api_key: Optional[str] = None,
+    timeout: int = 60,
+    client: Optional[AsyncChatClient] = None,
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    pack_stats: Optional[PackStats] = None,
+) -> AsyncIterator[str]:
+    """Yield answer tokens as the chat endpoint streams them (OpenAI-style SSE)."""
+    client = client or get_client()
+    messages = build_chat_messages(
+        prompt,
+        context_documents,
+        history,
+        token_budget=token_budget,
+        pack_stats=pack_stats,
+    )
+    rag_metrics.incr("chat.tokens_sent", _message_tokens(messages))
+    with rag_metrics.span("chat.stream"):
+        async for token in client.stream_sse(
+            api_url,
+            {"messages": messages},
+            headers=_chat_headers(api_key),
+            timeout=timeout,
+        ):
+            yield token
+
+
+def call_chat_api(
+    prompt: str,
+    context_documents: Iterable[Document],
+    *,
+    history: Optional[List[dict]] = None,
+    api_url: str = DEFAULT_CHAT_URL,
+    api_key: Optional[str] = None,
+    timeout: int = 60,
+    cache: Optional[ResponseCache] = None,
+    token_budget: Optional[int] = DEFAULT_TOKEN_BUDGET,
+    pack_stats: Optional[PackStats] = None,
+    semantic_cache: Optional[SemanticCache] = None,
+) -> requests.Response:
+    """
+    Send the prompt and retrieved context to the Terpedia chat endpoint.
+
+    The exact payload schema may vary; adjust as needed to match the upstream API.
+    Blocking wrapper around ``acall_chat_api`` for CLIs and notebooks. It still
+    returns a ``requests.Response`` and raises ``requests.HTTPError``,
+    ``requests.Timeout`` or ``requests.ConnectionError`` once retries run out.
+    """
+    with requests_errors():
+        response = run_sync(
+            acall_chat_api(
+                prompt,
+                context_documents,
+                history=history,
+                api_url=api_url,
+                api_key=api_key,
+                timeout=timeout,
+                cache=cache,
+                token_budget=token_budget,
+                pack_stats=pack_stats,
+                semantic_cache=semantic_cache,
+            )
+        )
+    return to_requests_response(response)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Warm worker that keeps embedding models and vector stores loaded between runs.
+
+Loading a Sentence-Transformers model (and torch) plus the FAISS store costs
+seconds and hundreds of MB, which dominates short CLI invocations. ``serve``
+pays that once and then answers requests on a Unix socket, so later commands
+and processes reuse the resident model:
+
+    python scripts/rag_worker.py serve --model sentence-transformers/all-MiniLM-L6-v2 &
+    python scripts/rag_worker.py query "linalool and inattention" --k 4
+    RAG_WORKER=1 python scripts/rag_ingest.py --incremental
+    python scripts/rag_worker.py stop
+
+With ``RAG_WORKER=1``, ``rag_embeddings.load_embeddings`` returns
+``WorkerEmbeddings`` whenever a worker is listening on ``RAG_WORKER_SOCKET``
+(and loads the model in-process otherwise), so ``rag_ingest`` and
+``rag_utils`` embed through the worker without any other change.
+
+Each request is one JSON line answered by one JSON line; vectors travel as
+base64-encoded float32. The client side of this module only uses the
+standard library, so ``query`` and ``status`` start in milliseconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SOCKET = Path(
+    os.environ.get("RAG_WORKER_SOCKET", REPO_ROOT / ".cache" / "rag-worker.sock")
+)
+WORKER_ENV = "RAG_WORKER"
+PING_TIMEOUT = 1.0
+
+
+class WorkerError(RuntimeError):
+    """Raised when the worker is unreachable or reports a failed request."""
+
+
+def worker_enabled() -> bool:
+    """Whether ``RAG_WORKER`` asks the helpers to use a running worker."""
+    return os.environ.get(WORKER_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+def request(
+    payload: Dict[str, Any],
+    socket_path: Path = DEFAULT_SOCKET,
+    timeout: Optional[float] = None,
+) -> dict:
+    """Send one request to the worker and return its response."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            with sock.makefile("rwb") as stream:
+                stream.write(json.dumps(payload).encode("utf-8") + b"\n")
+                stream.flush()
+                line = stream.readline()
+    except OSError as exc:
+        raise WorkerError(f"No worker reachable at {socket_path}: {exc}") from exc
+    if not line:
+        raise WorkerError("The worker closed the connection without answering.")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise WorkerError(response.get("error", "unknown worker error"))
+    return response
+
+
+def is_running(socket_path: Path = DEFAULT_SOCKET) -> bool:
+    try:
+        request({"op": "ping"}, socket_path, timeout=PING_TIMEOUT)
+    except WorkerError:
+        return False
+    return True
+
+
+def encode_vectors(vectors: Sequence[Sequence[float]]) -> Dict[str, Any]:
+    import numpy as np
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    dim = int(matrix.shape[1]) if matrix.ndim == 2 else 0
+    return {"dim": dim, "vectors": base64.b64encode(matrix.tobytes()).decode("ascii")}
+
+
+def decode_vectors(data: str, dim: int) -> List[List[float]]:
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    flat = values.tolist()
+    return (
+        [flat[start : start + dim] for start in range(0, len(flat), dim)] if dim else []
+    )
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            payload = json.loads(line)
+            response = {"ok": True, **self.server.worker.dispatch(payload)}
+        except Exception as exc:  # noqa: BLE001 - report to the client, keep serving
+            response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        self.wfile.flush()
+        if self.server.worker.stopping.is_set():
+            # Only now that the reply is out; shutdown() blocks until serve_forever returns.
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Worker:
+    """Request handlers; models and stores are loaded once and shared by every request."""
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.requests = 0
+        self.models: set = set()
+        self.server: Optional[_Server] = None
+        self.stopping = threading.Event()
+
+    def model(self, name: str):
+        """The model behind ``rag_utils.get_embeddings``, unwrapped: clients cache embeddings themselves."""
+        import rag_utils
+
+        self.models.add(name)
+        return rag_utils.get_embeddings(name).inner
+
+    def dispatch(self, payload: Dict[str, Any]) -> dict:
+        import rag_metrics
+
+        op = payload.get("op")
+        self.requests += 1
+        with rag_metrics.span("worker.request", op=op):
+            if op == "ping":
+                return {
+                    "pid": os.getpid(),
+                    "uptime_s": round(time.time() - self.started, 1),
+                    "requests": self.requests,
+                    "models": sorted(self.models),
+                }
+            if op == "embed":
+                return self.embed(
+                    payload["model"], payload["texts"], payload.get("kind", "documents")
+                )
+            if op == "retrieve":
+                return self.retrieve(payload)
+            if op == "shutdown":
+                # The handler stops the server after it has sent this reply.
+                self.stopping.set()
+                return {}
+        raise ValueError(f"Unknown op {op!r}")
+
+    def embed(self, model_name: str, texts: List[str], kind: str) -> dict:
+        model = self.model(model_name)
+        if kind == "query":
+            vectors = [model.embed_query(text) for text in texts]
+        else:
+            vectors = model.embed_documents(texts)
+        return encode_vectors(vectors)
+
+    def retrieve(self, payload: Dict[str, Any]) -> dict:
+        import rag_utils
+
+        model = payload.get("model") or rag_utils.DEFAULT_EMBED_MODEL
+        self.models.add(model)
+        persist_dir = payload.get("persist_dir") or rag_utils.VECTORSTORE_DIR
+        results = rag_utils.retrieve_context_batch(
+            payload["queries"],
+            int(payload.get("k", 4)),
+            embeddings_model=model,
+            persist_dir=persist_dir,
+            mode=payload.get("mode"),
+        )
+        if payload.get("format"):
+            return {"contexts": [rag_utils.format_context(docs) for docs in results]}
+        return {
+            "results": [
+                [
+                    {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in docs
+                ]
+                for docs in results
+            ]
+        }
+
+    def serve(
+        self,
+        socket_path: Path,
+        models: Sequence[str],
+        persist_dir: Optional[Path] = None,
+    ) -> None:
+        """Preload ``models`` (and the store in ``persist_dir``), then answer requests until stopped."""
+        import rag_utils
+
+        # This process is the worker: its own helpers must load models, not call back into it.
+        os.environ.pop(WORKER_ENV, None)
+        if socket_path.exists():
+            if is_running(socket_path):
+                raise WorkerError(f"A worker is already listening on {socket_path}.")
+            socket_path.unlink()
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        start = time.perf_counter()
+        for name in models:
+            self.model(name)
+            if persist_dir is not None and persist_dir.exists():
+                rag_utils.get_vector_store(name, persist_dir)
+        print(
+            f"Loaded {', '.join(models)} in {time.perf_counter() - start:.1f}s",
+            flush=True,
+        )
+
+        self.server = _Server(str(socket_path), _Handler)
+        self.server.worker = self
+        print(f"Worker {os.getpid()} listening on {socket_path}", flush=True)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            socket_path.unlink(missing_ok=True)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Keep RAG embedding models and stores loaded between CLI runs."
+    )
+    parser.add_argument(
+        "--socket", type=Path, default=DEFAULT_SOCKET, help="Unix socket of the worker."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Load models and answer requests until stopped."
+    )
+    serve_parser.add_argument(
+        "--model",
+        dest="models",
+        action="append",
+        default=[],
+        help="Embedding model to preload (repeatable; default RAG_EMBEDDING_MODEL).",
+    )
+    serve_parser.add_argument(
+        "--persist-dir",
+        type=Path,
+        help="Vector store to preload (default data/rag/vectorstore when it exists).",
+    )
+
+    query_parser = subparsers.add_parser(
+        "query", help="Print the formatted context for a question."
+    )
+    query_parser.add_argument("question")
+    query_parser.add_argument("--k", type=int, default=4)
+    query_parser.add_argument("--mode", choices=("vector", "lexical", "hybrid"))
+    query_parser.add_argument(
+        "--model", help="Embedding model (default RAG_EMBEDDING_MODEL)."
+    )
+    query_parser.add_argument(
+        "--persist-dir", type=Path, help="Vector store to search."
+    )
+
+    subparsers.add_parser("status", help="Report whether a worker is running.")
+    subparsers.add_parser("stop", help="Shut the worker down.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.command == "serve":
+        import rag_utils
+
+        models = args.models or [rag_utils.DEFAULT_EMBED_MODEL]
+        Worker().serve(
+            args.socket, models, args.persist_dir or rag_utils.VECTORSTORE_DIR
+        )
+        return 0
+
+    if args.command == "query":
+        payload = {
+            "op": "retrieve",
+            "queries": [args.question],
+            "k": args.k,
+            "mode": args.mode,
+            "model": args.model,
+            "persist_dir": str(args.persist_dir) if args.persist_dir else None,
+            "format": True,
+        }
+        try:
+            response = request(payload, args.socket)
+        except WorkerError as exc:
+            print(f"{exc}; answering in-process.", file=sys.stderr)
+            response = Worker().dispatch(payload)
+        print(response["contexts"][0])
+        return 0
+
+    try:
+        response = request(
+            {"op": "ping" if args.command == "status" else "shutdown"},
+            args.socket,
+            PING_TIMEOUT,
+        )
+    except WorkerError as exc:
+        print(exc)
+        return 1
+    if args.command == "status":
+        print(
+            f"Worker {response['pid']} up {response['uptime_s']}s, {response['requests']} requests, "
+            f"models: {', '.join(response['models']) or 'none'}"
+        )
+    else:
+        print("Worker stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
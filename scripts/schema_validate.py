@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Validate structured JSON artifacts against the schemas in ``schemas/``.
+
+Each schema is parsed and checked once per process and its validator is
+cached (keyed by path and mtime), so a batch never re-reads or re-checks the
+schema. Documents go through ``is_valid`` first; the slower error walk, with
+a JSON path for every failing field, only runs for documents that fail.
+Batches of more than a few hundred documents are validated in worker
+processes, each of which builds its validator once.
+
+Usage:
+
+    python scripts/schema_validate.py --schema metastudy out/metastudy.json
+    python scripts/schema_validate.py --schema terpene-literature-review reviews.jsonl --jobs 4
+
+Schemas are named by file stem (``metastudy``), file name or path. A
+``.json`` file holding a list is validated item by item when the schema
+describes an object, and ``.jsonl`` files are validated line by line. The
+exit status is 1 if any document is invalid.
+
+``generate_reports.py --schema`` and ``rag_ingest.py --schema`` use the same
+validators to reject artifacts before anything is written or indexed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+from referencing import Registry, Resource
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCHEMA_DIR = REPO_ROOT / "schemas"
+SCHEMA_SUFFIX = ".schema.json"
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+# Smaller batches are validated in-process; pool start-up would cost more.
+PARALLEL_THRESHOLD = 256
+CHUNK_SIZE = 128
+MAX_ERRORS_PER_DOCUMENT = 20
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass
+class ValidationIssue:
+    source: str
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.source}: {self.path}: {self.message}"
+
+
+@dataclass
+class ValidationReport:
+    documents: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.invalid == 0
+
+    def add(self, other: "ValidationReport") -> None:
+        self.documents += other.documents
+        self.invalid += other.invalid
+        self.issues.extend(other.issues)
+
+    def __str__(self) -> str:
+        rate = self.documents / self.seconds if self.seconds else 0.0
+        return (
+            f"{self.documents - self.invalid} of {self.documents} documents valid "
+            f"({len(self.issues)} errors) in {self.seconds:.2f}s ({rate:.0f} docs/s)"
+        )
+
+
+def resolve_schema_path(schema: str | Path) -> Path:
+    """Find a schema by path, file name or ``schemas/<name>.schema.json`` stem."""
+    candidate = Path(schema)
+    if candidate.is_file():
+        return candidate.resolve()
+    for name in (str(schema), f"{schema}{SCHEMA_SUFFIX}", f"{schema}.json"):
+        path = SCHEMA_DIR / name
+        if path.is_file():
+            return path.resolve()
+    known = ", ".join(
+        sorted(
+            path.name[: -len(SCHEMA_SUFFIX)]
+            for path in SCHEMA_DIR.glob(f"*{SCHEMA_SUFFIX}")
+        )
+    )
+    raise FileNotFoundError(f"Unknown schema {schema!r} (known: {known}).")
+
+
+def _schema_registry() -> Registry:
+    """All project schemas by ``$id``, so ``$ref`` between them resolves offline."""
+    resources = []
+    for path in sorted(SCHEMA_DIR.glob("*.json")):
+        contents = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(contents, dict) and "$id" in contents:
+            resources.append((contents["$id"], Resource.from_contents(contents)))
+    return Registry().with_resources(resources)
+
+
+@lru_cache(maxsize=32)
+def _build_validator(path: str, mtime_ns: int) -> Validator:
+    schema = json.loads(Path(path).read_text(encoding="utf-8"))
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(
+        schema,
+        registry=_schema_registry(),
+        format_checker=validator_class.FORMAT_CHECKER,
+    )
+
+
+def get_validator(schema: str | Path) -> Validator:
+    """Cached validator for ``schema``; rebuilt only when the schema file changes."""
+    path = resolve_schema_path(schema)
+    return _build_validator(str(path), path.stat().st_mtime_ns)
+
+
+def format_path(parts: Iterable[Any]) -> str:
+    """JSON path such as ``$.display.bulletPoints[3]`` for a jsonschema error path."""
+    text = "$"
+    for part in parts:
+        if isinstance(part, int):
+            text += f"[{part}]"
+        elif _IDENTIFIER_RE.match(str(part)):
+            text += f".{part}"
+        else:
+            text += f"[{json.dumps(part)}]"
+    return text
+
+
+def document_issues(
+    validator: Validator, document: Any, source: str = "<document>"
+) -> List[ValidationIssue]:
+    """Every error in ``document`` (up to ``MAX_ERRORS_PER_DOCUMENT``), or ``[]`` if it is valid."""
+    if validator.is_valid(document):
+        return []
+    errors = sorted(
+        validator.iter_errors(document),
+        key=lambda error: [str(part) for part in error.absolute_path],
+    )
+    return [
+        ValidationIssue(source, format_path(error.absolute_path), error.message)
+        for error in errors[:MAX_ERRORS_PER_DOCUMENT]
+    ]
+
+
+def validate_document(
+    document: Any, schema: str | Path, source: str = "<document>"
+) -> List[ValidationIssue]:
+    """Validate one in-memory document."""
+    return document_issues(get_validator(schema), document, source)
+
+
+def expand_documents(
+    validator: Validator, source: str, document: Any
+) -> Iterator[Tuple[str, Any]]:
+    """``(source, document)`` pairs: the items of a list when the schema describes an object."""
+    if isinstance(document, list) and validator.schema.get("type") == "object":
+        for index, item in enumerate(document):
+            yield f"{source}[{index}]", item
+    else:
+        yield source, document
+
+
+def _validate_raw(task: Tuple[str, Sequence[Tuple[str, str]]]) -> ValidationReport:
+    """Parse and validate ``(source, JSON text)`` pairs; runs in worker processes."""
+    schema_path, items = task
+    validator = get_validator(schema_path)
+    report = ValidationReport()
+    for source, text in items:
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as exc:
+            report.documents += 1
+            report.invalid += 1
+            report.issues.append(ValidationIssue(source, "$", f"invalid JSON: {exc}"))
+            continue
+        for item_source, document in expand_documents(validator, source, parsed):
+            issues = document_issues(validator, document, item_source)
+            report.documents += 1
+            if issues:
+                report.invalid += 1
+                report.issues.extend(issues)
+    return report
+
+
+def iter_raw_documents(path: Path) -> Iterator[Tuple[str, str]]:
+    """``(source, JSON text)`` for a ``.json`` file or each line of a ``.jsonl`` file."""
+    if path.suffix.lower() == ".jsonl":
+        with path.open("r", encoding="utf-8") as handle:
+            for number, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield f"{path}:{number}", line
+    else:
+        yield str(path), path.read_text(encoding="utf-8")
+
+
+def validate_files(
+    paths: Sequence[Path], schema: str | Path, jobs: int = DEFAULT_JOBS
+) -> ValidationReport:
+    """Validate every document in ``paths`` against ``schema``, in parallel for large batches."""
+    start = time.perf_counter()
+    schema_path = str(resolve_schema_path(schema))
+    raw = [item for path in paths for item in iter_raw_documents(Path(path))]
+    report = ValidationReport()
+    if jobs <= 1 or len(raw) < PARALLEL_THRESHOLD:
+        report.add(_validate_raw((schema_path, raw)))
+    else:
+        tasks = [
+            (schema_path, raw[i : i + CHUNK_SIZE])
+            for i in range(0, len(raw), CHUNK_SIZE)
+        ]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for chunk_report in executor.map(_validate_raw, tasks):
+                report.add(chunk_report)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Validate JSON / JSON Lines artifacts against a project schema."
+    )
+    parser.add_argument(
+        "paths", nargs="+", type=Path, help="JSON or JSON Lines files to validate."
+    )
+    parser.add_argument(
+        "--schema",
+        required=True,
+        help="Schema name (e.g. metastudy), file name in schemas/ or path.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=int(os.environ.get("SCHEMA_VALIDATE_JOBS", DEFAULT_JOBS)),
+        help="Worker processes for large batches.",
+    )
+    parser.add_argument(
+        "--max-errors",
+        type=int,
+        default=50,
+        help="Maximum number of errors to print.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = validate_files(args.paths, args.schema, jobs=args.jobs)
+    for issue in report.issues[: args.max_errors]:
+        print(f"  - {issue}")
+    if len(report.issues) > args.max_errors:
+        print(f"  ... {len(report.issues) - args.max_errors} more")
+    print(report)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""``chat_client`` retries and SSE streaming against a local stub HTTP server."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+import pytest
+import requests
+
+import rag_utils
+from chat_client import AsyncChatClient, RetryPolicy
+
+RETRY_AFTER = 0.2
+TOKENS = ["Hel", "lo", " world"]
+
+Reply = Tuple[int, Dict[str, str], bytes]
+
+
+def sse_body(tokens: List[str]) -> bytes:
+    events = [{"choices": [{"delta": {"content": token}}]} for token in tokens]
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events]
+    return ("".join(lines) + "data: [DONE]\n\n").encode("utf-8")
+
+
+def json_reply(status: int, payload: dict) -> Reply:
+    return status, {"Content-Type": "application/json"}, json.dumps(payload).encode()
+
+
+BUSY: Reply = (503, {"Retry-After": str(RETRY_AFTER)}, b"busy")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Replies to each path with its scripted replies in order, repeating the last one."""
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            replies = self.server.routes[self.path]
+            status, headers, body = replies.pop(0) if len(replies) > 1 else replies[0]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class StubServer:
+    def __init__(self, server: ThreadingHTTPServer) -> None:
+        self._server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def route(self, path: str, *replies: Reply) -> str:
+        self._server.routes[path] = list(replies)
+        return self.url + path
+
+    def hits(self, path: str) -> int:
+        return self._server.hits.get(path, 0)
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.lock = threading.Lock()
+    server.routes = {}
+    server.hits = {}
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield StubServer(server)
+    server.shutdown()
+    server.server_close()
+
+
+async def _post(url: str, attempts: int = 3):
+    async with AsyncChatClient(retry=RetryPolicy(max_attempts=attempts)) as client:
+        return await client.post_json(url, {"messages": []})
+
+
+async def _stream(url: str) -> List[str]:
+    async with AsyncChatClient(retry=RetryPolicy(max_attempts=3)) as client:
+        return [token async for token in client.stream_sse(url, {"messages": []})]
+
+
+def test_post_json_retries_503_after_retry_after(stub_server):
+    url = stub_server.route("/chat", BUSY, json_reply(200, {"answer": "ok"}))
+    started = time.monotonic()
+    response = asyncio.run(_post(url))
+    assert response.status_code == 200
+    assert response.json() == {"answer": "ok"}
+    assert stub_server.hits("/chat") == 2
+    assert time.monotonic() - started >= RETRY_AFTER
+
+
+def test_post_json_returns_last_response_when_retries_run_out(stub_server):
+    url = stub_server.route("/chat", BUSY)
+    response = asyncio.run(_post(url, attempts=2))
+    assert response.status_code == 503
+    assert stub_server.hits("/chat") == 2
+
+
+def test_post_json_does_not_retry_client_errors(stub_server):
+    url = stub_server.route("/chat", json_reply(400, {"error": "bad request"}))
+    assert asyncio.run(_post(url)).status_code == 400
+    assert stub_server.hits("/chat") == 1
+
+
+def test_stream_sse_yields_tokens_after_retried_503(stub_server):
+    stream = (200, {"Content-Type": "text/event-stream"}, sse_body(TOKENS))
+    url = stub_server.route("/stream", BUSY, stream)
+    assert asyncio.run(_stream(url)) == TOKENS
+    assert stub_server.hits("/stream") == 2
+
+
+def test_call_chat_api_returns_a_requests_response(stub_server):
+    url = stub_server.route("/chat", BUSY, json_reply(200, {"answer": "ok"}))
+    response = rag_utils.call_chat_api("question", [], api_url=url)
+    assert isinstance(response, requests.Response)
+    assert response.status_code == 200
+    assert response.json() == {"answer": "ok"}
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_call_chat_api_raises_requests_http_error(stub_server):
+    url = stub_server.route("/chat", json_reply(404, {"error": "not found"}))
+    with pytest.raises(requests.HTTPError) as excinfo:
+        rag_utils.call_chat_api("question", [], api_url=url)
+    assert excinfo.value.response.status_code == 404
+    assert excinfo.value.response.json() == {"error": "not found"}
+
+
+def test_call_chat_api_raises_requests_connection_error(stub_server, monkeypatch):
+    monkeypatch.setattr(RetryPolicy, "delay", lambda self, attempt, response=None: 0.0)
+    with pytest.raises(requests.ConnectionError):
+        rag_utils.call_chat_api("question", [], api_url="http://127.0.0.1:9/chat")
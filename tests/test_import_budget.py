@@ -0,0 +1,37 @@
+"""
+Cold-start budget for the RAG helpers: each module is imported in a fresh
+interpreter (best of three, via ``rag_bench.import_times``) and must neither
+load a heavy backend (FAISS, LangChain, torch, ...) nor exceed the budget.
+
+Set ``RAG_IMPORT_BUDGET_MS`` to loosen the budget on slow machines.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from rag_bench import (
+    DEFAULT_IMPORT_BUDGET_MS,
+    IMPORT_CLIS,
+    IMPORT_MODULES,
+    import_times,
+)
+
+BUDGET_MS = float(os.environ.get("RAG_IMPORT_BUDGET_MS", DEFAULT_IMPORT_BUDGET_MS))
+
+
+@pytest.mark.parametrize("module", IMPORT_MODULES)
+def test_module_import_is_light(module):
+    (row,) = import_times(modules=[module], clis=[])
+    assert row["error"] is None, row["error"]
+    assert row["heavy"] == [], f"import {module} loaded {', '.join(row['heavy'])}"
+    assert row["ms"] <= BUDGET_MS, f"import {module} took {row['ms']} ms"
+
+
+@pytest.mark.parametrize("script", IMPORT_CLIS)
+def test_cli_help_is_fast(script):
+    (row,) = import_times(modules=[], clis=[script])
+    assert row["error"] is None, row["error"]
+    assert row["ms"] <= BUDGET_MS, f"{script} --help took {row['ms']} ms"